@@ -0,0 +1,231 @@
+# agregacoes.py - Resumos do patrimônio calculados por um motor escolhido: SQLite (padrão), pandas ou DuckDB
+#
+# Os três motores devolvem o mesmo que resumos.ler_resumos: os cinco DataFrames (por data, plano,
+# segmento, fundo e gestor), com as mesmas colunas, tipos e ordem de linhas, prontos para as páginas.
+#   - 'sqlite': recalcula só as datas pendentes nas tabelas de resumo (gatilhos de resumos.py) e as lê;
+#   - 'pandas': lê das tabelas base só as colunas usadas e agrega tudo com groupby, numa thread;
+#   - 'duckdb': roda as mesmas agregações em SQL no DuckDB, vetorizado e em várias threads, sobre o
+#     próprio banco (extensão sqlite do DuckDB, baixada no primeiro ATTACH; sem rede, instale-a antes
+#     com INSTALL sqlite) ou sobre uma exportação Parquet (exportar_parquet), que dispensa a extensão.
+# 'pandas' e 'duckdb' não usam as tabelas de resumo: recalculam tudo a partir das posições a cada
+# chamada. Servem para comparar a latência em bancos grandes (benchmarks/medir.py) e para ler bancos
+# que não podem ser gravados. O duckdb é opcional (pip install duckdb): só é importado quando usado.
+# Cada motor soma as linhas numa ordem própria (e o DuckDB ainda divide entre threads), o que muda o
+# último dígito das somas em ponto flutuante. Os resumos saem como cada motor os soma, sem arredondar;
+# comparar_resumos confere linhas, ordem e tipos exatamente e os valores em centavos.
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import banco_dados
+import resumos
+
+MOTORES = ('sqlite', 'pandas', 'duckdb')
+
+# Colunas das tabelas base que entram nos resumos.
+COLUNAS_BASE = {
+    'investimentos': ('data_posicao', 'nome_plano', 'segmento', 'nome_fundo', 'gestor', 'valor_total'),
+    'imoveis_emprestimos': ('data_posicao', 'nome_plano', 'segmento', 'valor_total'),
+}
+
+GESTOR_SEM_CADASTRO = 'Não Cadastrado'
+
+
+# --- EXPORTAÇÃO PARQUET ---
+# Um arquivo por tabela base na pasta ('investimentos.parquet', ...), só com as colunas dos resumos e a
+# data como texto, do jeito que está no banco.
+def exportar_parquet(caminho_banco, pasta):
+    os.makedirs(pasta, exist_ok=True)
+    conn = banco_dados.conectar_leitura(caminho_banco)
+    try:
+        for tabela, colunas in COLUNAS_BASE.items():
+            df = pd.read_sql_query(f"SELECT {', '.join(colunas)} FROM {tabela}", conn)
+            pq.write_table(pa.Table.from_pandas(df, preserve_index=False), _arquivo_parquet(pasta, tabela))
+    finally:
+        conn.close()
+    return pasta
+
+
+def _arquivo_parquet(pasta, tabela):
+    return os.path.join(pasta, f"{tabela}.parquet")
+
+
+# --- ORDEM DAS LINHAS ---
+# A de resumos.ORDEM_LEITURA, com nulos primeiro como no SQLite (nenhuma coluna em DESC tem nulos).
+def _ordenar(tabela, df):
+    colunas, crescente = [], []
+    for termo in resumos.ORDEM_LEITURA[tabela].split(','):
+        partes = termo.split()
+        colunas.append(partes[0])
+        crescente.append(len(partes) == 1 or partes[1].upper() != 'DESC')
+    return df.sort_values(colunas, ascending=crescente, na_position='first', ignore_index=True)
+
+
+# --- MOTOR PANDAS ---
+def _ler_base_pandas(fonte, tabela):
+    colunas = list(COLUNAS_BASE[tabela])
+    if os.path.isdir(fonte):
+        return pd.read_parquet(_arquivo_parquet(fonte, tabela), columns=colunas)
+    conn = banco_dados.conectar_leitura(fonte)
+    try:
+        return pd.read_sql_query(f"SELECT {', '.join(colunas)} FROM {tabela}", conn)
+    finally:
+        conn.close()
+
+
+def _somar(df, chave, valores):
+    return df.groupby(chave, dropna=False, sort=False)[valores].sum().reset_index()
+
+
+def _resumos_pandas(fonte):
+    df_inv = _ler_base_pandas(fonte, 'investimentos')
+    df_imo = _ler_base_pandas(fonte, 'imoveis_emprestimos')
+    chave = ['data_posicao', 'nome_plano']
+
+    partes = pd.concat([
+        df_inv[chave].assign(valor_investimentos=df_inv['valor_total'], valor_imoveis=0.0),
+        df_imo[chave].assign(valor_investimentos=0.0, valor_imoveis=df_imo['valor_total']),
+    ], ignore_index=True)
+    df_plano = _somar(partes, chave, ['valor_investimentos', 'valor_imoveis'])
+    df_plano['valor_total'] = df_plano['valor_investimentos'] + df_plano['valor_imoveis']
+    df_data = _somar(df_plano, ['data_posicao'], ['valor_investimentos', 'valor_imoveis', 'valor_total'])
+
+    df_segmento = pd.concat([
+        _somar(df.dropna(subset=['segmento']), chave + ['segmento'], 'valor_total').assign(origem=origem)
+        for df, origem in ((df_inv, 'investimentos'), (df_imo, 'imoveis'))
+    ], ignore_index=True)[['data_posicao', 'nome_plano', 'origem', 'segmento', 'valor_total']]
+    df_fundo = _somar(df_inv, chave + ['nome_fundo'], 'valor_total')
+    df_gestor = _somar(df_inv.assign(gestor=df_inv['gestor'].fillna(GESTOR_SEM_CADASTRO)), chave + ['gestor'],
+                       'valor_total')
+
+    return {
+        'resumo_patrimonio_data': df_data,
+        'resumo_patrimonio_plano': df_plano,
+        'resumo_patrimonio_segmento': df_segmento,
+        'resumo_patrimonio_fundo': df_fundo,
+        'resumo_patrimonio_gestor': df_gestor,
+    }
+
+
+# --- MOTOR DUCKDB ---
+# As tabelas base viram visões com os mesmos nomes e tipos em qualquer origem: o ATTACH do SQLite
+# entrega data_posicao como DATE (tipo declarado) e o Parquet como texto.
+CONSULTAS_DUCKDB = {
+    "resumo_patrimonio_plano": """
+        SELECT data_posicao, nome_plano, COALESCE(sum(valor_investimentos), 0.0) AS valor_investimentos,
+               COALESCE(sum(valor_imoveis), 0.0) AS valor_imoveis,
+               COALESCE(sum(valor_investimentos), 0.0) + COALESCE(sum(valor_imoveis), 0.0) AS valor_total
+        FROM (SELECT data_posicao, nome_plano, valor_total AS valor_investimentos, 0.0 AS valor_imoveis
+              FROM investimentos
+              UNION ALL
+              SELECT data_posicao, nome_plano, 0.0, valor_total FROM imoveis_emprestimos)
+        GROUP BY data_posicao, nome_plano""",
+    "resumo_patrimonio_data": """
+        SELECT data_posicao, COALESCE(sum(valor_investimentos), 0.0) AS valor_investimentos,
+               COALESCE(sum(valor_imoveis), 0.0) AS valor_imoveis,
+               COALESCE(sum(valor_total), 0.0) AS valor_total
+        FROM resumo_patrimonio_plano
+        GROUP BY data_posicao""",
+    "resumo_patrimonio_segmento": """
+        SELECT data_posicao, nome_plano, 'investimentos' AS origem, segmento,
+               COALESCE(sum(valor_total), 0.0) AS valor_total
+        FROM investimentos WHERE segmento IS NOT NULL
+        GROUP BY data_posicao, nome_plano, segmento
+        UNION ALL
+        SELECT data_posicao, nome_plano, 'imoveis', segmento, COALESCE(sum(valor_total), 0.0)
+        FROM imoveis_emprestimos WHERE segmento IS NOT NULL
+        GROUP BY data_posicao, nome_plano, segmento""",
+    "resumo_patrimonio_fundo": """
+        SELECT data_posicao, nome_plano, nome_fundo, COALESCE(sum(valor_total), 0.0) AS valor_total
+        FROM investimentos
+        GROUP BY data_posicao, nome_plano, nome_fundo""",
+    "resumo_patrimonio_gestor": f"""
+        SELECT data_posicao, nome_plano, COALESCE(gestor, '{GESTOR_SEM_CADASTRO}') AS gestor,
+               COALESCE(sum(valor_total), 0.0) AS valor_total
+        FROM investimentos
+        GROUP BY data_posicao, nome_plano, COALESCE(gestor, '{GESTOR_SEM_CADASTRO}')""",
+}
+
+
+def _origem_duckdb(fonte, tabela):
+    if os.path.isdir(fonte):
+        caminho = _arquivo_parquet(fonte, tabela).replace("'", "''")
+        return f"read_parquet('{caminho}')"
+    return f"banco.{tabela}"
+
+
+# 'threads' limita as threads do DuckDB (padrão: todos os núcleos).
+def _resumos_duckdb(fonte, threads=None):
+    import duckdb
+
+    conn = duckdb.connect()
+    try:
+        if threads:
+            conn.execute(f"SET threads = {int(threads)}")
+        # Como no SQLite: nulos primeiro em ordem crescente e por último em decrescente.
+        conn.execute("SET default_null_order = 'nulls_first_on_asc_last_on_desc'")
+        if not os.path.isdir(fonte):
+            caminho = os.path.abspath(fonte).replace("'", "''")
+            conn.execute(f"ATTACH '{caminho}' AS banco (TYPE sqlite, READ_ONLY)")
+        for tabela, colunas in COLUNAS_BASE.items():
+            selecao = ", ".join("CAST(data_posicao AS VARCHAR) AS data_posicao" if coluna == 'data_posicao'
+                                else "CAST(valor_total AS DOUBLE) AS valor_total" if coluna == 'valor_total'
+                                else coluna for coluna in colunas)
+            conn.execute(f"CREATE VIEW {tabela} AS SELECT {selecao} FROM {_origem_duckdb(fonte, tabela)}")
+
+        # O resumo por data soma o por plano, que fica materializado antes.
+        conn.execute(f"CREATE TEMP TABLE resumo_patrimonio_plano AS {CONSULTAS_DUCKDB['resumo_patrimonio_plano']}")
+        resultado = {}
+        for tabela in resumos.ORDEM_LEITURA:
+            origem = ("SELECT * FROM resumo_patrimonio_plano" if tabela == 'resumo_patrimonio_plano'
+                      else CONSULTAS_DUCKDB[tabela])
+            resultado[tabela] = conn.execute(
+                f"SELECT * FROM ({origem}) ORDER BY {resumos.ORDEM_LEITURA[tabela]}").df()
+        return resultado
+    finally:
+        conn.close()
+
+
+# --- MOTOR SQLITE (TABELAS DE RESUMO) ---
+def _resumos_sqlite(caminho_banco):
+    conn = banco_dados.conectar(caminho_banco)
+    try:
+        resumos.atualizar_resumos(conn)
+        return resumos.ler_resumos(conn)
+    finally:
+        conn.close()
+
+
+# --- ENTRADA ÚNICA ---
+# 'fonte' é o arquivo do banco ou, para 'pandas' e 'duckdb', uma pasta de exportar_parquet. Devolve a
+# tupla de resumos.ler_resumos, na ordem de resumos.ORDEM_LEITURA.
+def calcular_resumos(motor, fonte=banco_dados.NOME_BANCO_DADOS, threads=None):
+    if motor not in MOTORES:
+        raise ValueError(f"Motor de resumos desconhecido: {motor!r} (use {', '.join(MOTORES)})")
+    if motor == 'sqlite':
+        return _resumos_sqlite(fonte)
+    calculados = _resumos_pandas(fonte) if motor == 'pandas' else _resumos_duckdb(fonte, threads)
+    return tuple(resumos.preparar_resumo(tabela, _ordenar(tabela, calculados[tabela]) if motor == 'pandas'
+                                         else calculados[tabela])
+                 for tabela in resumos.ORDEM_LEITURA)
+
+
+# Tabelas em que dois resultados de calcular_resumos diferem: {tabela: mensagem}, vazio quando são
+# iguais. Linhas, ordem e tipos têm de ser idênticos; os valores são comparados em centavos, o que
+# absorve a diferença de ordem das somas entre motores (valores em centavos somam centavos, e o erro
+# de arredondamento fica muitas ordens abaixo de meio centavo).
+def comparar_resumos(resultado, referencia):
+    diferencas = {}
+    for tabela, df, df_referencia in zip(resumos.ORDEM_LEITURA, resultado, referencia):
+        try:
+            pd.testing.assert_frame_equal(_em_centavos(df), _em_centavos(df_referencia), check_exact=True)
+        except AssertionError as erro:
+            diferencas[tabela] = str(erro).strip().splitlines()[0]
+    return diferencas
+
+
+def _em_centavos(df):
+    valores = df.select_dtypes('float').columns
+    return df.assign(**{coluna: df[coluna].round(2) for coluna in valores})
@@ -0,0 +1,162 @@
+# analise.py - Cálculos do dashboard sem Streamlit: cada métrica é uma função pura sobre os DataFrames
+# de resumo (resumos.ler_resumos) e das tabelas de rentabilidade (banco_dados.ler_*). 'nome_plano=None'
+# significa o consolidado de todos os planos. As funções não alteram as entradas (ver o contrato de
+# somente leitura em dashboard.py) e dependem só dos argumentos, então podem ser cacheadas uma a uma.
+# Os meses selecionados nas páginas chegam como chave_mes (inteiro aaaamm, ver calendario.py); os
+# resumos têm uma posição por mês, e os filtros comparam essa coluna inteira em vez de datas.
+import pandas as pd
+
+import esquema
+import rentabilidade
+
+
+def _do_plano(df, nome_plano):
+    return df if nome_plano is None else df[df['nome_plano'] == nome_plano]
+
+
+def _no_mes(df, chave_mes):
+    return df[df['chave_mes'] == chave_mes]
+
+
+# --- PATRIMÔNIO: EVOLUÇÃO, KPI E VARIAÇÃO ---
+# Série mensal do patrimônio, com o valor na coluna 'Total'.
+def evolucao_patrimonio(df_resumo_data, df_resumo_plano, nome_plano=None):
+    if nome_plano is None:
+        return df_resumo_data.rename(columns={'valor_total': 'Total'})
+    return _do_plano(df_resumo_plano, nome_plano).rename(columns={'valor_total': 'Total'}).reset_index(drop=True)
+
+
+def meses_posicao(df_evolucao, decrescente=False):
+    return sorted(df_evolucao['chave_mes'].unique().tolist(), reverse=decrescente)
+
+
+def patrimonio_no_mes(df_evolucao, chave_mes):
+    return df_evolucao.loc[df_evolucao['chave_mes'] == chave_mes, 'Total'].sum()
+
+
+# (data mais recente, patrimônio nessa data)
+def patrimonio_mais_recente(df_evolucao):
+    data_mais_recente = df_evolucao['data_posicao'].max()
+    return data_mais_recente, df_evolucao.loc[df_evolucao['data_posicao'] == data_mais_recente, 'Total'].sum()
+
+
+# (variação em R$, variação em %) entre dois meses da série.
+def variacao_patrimonial(df_evolucao, mes_inicial, mes_final):
+    valor_inicial = df_evolucao.loc[df_evolucao['chave_mes'] == mes_inicial, 'Total'].iloc[0]
+    valor_final = df_evolucao.loc[df_evolucao['chave_mes'] == mes_final, 'Total'].iloc[0]
+    variacao_rs = valor_final - valor_inicial
+    variacao_pct = (valor_final / valor_inicial - 1) * 100 if valor_inicial != 0 else 0
+    return variacao_rs, variacao_pct
+
+
+# --- DISTRIBUIÇÕES NUM MÊS ---
+# Patrimônio por plano, com o rótulo curto de 'mapa_nomes' na coluna 'Plano'.
+def distribuicao_planos(df_resumo_plano, chave_mes, mapa_nomes):
+    df_planos = _no_mes(df_resumo_plano, chave_mes)[['nome_plano', 'valor_total']].reset_index(drop=True)
+    return df_planos.assign(Plano=df_planos['nome_plano'].map(mapa_nomes).fillna(df_planos['nome_plano']))
+
+
+# Patrimônio por segmento: primeiro os segmentos dos investimentos, depois os de imóveis/empréstimos.
+def distribuicao_segmentos(df_resumo_segmento, chave_mes, nome_plano=None):
+    df_seg = _no_mes(_do_plano(df_resumo_segmento, nome_plano), chave_mes)
+    partes = [df_seg[df_seg['origem'] == origem].groupby('segmento', observed=True)['valor_total'].sum().reset_index()
+              for origem in ('investimentos', 'imoveis')]
+    return pd.concat(partes, ignore_index=True)
+
+
+# Ordena por valor e acrescenta a participação de cada linha no total ('%'). Devolve (tabela, total).
+def tabela_participacao(df, coluna_valor='valor_total'):
+    df_tabela = df.sort_values(by=coluna_valor, ascending=False)
+    total = df_tabela[coluna_valor].sum()
+    participacao = (df_tabela[coluna_valor] / total) * 100 if total > 0 else 0
+    return df_tabela.assign(**{'%': participacao}), total
+
+
+# --- EVOLUÇÃO DAS DISTRIBUIÇÕES ---
+# (percentual, valor) em formato largo: uma linha por data e uma coluna por plano ou segmento.
+def _percentual_e_valor(df_largo):
+    df_largo = df_largo.fillna(0)
+    return df_largo.div(df_largo.sum(axis=1), axis=0) * 100, df_largo
+
+
+def evolucao_distribuicao_planos(df_resumo_plano, mapa_nomes):
+    df_pct, df_val = _percentual_e_valor(
+        df_resumo_plano.pivot(index='data_posicao', columns='nome_plano', values='valor_total'))
+    colunas = [mapa_nomes.get(col, col) for col in df_pct.columns]
+    return df_pct.set_axis(colunas, axis=1), df_val.set_axis(colunas, axis=1)
+
+
+def evolucao_distribuicao_segmentos(df_resumo_segmento, nome_plano=None):
+    return _percentual_e_valor(
+        _do_plano(df_resumo_segmento, nome_plano)
+        .groupby(['data_posicao', 'segmento'], observed=True)['valor_total'].sum().unstack())
+
+
+# --- RANKINGS ---
+def total_distintos(df_resumo, coluna, chave_mes, nome_plano=None):
+    return _no_mes(_do_plano(df_resumo, nome_plano), chave_mes)[coluna].nunique()
+
+
+# As 'n' maiores posições de 'coluna' (nome_fundo ou gestor) no mês, com o percentual sobre o
+# patrimônio total informado.
+def ranking(df_resumo, coluna, chave_mes, n, patrimonio_total, nome_plano=None):
+    df_ranking = (_no_mes(_do_plano(df_resumo, nome_plano), chave_mes)
+                  .groupby(coluna, observed=True)['valor_total'].sum().nlargest(n).reset_index())
+    percentual = (df_ranking['valor_total'] / patrimonio_total) * 100 if patrimonio_total > 0 else 0
+    return df_ranking.assign(percentual_patrimonio=percentual)
+
+
+# --- RENTABILIDADE ACUMULADA ---
+# Matriz de planos e segmentos (rentabilidades em %) e o Tipo de cada série ('Plano' ou 'Segmento').
+def matriz_performance(df_planos, df_segmentos, coluna_rentab_planos, coluna_rentab_segmentos):
+    # 'mes' e 'nome_unico' já vêm prontos da carga (ver esquema.py)
+    df_planos_prep = df_planos[['mes', 'nome_unico', coluna_rentab_planos]].rename(
+        columns={coluna_rentab_planos: 'rentabilidade'})
+    df_planos_prep['Tipo'] = 'Plano'
+
+    df_segmentos_prep = df_segmentos[['mes', 'nome_unico', coluna_rentab_segmentos]].rename(
+        columns={coluna_rentab_segmentos: 'rentabilidade'})
+    df_segmentos_prep['Tipo'] = 'Segmento'
+
+    df_performance = esquema.concatenar([df_planos_prep, df_segmentos_prep])
+    df_performance.dropna(subset=['rentabilidade'], inplace=True)
+    df_performance['rentabilidade'] = df_performance['rentabilidade'] / 100
+
+    matriz = rentabilidade.MatrizRetornos.de_formato_longo(df_performance, 'mes', 'nome_unico', 'rentabilidade')
+    tipos = df_performance.drop_duplicates('nome_unico').set_index('nome_unico')['Tipo']
+    return matriz, tipos
+
+
+def matriz_indices(df_indices):
+    colunas = sorted([col for col in df_indices.columns if col not in esquema.COLUNAS_DATA])
+    if df_indices.empty:
+        return rentabilidade.MatrizRetornos.de_formato_largo(pd.DataFrame(columns=['mes']), 'mes', colunas)
+    return rentabilidade.MatrizRetornos.de_formato_largo(df_indices, 'mes', colunas)
+
+
+# Fundos do plano identificados por "nome - segmento".
+def matriz_fundos(df_ativos_plano):
+    if not df_ativos_plano.empty:
+        df_ativos = df_ativos_plano[['mes', 'nome_fundo_segmento']].assign(
+            rentabilidade=df_ativos_plano['rentabilidade'] / 100)
+    else:
+        df_ativos = pd.DataFrame(columns=['mes', 'nome_fundo_segmento', 'rentabilidade'])
+    return rentabilidade.MatrizRetornos.de_formato_longo(df_ativos, 'mes', 'nome_fundo_segmento', 'rentabilidade')
+
+
+# Curvas de várias matrizes num só DataFrame para o gráfico. 'selecoes' é uma lista de
+# (matriz, séries escolhidas, tipo), em que tipo é um texto ou uma Series nome -> Tipo.
+# Seleções sem dados no período ficam de fora; sem nenhuma curva, devolve um DataFrame vazio.
+def curvas_rentabilidade(selecoes, data_inicial, data_final):
+    partes = []
+    for matriz, series, tipo in selecoes:
+        if not series:
+            continue
+        df_curvas = matriz.curvas(series, data_inicial, data_final)
+        if df_curvas.empty:
+            continue
+        df_curvas['Tipo'] = df_curvas['Nome'].map(tipo) if isinstance(tipo, pd.Series) else tipo
+        partes.append(df_curvas)
+    if not partes:
+        return pd.DataFrame(columns=['data_posicao', 'Nome', 'retorno_acumulado', 'Tipo'])
+    return pd.concat(partes, ignore_index=True).sort_values(by='data_posicao')
@@ -0,0 +1,162 @@
+# aquecimento.py - Aquecimento dos caches do dashboard numa thread de fundo, ao subir e a cada importação
+#
+# Uma thread vigia a versão dos dados (versao_tabelas) e, sempre que ela muda (a primeira leitura
+# conta como mudança), chama a rotina de aquecimento do dashboard. A rotina roda fora de qualquer
+# sessão do Streamlit, então não bloqueia ninguém; os caches que ela preenche (st.cache_resource,
+# carga incremental, cache de figuras) são do processo e ficam prontos para todas as sessões.
+# O estado fica em status(): 'pendente', 'aquecendo', 'concluido' ou 'erro'.
+# Importações e sincronizações, que rodam em outro processo, avisam pelo arquivo de aviso ao lado do
+# banco (avisar); a vigilância confere a data dele a cada segundo, com um stat, e relê a versão dos
+# dados na hora, sem esperar o ciclo de 'intervalo'. Para aquecer já na subida, antes da primeira
+# sessão, o dashboard é iniciado por servidor.py.
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+_LOGGER = logging.getLogger(__name__)
+
+NOME_THREAD = "aquecimento-caches"
+
+# Fora de uma sessão, cada chamada st.* avisa que falta o ScriptRunContext; na thread de aquecimento
+# isso é esperado, e o aviso sai do log só nela.
+LOGGER_CONTEXTO = 'streamlit.runtime.scriptrunner_utils.script_run_context'
+
+
+class _SemAvisoDeContexto(logging.Filter):
+    def filter(self, registro):
+        return threading.current_thread().name != NOME_THREAD
+
+
+_filtro_contexto = _SemAvisoDeContexto()
+
+
+def silenciar_avisos_de_contexto():
+    logging.getLogger(LOGGER_CONTEXTO).addFilter(_filtro_contexto)
+
+
+def em_aquecimento():
+    return threading.current_thread().name == NOME_THREAD
+
+
+# --- AVISO DE DADOS NOVOS ENTRE PROCESSOS ---
+ESPERA_AVISO = 1.0
+
+
+def arquivo_aviso(caminho_banco):
+    return f"{caminho_banco}.aquecer"
+
+
+def _marca_aviso(caminho):
+    try:
+        return os.stat(caminho).st_mtime_ns
+    except OSError:
+        return None
+
+
+# Chamado ao fim de uma importação ou sincronização. Falhar aqui não desfaz nada: a vigilância ainda
+# percebe a versão nova no ciclo seguinte.
+def avisar(caminho_banco):
+    caminho = arquivo_aviso(caminho_banco)
+    try:
+        with open(caminho, 'a'):
+            pass
+        os.utime(caminho)
+    except OSError as erro:
+        _LOGGER.warning("Aquecimento: não foi possível gravar o aviso em %s: %r", caminho, erro)
+        return False
+    return True
+
+
+# 'aquecer(chave)' preenche os caches; 'ler_chave()' devolve a versão atual dos dados (qualquer valor
+# comparável). A vigilância relê a chave a cada 'intervalo' segundos, ou assim que o arquivo 'aviso'
+# (arquivo_aviso) muda.
+class Aquecimento:
+    def __init__(self, aquecer, ler_chave, intervalo=30.0, aviso=None):
+        self.aquecer = aquecer
+        self.ler_chave = ler_chave
+        self.intervalo = intervalo
+        self.aviso = aviso
+        self.avisos = 0
+        self.estado = 'pendente'
+        self.chave = None
+        self.inicio = None
+        self.fim = None
+        self.erro = None
+        self.execucoes = 0
+        self._parar = threading.Event()
+        self._thread = None
+        self._trava = threading.Lock()
+
+    def iniciar(self):
+        with self._trava:
+            if self._thread is not None:
+                return False
+            silenciar_avisos_de_contexto()
+            self._thread = threading.Thread(target=self._vigiar, name=NOME_THREAD, daemon=True)
+            self._thread.start()
+            return True
+
+    def parar(self, espera=None):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(espera)
+
+    def _vigiar(self):
+        marca = _marca_aviso(self.aviso) if self.aviso else None
+        while not self._parar.is_set():
+            try:
+                chave = self.ler_chave()
+            except Exception as erro:  # banco indisponível: tenta de novo no próximo ciclo
+                _LOGGER.warning("Aquecimento: não foi possível ler a versão dos dados: %r", erro)
+            else:
+                if chave != self.chave or self.estado == 'erro':
+                    self._executar(chave)
+            marca = self._esperar(marca)
+
+    # Espera 'intervalo' segundos, ou menos se o arquivo de aviso mudar; devolve a marca dele.
+    def _esperar(self, marca):
+        if not self.aviso:
+            self._parar.wait(self.intervalo)
+            return marca
+        limite = time.monotonic() + self.intervalo
+        while not self._parar.wait(min(ESPERA_AVISO, max(0.0, limite - time.monotonic()))):
+            atual = _marca_aviso(self.aviso)
+            if atual != marca:
+                self.avisos += 1
+                return atual
+            if time.monotonic() >= limite:
+                break
+        return marca
+
+    def _executar(self, chave):
+        self.estado, self.inicio, self.fim, self.erro = 'aquecendo', datetime.now(), None, None
+        inicio = time.perf_counter()
+        try:
+            self.aquecer(chave)
+        except Exception as erro:
+            self.estado, self.erro = 'erro', repr(erro)
+            _LOGGER.exception("Aquecimento dos caches falhou")
+        else:
+            self.estado = 'concluido'
+            _LOGGER.info("Caches aquecidos em %.1f s", time.perf_counter() - inicio)
+        self.chave = chave
+        self.fim = datetime.now()
+        self.execucoes += 1
+
+    @property
+    def concluido(self):
+        return self.estado == 'concluido'
+
+    def status(self):
+        segundos = (self.fim - self.inicio).total_seconds() if self.inicio and self.fim else None
+        return {
+            'estado': self.estado,
+            'inicio': self.inicio.isoformat(timespec='seconds') if self.inicio else None,
+            'fim': self.fim.isoformat(timespec='seconds') if self.fim else None,
+            'segundos': segundos,
+            'execucoes': self.execucoes,
+            'avisos': self.avisos,
+            'erro': self.erro,
+        }
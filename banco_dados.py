@@ -0,0 +1,333 @@
+# banco_dados.py - Camada de acesso ao banco SQLite do dashboard
+import os
+import pathlib
+import sqlite3
+import pandas as pd
+
+import esquema
+
+# DASHBOARD_BANCO_DADOS aponta o dashboard para outro arquivo (ex.: bancos sintéticos dos benchmarks).
+NOME_BANCO_DADOS = os.environ.get('DASHBOARD_BANCO_DADOS', 'meu_dashboard.db')
+
+# --- ÍNDICES COMPOSTOS (nome_plano, data_posicao) ---
+# As páginas de plano filtram sempre por plano e ordenam/agrupam por data; sem estes índices
+# cada consulta por plano vira uma varredura completa da tabela.
+INDICES_COMPOSTOS = {
+    "idx_investimentos_plano_data": ("investimentos", "nome_plano, data_posicao"),
+    "idx_imoveis_emprestimos_plano_data": ("imoveis_emprestimos", "nome_plano, data_posicao"),
+    "idx_ativos_plano_data": ("ativos", "nome_plano, data_posicao"),
+    "idx_planos_plano_data": ("planos", "nome_plano, data_posicao"),
+    "idx_segmentos_plano_data": ("segmentos", "nome_plano, data_posicao"),
+}
+
+# --- VERSÕES POR TABELA ---
+# Cada escrita (inclusive por scripts manuais) incrementa o contador da tabela via gatilho; o
+# dashboard compara esses contadores para decidir o que reler, sem depender de tempo de expiração.
+TABELAS_VERSIONADAS = ('investimentos', 'imoveis_emprestimos', 'ativos', 'indices_taxas', 'planos', 'segmentos',
+                       'cadastro_fundos')
+
+# Tabelas cujas versões invalidam cada carga. investimentos traz o gestor copiado de cadastro_fundos,
+# e a cópia muda sem mudar a versão de investimentos (ver COLUNAS_CADASTRO).
+DEPENDENCIAS_VERSAO = {
+    'investimentos': ('investimentos', 'cadastro_fundos'),
+    'imoveis_emprestimos': ('imoveis_emprestimos',),
+    'ativos': ('ativos',),
+    'indices_taxas': ('indices_taxas',),
+    'planos': ('planos',),
+    'segmentos': ('segmentos',),
+    'resumos': ('investimentos', 'imoveis_emprestimos', 'cadastro_fundos'),
+}
+
+# --- CONSULTAS BASE ---
+# Cada consulta traz também o rowid da tabela principal ('rowid_carga'), usado pela carga incremental
+# para buscar só as linhas novas. O prefixo indica como qualificar colunas no WHERE.
+CONSULTAS_TABELAS = {
+    'investimentos': ("SELECT rowid AS rowid_carga, id, data_posicao, nome_plano, codigo_isin_fundo, nome_fundo, "
+                      "segmento, valor_cota, quantidade_cotas, valor_total, gestor FROM investimentos", ""),
+    'imoveis_emprestimos': ("SELECT rowid AS rowid_carga, * FROM imoveis_emprestimos", ""),
+    'ativos': ("SELECT rowid AS rowid_carga, * FROM Ativos", ""),
+    'indices_taxas': ("SELECT rowid AS rowid_carga, * FROM indices_taxas", ""),
+    'planos': ("SELECT rowid AS rowid_carga, * FROM Planos", ""),
+    'segmentos': ("SELECT rowid AS rowid_carga, * FROM Segmentos", ""),
+}
+
+
+# --- GESTOR, ADMINISTRADOR E CNPJ COPIADOS PARA investimentos ---
+# Os dados do fundo saem de cadastro_fundos uma vez, na escrita, em vez de um JOIN a cada carga e a cada
+# recálculo de resumo. Os gatilhos mantêm a cópia: a posição inserida recebe os dados do seu ISIN, e uma
+# mudança no cadastro regrava só as posições daquele ISIN (idx_investimentos_isin). Fundo sem cadastro
+# fica com NULL, lido como 'Não Cadastrado'.
+# A cópia não conta como alteração de investimentos: o gatilho de versão de UPDATE ignora estas colunas
+# (senão cada importação pareceria uma correção e forçaria a releitura completa). Quem usa o gestor
+# depende também da versão de cadastro_fundos (DEPENDENCIAS_VERSAO).
+COLUNAS_CADASTRO = ('gestor', 'administrator', 'cnpj')
+
+# Colunas copiadas de outra tabela, por tabela; o gatilho de versão de UPDATE não olha para elas.
+COLUNAS_COPIADAS = {'investimentos': COLUNAS_CADASTRO}
+
+INDICES_CADASTRO = {
+    "idx_investimentos_isin": ("investimentos", "codigo_isin_fundo"),
+    # Cobre o agrupamento do resumo por gestor (data, plano, gestor, soma do valor) sem ler a tabela.
+    "idx_investimentos_data_gestor": ("investimentos", "data_posicao, nome_plano, gestor, valor_total"),
+}
+
+_COPIAR_CADASTRO = ", ".join(f"{coluna} = {{origem}}.{coluna}" for coluna in COLUNAS_CADASTRO)
+_LIMPAR_CADASTRO = ", ".join(f"{coluna} = NULL" for coluna in COLUNAS_CADASTRO)
+_CADASTRO_DIFERENTE = " OR ".join(f"{{destino}}.{coluna} IS NOT {{origem}}.{coluna}" for coluna in COLUNAS_CADASTRO)
+
+GATILHOS_CADASTRO = {
+    # Quem já grava a posição com os dados do cadastro (importacao.py) não paga o UPDATE, só a consulta.
+    "trg_investimentos_cadastro_ins": f"""
+        CREATE TRIGGER trg_investimentos_cadastro_ins AFTER INSERT ON investimentos
+        WHEN EXISTS (SELECT 1 FROM cadastro_fundos cad WHERE cad.codigo_isin = NEW.codigo_isin_fundo
+                     AND ({_CADASTRO_DIFERENTE.format(destino='NEW', origem='cad')}))
+        BEGIN
+            UPDATE investimentos SET {_COPIAR_CADASTRO.format(origem='cad')} FROM cadastro_fundos cad
+            WHERE investimentos.rowid = NEW.rowid AND cad.codigo_isin = NEW.codigo_isin_fundo;
+        END""",
+    "trg_investimentos_cadastro_isin": f"""
+        CREATE TRIGGER trg_investimentos_cadastro_isin AFTER UPDATE OF codigo_isin_fundo ON investimentos
+        BEGIN
+            UPDATE investimentos SET {_LIMPAR_CADASTRO} WHERE rowid = NEW.rowid;
+            UPDATE investimentos SET {_COPIAR_CADASTRO.format(origem='cad')} FROM cadastro_fundos cad
+            WHERE investimentos.rowid = NEW.rowid AND cad.codigo_isin = NEW.codigo_isin_fundo;
+        END""",
+    "trg_cadastro_investimentos_ins": f"""
+        CREATE TRIGGER trg_cadastro_investimentos_ins AFTER INSERT ON cadastro_fundos
+        BEGIN
+            UPDATE investimentos SET {_COPIAR_CADASTRO.format(origem='NEW')}
+            WHERE codigo_isin_fundo = NEW.codigo_isin AND ({_CADASTRO_DIFERENTE.format(destino='investimentos', origem='NEW')});
+        END""",
+    "trg_cadastro_investimentos_upd": f"""
+        CREATE TRIGGER trg_cadastro_investimentos_upd AFTER UPDATE OF {', '.join(COLUNAS_CADASTRO)}, codigo_isin
+        ON cadastro_fundos
+        BEGIN
+            UPDATE investimentos SET {_LIMPAR_CADASTRO}
+            WHERE codigo_isin_fundo = OLD.codigo_isin AND OLD.codigo_isin IS NOT NEW.codigo_isin;
+            UPDATE investimentos SET {_COPIAR_CADASTRO.format(origem='NEW')}
+            WHERE codigo_isin_fundo = NEW.codigo_isin AND ({_CADASTRO_DIFERENTE.format(destino='investimentos', origem='NEW')});
+        END""",
+    "trg_cadastro_investimentos_del": f"""
+        CREATE TRIGGER trg_cadastro_investimentos_del AFTER DELETE ON cadastro_fundos
+        BEGIN
+            UPDATE investimentos SET {_LIMPAR_CADASTRO} WHERE codigo_isin_fundo = OLD.codigo_isin;
+        END""",
+}
+
+
+def conectar(caminho=NOME_BANCO_DADOS):
+    return sqlite3.connect(caminho)
+
+
+# Conexão que só lê (falha em qualquer escrita); várias podem ler o arquivo ao mesmo tempo.
+def conectar_leitura(caminho=NOME_BANCO_DADOS):
+    return sqlite3.connect(f"{pathlib.Path(caminho).resolve().as_uri()}?mode=ro", uri=True)
+
+
+# WAL: leitores não esperam por quem está gravando (importações) e leem em paralelo entre si.
+# O modo fica gravado no arquivo; basta ativá-lo uma vez, numa conexão que pode escrever.
+def garantir_wal(conn):
+    return conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+
+
+def garantir_indices(conn):
+    for nome_indice, (tabela, colunas) in INDICES_COMPOSTOS.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {nome_indice} ON {tabela} ({colunas})")
+    conn.commit()
+
+
+# Cria o gatilho, ou o recria se a definição gravada no banco for diferente. Não toca no
+# esquema quando nada mudou, para não invalidar à toa as cargas chaveadas pela versão do esquema.
+def criar_gatilho(conn, nome, definicao):
+    atual = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?", (nome,)).fetchone()
+    if atual and atual[0].strip() == definicao.strip():
+        return
+    conn.execute(f"DROP TRIGGER IF EXISTS {nome}")
+    conn.execute(definicao)
+
+
+# Cria as colunas copiadas do cadastro (na primeira vez, preenchendo todas as posições), os índices e os
+# gatilhos que as mantêm.
+def garantir_cadastro_investimentos(conn):
+    existentes = {linha[1] for linha in conn.execute("PRAGMA table_info(investimentos)")}
+    novas = [coluna for coluna in COLUNAS_CADASTRO if coluna not in existentes]
+    for coluna in novas:
+        conn.execute(f"ALTER TABLE investimentos ADD COLUMN {coluna} TEXT")
+    for nome_indice, (tabela, colunas) in INDICES_CADASTRO.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {nome_indice} ON {tabela} ({colunas})")
+    for nome, definicao in GATILHOS_CADASTRO.items():
+        criar_gatilho(conn, nome, definicao)
+    if novas:
+        preencher_cadastro(conn)
+    conn.commit()
+
+
+# {codigo_isin: (gestor, administrator, cnpj)} de todo o cadastro, para quem grava posições em lote.
+def ler_cadastro_copiado(conn):
+    return {linha[0]: tuple(linha[1:]) for linha in
+            conn.execute(f"SELECT codigo_isin, {', '.join(COLUNAS_CADASTRO)} FROM cadastro_fundos")}
+
+
+# Recopia o cadastro para as posições dos ISINs informados (ou de todos) e devolve quantas linhas mudaram.
+# Só regrava as posições cuja cópia está diferente do cadastro; serve para bancos alterados com os
+# gatilhos desligados ou para conferir a cópia.
+def preencher_cadastro(conn, isins=None):
+    if isins is None:
+        return _preencher_cadastro(conn, "", [])
+    isins = list(isins)
+    alteradas = 0
+    for inicio in range(0, len(isins), 500):
+        lote = isins[inicio:inicio + 500]
+        alteradas += _preencher_cadastro(conn, f" WHERE codigo_isin_fundo IN ({', '.join('?' * len(lote))})", lote)
+    return alteradas
+
+
+def _preencher_cadastro(conn, filtro, parametros):
+    return conn.execute(f"""
+        UPDATE investimentos SET {_COPIAR_CADASTRO.format(origem='fonte')}
+        FROM (SELECT isin.codigo_isin_fundo, {', '.join(f'cad.{coluna}' for coluna in COLUNAS_CADASTRO)}
+              FROM (SELECT DISTINCT codigo_isin_fundo FROM investimentos{filtro}) isin
+              LEFT JOIN cadastro_fundos cad ON cad.codigo_isin = isin.codigo_isin_fundo) fonte
+        WHERE investimentos.codigo_isin_fundo = fonte.codigo_isin_fundo
+          AND ({_CADASTRO_DIFERENTE.format(destino='investimentos', origem='fonte')})""", parametros).rowcount
+
+
+# UPDATE só das colunas copiadas de outra tabela não é alteração da tabela (ver COLUNAS_COPIADAS).
+def _evento_versao(conn, tabela, evento):
+    copiadas = COLUNAS_COPIADAS.get(tabela)
+    if evento != 'UPDATE' or not copiadas:
+        return evento
+    colunas = [linha[1] for linha in conn.execute(f"PRAGMA table_info({tabela})") if linha[1] not in copiadas]
+    return f"UPDATE OF {', '.join(colunas)}"
+
+
+# A linha IDENTIDADE_BANCO guarda um número aleatório sorteado na primeira preparação do arquivo. Os
+# contadores só dizem quantas escritas houve, e dois arquivos com o mesmo histórico (um banco trocado
+# por uma cópia, um git pull) chegam às mesmas versões; a identidade entra na chave das cargas para que
+# instantâneos e caches de um arquivo nunca sirvam para outro.
+IDENTIDADE_BANCO = 'identidade_banco'
+
+
+# 'versao' conta qualquer escrita; 'alteracoes' só UPDATE/DELETE. Se apenas 'versao' andou, houve
+# somente inserções e a carga incremental pode buscar só as linhas novas.
+def garantir_versionamento(conn):
+    conn.execute("CREATE TABLE IF NOT EXISTS versao_tabelas (tabela TEXT PRIMARY KEY, versao INTEGER NOT NULL)")
+    colunas = [linha[1] for linha in conn.execute("PRAGMA table_info(versao_tabelas)")]
+    if 'alteracoes' not in colunas:
+        conn.execute("ALTER TABLE versao_tabelas ADD COLUMN alteracoes INTEGER NOT NULL DEFAULT 0")
+    conn.execute("INSERT OR IGNORE INTO versao_tabelas (tabela, versao) VALUES (?, abs(random()))", (IDENTIDADE_BANCO,))
+    for tabela in TABELAS_VERSIONADAS:
+        conn.execute("INSERT OR IGNORE INTO versao_tabelas (tabela, versao) VALUES (?, 0)", (tabela,))
+        criar_gatilho(conn, f"trg_{tabela}_versao_insert", f"""
+            CREATE TRIGGER trg_{tabela}_versao_insert AFTER INSERT ON {tabela}
+            BEGIN UPDATE versao_tabelas SET versao = versao + 1 WHERE tabela = '{tabela}'; END""")
+        for evento in ('UPDATE', 'DELETE'):
+            nome = f"trg_{tabela}_versao_{evento.lower()}"
+            criar_gatilho(conn, nome, f"""
+            CREATE TRIGGER {nome} AFTER {_evento_versao(conn, tabela, evento)} ON {tabela}
+            BEGIN
+                UPDATE versao_tabelas SET versao = versao + 1, alteracoes = alteracoes + 1 WHERE tabela = '{tabela}';
+            END""")
+    conn.commit()
+
+
+# --- UPSERT PELA CHAVE ---
+# INSERT ... ON CONFLICT DO UPDATE só das colunas informadas; as demais ficam como estão. O WHERE evita
+# regravar linhas idênticas (um UPDATE sem mudança ainda dispararia os gatilhos e contaria como
+# alteração para a carga incremental). Colunas em 'sem_comparar' são gravadas junto com uma mudança
+# real, mas sozinhas não contam como mudança (ex.: data da importação).
+def sql_upsert(tabela, colunas, chave, sem_comparar=()):
+    atualizadas = [coluna for coluna in colunas if coluna not in chave]
+    comparadas = [coluna for coluna in atualizadas if coluna not in sem_comparar]
+    sql = (f"INSERT INTO {tabela} ({', '.join(colunas)}) VALUES ({', '.join('?' * len(colunas))}) "
+           f"ON CONFLICT ({', '.join(chave)}) DO ")
+    if not comparadas:
+        return sql + "NOTHING"
+    return (sql + "UPDATE SET " + ", ".join(f"{coluna} = excluded.{coluna}" for coluna in atualizadas)
+            + " WHERE " + " OR ".join(f"{coluna} IS NOT excluded.{coluna}" for coluna in comparadas))
+
+
+# Versões atuais de todas as tabelas como (versao, alteracoes), mais a versão do esquema e a identidade
+# do arquivo.
+def ler_versoes(conn):
+    versoes = {tabela: (versao, alteracoes)
+               for tabela, versao, alteracoes in conn.execute("SELECT tabela, versao, alteracoes FROM versao_tabelas")}
+    versoes['identidade'] = versoes.pop(IDENTIDADE_BANCO, (None, 0))[0]
+    versoes['esquema'] = conn.execute("PRAGMA schema_version").fetchone()[0]
+    return versoes
+
+
+def chave_versao(versoes, carga):
+    return (versoes['identidade'], versoes['esquema']) + tuple(versoes.get(tabela, (0, 0))
+                                                              for tabela in DEPENDENCIAS_VERSAO[carga])
+
+
+def colunas_tabela(conn, tabela):
+    return tuple((linha[1], linha[2]) for linha in conn.execute(f"PRAGMA table_info({tabela})"))
+
+
+def contar_linhas(conn, tabela):
+    return conn.execute(f"SELECT COUNT(*) FROM {tabela}").fetchone()[0]
+
+
+# (maior rowid, número de linhas): confere se uma cópia da tabela ainda corresponde ao banco.
+def marca_tabela(conn, tabela):
+    return tuple(conn.execute(f"SELECT COALESCE(MAX(rowid), 0), COUNT(*) FROM {tabela}").fetchone())
+
+
+# --- CONVERSÃO DE TIPOS APÓS A LEITURA ---
+def _converter_tipos(tabela, df):
+    if df.empty:
+        return df
+    df['data_posicao'] = pd.to_datetime(df['data_posicao'])
+    if tabela in ('investimentos', 'imoveis_emprestimos'):
+        df['valor_total'] = pd.to_numeric(df['valor_total'], errors='coerce')
+    if tabela == 'investimentos':
+        df['gestor'] = df['gestor'].fillna('Não Cadastrado')
+    return esquema.aplicar(tabela, df)
+
+
+# --- LEITURA DAS TABELAS ---
+# Filtro de plano opcional; 'apos_rowid' limita a leitura às linhas inseridas depois da última carga.
+# Com 'com_rowid' a coluna 'rowid_carga' é mantida no resultado.
+def ler_tabela(conn, tabela, nome_plano=None, apos_rowid=None, com_rowid=False):
+    consulta, prefixo = CONSULTAS_TABELAS[tabela]
+    condicoes, parametros = [], []
+    if nome_plano is not None:
+        condicoes.append(f"{prefixo}nome_plano = ?")
+        parametros.append(nome_plano)
+    if apos_rowid is not None:
+        condicoes.append(f"{prefixo}rowid > ?")
+        parametros.append(apos_rowid)
+    if condicoes:
+        consulta = f"{consulta} WHERE {' AND '.join(condicoes)}"
+    if apos_rowid is not None:
+        consulta = f"{consulta} ORDER BY {prefixo}rowid"
+    df = pd.read_sql_query(consulta, conn, params=parametros)
+    if not com_rowid:
+        df = df.drop(columns='rowid_carga')
+    return _converter_tipos(tabela, df)
+
+
+def ler_investimentos(conn, nome_plano=None):
+    return ler_tabela(conn, 'investimentos', nome_plano)
+
+
+def ler_imoveis(conn, nome_plano=None):
+    return ler_tabela(conn, 'imoveis_emprestimos', nome_plano)
+
+
+def ler_ativos(conn, nome_plano=None):
+    return ler_tabela(conn, 'ativos', nome_plano)
+
+
+def ler_indices(conn):
+    return ler_tabela(conn, 'indices_taxas')
+
+
+def ler_planos(conn, nome_plano=None):
+    return ler_tabela(conn, 'planos', nome_plano)
+
+
+def ler_segmentos(conn, nome_plano=None):
+    return ler_tabela(conn, 'segmentos', nome_plano)
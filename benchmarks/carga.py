@@ -0,0 +1,375 @@
+# carga.py - Teste de carga: N sessões simultâneas navegando pelo dashboard num servidor Streamlit local
+#
+# Uso:
+#   python benchmarks/carga.py --usuarios 1 10 25 --acoes 20
+#   python benchmarks/carga.py --escala 10 --usuarios 20 --pausa 0.5 --saida carga.json
+#
+# Sobe 'streamlit run dashboard.py' numa porta livre, apontado para uma cópia do banco (ou um banco
+# sintético), e conecta cada usuário simulado pelo mesmo websocket que o navegador usa
+# (/_stcore/stream). Cada usuário executa uma sequência aleatória (reproduzível pela semente) de
+# ações: trocar de página na barra lateral, trocar a data da composição, as datas da variação ou a
+# quantidade de fundos/gestores dos rankings. Como no navegador, widgets dentro de um @st.fragment
+# pedem só o rerun do fragmento. A latência vai do envio do pedido de rerun até o 'script_finished'.
+# Os níveis de --usuarios rodam em sequência contra o mesmo servidor (o primeiro já encontra os caches
+# do aquecimento). Sai um JSON com vazão, percentis de latência por nível, por ação e por página, e
+# o RSS do processo do servidor amostrado durante o teste.
+#
+# O AppTest não serve aqui: cada execução cria e derruba o Runtime do processo, então não há como
+# rodar várias sessões ao mesmo tempo nele.
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from datetime import datetime
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from tornado.websocket import websocket_connect
+
+import gerar_dados  # noqa: E402  (mesma pasta)
+
+RAIZ = gerar_dados.RAIZ
+PAGINAS = ("🏠", "InvestPrev", "Plano A", "VidaPrev", "Assistencial", "PGA")
+ACOES = ('navegar', 'data_composicao', 'datas_variacao', 'ranking')
+PESOS_ACOES = (4, 2, 2, 2)
+TIPOS_WIDGET = ('radio', 'selectbox', 'slider')
+
+ROTULO_COMPOSICAO = "Selecione a data para análise da composição:"
+ROTULO_DATA_INICIAL = "Selecione a Data Inicial:"
+ROTULO_DATA_FINAL = "Selecione a Data Final:"
+
+
+# --- SERVIDOR ---
+def _porta_livre():
+    with socket.socket() as sock:
+        sock.bind(('localhost', 0))
+        return sock.getsockname()[1]
+
+
+def iniciar_servidor(caminho_banco, porta, espera=60):
+    env = dict(os.environ, DASHBOARD_BANCO_DADOS=caminho_banco, DASHBOARD_METRICAS="")
+    servidor = subprocess.Popen(
+        [sys.executable, '-m', 'streamlit', 'run', os.path.join(RAIZ, 'dashboard.py'),
+         '--server.headless', 'true', '--server.port', str(porta), '--server.fileWatcherType', 'none',
+         '--browser.gatherUsageStats', 'false'],
+        cwd=RAIZ, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    limite = time.monotonic() + espera
+    while time.monotonic() < limite:
+        if servidor.poll() is not None:
+            raise RuntimeError(f"O servidor terminou ao iniciar: {servidor.stderr.read().decode(errors='replace')}")
+        try:
+            with urllib.request.urlopen(f"http://localhost:{porta}/_stcore/health", timeout=1):
+                return servidor
+        except OSError:
+            time.sleep(0.2)
+    servidor.kill()
+    raise RuntimeError(f"O servidor não respondeu em {espera} s")
+
+
+def parar_servidor(servidor):
+    servidor.terminate()
+    try:
+        servidor.wait(10)
+    except subprocess.TimeoutExpired:
+        servidor.kill()
+        servidor.wait()
+
+
+# --- RSS DO SERVIDOR ---
+def rss_processo(pid):
+    try:
+        with open(f'/proc/{pid}/statm') as arquivo:
+            return int(arquivo.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+
+class MonitorRss(threading.Thread):
+    def __init__(self, pid, intervalo=0.2):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.intervalo = intervalo
+        self.amostras = []
+        self._parar = threading.Event()
+
+    def _amostrar(self):
+        rss = rss_processo(self.pid)
+        if rss is not None:
+            self.amostras.append(rss)
+
+    def run(self):
+        while not self._parar.is_set():
+            self._amostrar()
+            self._parar.wait(self.intervalo)
+
+    def parar(self):
+        self._parar.set()
+        self.join()
+        self._amostrar()
+        if not self.amostras:
+            return {}
+        return {'inicial_bytes': self.amostras[0], 'pico_bytes': max(self.amostras),
+                'final_bytes': self.amostras[-1]}
+
+
+# --- UMA SESSÃO (O QUE O NAVEGADOR FARIA) ---
+# 'widgets' guarda o último proto de cada widget na tela e o fragmento em que ele está; 'estados'
+# guarda os valores que o usuário escolheu, reenviados a cada rerun como o navegador faz.
+class Sessao:
+    def __init__(self, ws):
+        self.ws = ws
+        self.widgets = {}
+        self.estados = {}
+
+    async def rerun(self, alterados=(), fragmento=""):
+        for estado in alterados:
+            self.estados[estado.id] = estado
+        mensagem = BackMsg()
+        mensagem.rerun_script.query_string = ""
+        mensagem.rerun_script.page_script_hash = ""
+        mensagem.rerun_script.fragment_id = fragmento
+        mensagem.rerun_script.widget_states.widgets.extend(
+            estado for id_widget, estado in self.estados.items() if id_widget in self.widgets)
+
+        inicio = time.perf_counter()
+        await self.ws.write_message(mensagem.SerializeToString(), binary=True)
+        vistos, excecoes, tamanho = {}, [], 0
+        while True:
+            bruto = await self.ws.read_message()
+            if bruto is None:
+                raise ConnectionError("websocket fechado pelo servidor")
+            tamanho += len(bruto)
+            recebida = ForwardMsg()
+            recebida.ParseFromString(bruto)
+            tipo = recebida.WhichOneof('type')
+            if tipo == 'script_finished':
+                break
+            if tipo != 'delta' or recebida.delta.WhichOneof('type') != 'new_element':
+                continue
+            elemento = recebida.delta.new_element
+            tipo_elemento = elemento.WhichOneof('type')
+            if tipo_elemento in TIPOS_WIDGET:
+                proto = getattr(elemento, tipo_elemento)
+                vistos[proto.id] = (tipo_elemento, proto, recebida.delta.fragment_id)
+            elif tipo_elemento == 'exception':
+                excecoes.append(elemento.exception.message)
+        segundos = time.perf_counter() - inicio
+
+        # Rerun de fragmento só redesenha os widgets do fragmento; os demais continuam na tela
+        if fragmento:
+            self.widgets = {id_widget: dados for id_widget, dados in self.widgets.items() if dados[2] != fragmento}
+            self.widgets.update(vistos)
+        else:
+            self.widgets = vistos
+        return segundos, tamanho, excecoes
+
+    def widget(self, tipo, rotulo=None, sufixo=None):
+        for id_widget, (tipo_widget, proto, fragmento) in self.widgets.items():
+            if tipo_widget != tipo:
+                continue
+            if (rotulo is not None and proto.label == rotulo) or (sufixo is not None and id_widget.endswith(sufixo)):
+                return proto, fragmento
+        return None, None
+
+
+# Devolve (página depois da ação, estados alterados, fragmento) ou None se a página não tem o widget.
+def preparar_acao(sessao, acao, pagina, rng):
+    if acao == 'navegar':
+        radio, _ = sessao.widget('radio', sufixo="pagina_selecionada")
+        if radio is None:
+            return None
+        destino = rng.choice([p for p in radio.options if p != pagina])
+        return destino, [WidgetState(id=radio.id, int_value=list(radio.options).index(destino))], ""
+
+    if acao == 'data_composicao':
+        seletor, fragmento = sessao.widget('selectbox', rotulo=ROTULO_COMPOSICAO)
+        if seletor is None or not seletor.options:
+            return None
+        return pagina, [WidgetState(id=seletor.id, string_value=rng.choice(seletor.options))], fragmento
+
+    if acao == 'datas_variacao':
+        inicial, fragmento = sessao.widget('selectbox', rotulo=ROTULO_DATA_INICIAL)
+        final, _ = sessao.widget('selectbox', rotulo=ROTULO_DATA_FINAL)
+        if inicial is None or final is None or len(inicial.options) < 2:
+            return None
+        primeira, ultima = sorted(rng.sample(range(len(inicial.options)), 2))
+        return pagina, [WidgetState(id=inicial.id, string_value=inicial.options[primeira]),
+                        WidgetState(id=final.id, string_value=final.options[ultima])], fragmento
+
+    slider, fragmento = sessao.widget('slider', sufixo=rng.choice(['num_fundos', 'num_gestores']))
+    if slider is None or slider.min >= slider.max:
+        return None
+    estado = WidgetState(id=slider.id)
+    estado.double_array_value.data.append(rng.randint(int(slider.min), int(slider.max)))
+    return pagina, [estado], fragmento
+
+
+# --- UM USUÁRIO SIMULADO ---
+async def usuario(url, indice, acoes, pausa, semente, resultados, erros, largada):
+    rng = random.Random(semente * 1000 + indice)
+    try:
+        ws = await websocket_connect(url, max_message_size=1 << 30)
+    except Exception as erro:
+        erros.append(f"conexão: {erro!r}")
+        largada.chegou()
+        return
+    try:
+        sessao = Sessao(ws)
+        pagina = PAGINAS[0]
+        largada.chegou()
+        await largada.wait()
+        for numero in range(acoes + 1):
+            acao, alterados, fragmento = 'abrir', (), ""
+            if numero > 0:
+                acao = rng.choices(ACOES, PESOS_ACOES)[0]
+                preparada = preparar_acao(sessao, acao, pagina, rng)
+                if preparada is None:
+                    acao = 'navegar'
+                    preparada = preparar_acao(sessao, acao, pagina, rng)
+                if preparada is None:
+                    erros.append(f"{acao} em {pagina}: página sem a barra lateral")
+                    break
+                pagina, alterados, fragmento = preparada
+            try:
+                segundos, tamanho, excecoes = await sessao.rerun(alterados, fragmento)
+            except Exception as erro:  # a conexão caiu: o usuário para, o erro entra no relatório
+                erros.append(f"{acao} em {pagina}: {erro!r}")
+                break
+            resultados.append({'acao': acao, 'pagina': pagina, 'tipo': 'fragmento' if fragmento else 'pagina',
+                               'segundos': segundos, 'bytes': tamanho})
+            erros.extend(f"{acao} em {pagina}: {mensagem}" for mensagem in excecoes)
+            if pausa:
+                await asyncio.sleep(rng.uniform(0, 2 * pausa))
+    finally:
+        ws.close()
+
+
+def _percentis(segundos):
+    if not segundos:
+        return {}
+    ordenados = sorted(segundos)
+
+    def percentil(p):
+        return ordenados[min(len(ordenados) - 1, round(p / 100 * (len(ordenados) - 1)))] * 1000
+    return {'reruns': len(ordenados), 'p50_ms': percentil(50), 'p95_ms': percentil(95),
+            'p99_ms': percentil(99), 'max_ms': ordenados[-1] * 1000,
+            'media_ms': statistics.fmean(ordenados) * 1000}
+
+
+def _agrupar(resultados, campo):
+    grupos = {}
+    for resultado in resultados:
+        grupos.setdefault(resultado[campo], []).append(resultado['segundos'])
+    return {nome: _percentis(segundos) for nome, segundos in grupos.items()}
+
+
+# --- UM NÍVEL DE CONCORRÊNCIA ---
+# Todos os usuários conectam antes da largada, para o nível medir só os reruns.
+class Largada(asyncio.Event):
+    def __init__(self, usuarios):
+        super().__init__()
+        self.faltam = usuarios
+
+    def chegou(self):
+        self.faltam -= 1
+        if self.faltam <= 0:
+            self.set()
+
+
+async def _rodar_usuarios(url, usuarios, acoes, pausa, semente, resultados, erros):
+    largada = Largada(usuarios)
+    tarefas = [asyncio.create_task(usuario(url, i, acoes, pausa, semente, resultados, erros, largada))
+               for i in range(usuarios)]
+    await largada.wait()
+    inicio = time.perf_counter()
+    await asyncio.gather(*tarefas)
+    return time.perf_counter() - inicio
+
+
+def rodar_nivel(url, pid_servidor, usuarios, acoes, pausa, semente):
+    resultados, erros = [], []
+    monitor = MonitorRss(pid_servidor)
+    monitor.start()
+    duracao = asyncio.run(_rodar_usuarios(url, usuarios, acoes, pausa, semente, resultados, erros))
+    return {
+        'usuarios': usuarios,
+        'duracao_s': duracao,
+        'reruns': len(resultados),
+        'vazao_reruns_por_s': len(resultados) / duracao if duracao else 0.0,
+        'latencia': _percentis([r['segundos'] for r in resultados]),
+        'por_acao': _agrupar(resultados, 'acao'),
+        'por_pagina': _agrupar(resultados, 'pagina'),
+        'por_tipo': _agrupar(resultados, 'tipo'),
+        'bytes_por_rerun': statistics.fmean([r['bytes'] for r in resultados]) if resultados else 0,
+        'rss_servidor': monitor.parar(),
+        'erros': len(erros),
+        'exemplos_erros': erros[:10],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga com sessões simultâneas do dashboard.")
+    parser.add_argument('--usuarios', nargs='+', type=int, default=[1, 5, 10])
+    parser.add_argument('--acoes', type=int, default=20, help="ações por usuário, além da abertura")
+    parser.add_argument('--pausa', type=float, default=0.0,
+                        help="tempo médio de leitura entre ações, em segundos (0: sem pausa)")
+    parser.add_argument('--banco', default=gerar_dados.BANCO_MODELO, help="banco a usar (é copiado)")
+    parser.add_argument('--escala', type=float, default=None, help="gera e usa um banco sintético desta escala")
+    parser.add_argument('--porta', type=int, default=None, help="porta do servidor (padrão: uma livre)")
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--saida', help="arquivo JSON de saída (padrão: stdout)")
+    args = parser.parse_args(argv)
+
+    pasta = tempfile.mkdtemp(prefix='carga_')
+    servidor = None
+    try:
+        caminho = os.path.join(pasta, 'banco.db')
+        if args.escala:
+            gerar_dados.gerar_banco(caminho, semente=args.semente, **gerar_dados.dimensoes_da_escala(args.escala))
+        else:
+            shutil.copyfile(args.banco, caminho)
+
+        porta = args.porta or _porta_livre()
+        servidor = iniciar_servidor(caminho, porta)
+        url = f"ws://localhost:{porta}/_stcore/stream"
+        rss_inicial = rss_processo(servidor.pid)
+        aquecimento = rodar_nivel(url, servidor.pid, 1, 0, 0.0, args.semente)
+        niveis = [rodar_nivel(url, servidor.pid, usuarios, args.acoes, args.pausa, args.semente)
+                  for usuarios in args.usuarios]
+        relatorio = {
+            'gerado_em': datetime.now().isoformat(timespec='seconds'),
+            'banco': f"sintetico (escala {args.escala:g})" if args.escala else args.banco,
+            'linhas': gerar_dados.contar_linhas(caminho),
+            'acoes_por_usuario': args.acoes,
+            'pausa_s': args.pausa,
+            'rss_servidor_antes_bytes': rss_inicial,
+            'abertura_fria_s': aquecimento['latencia'].get('max_ms', 0) / 1000,
+            'niveis': niveis,
+        }
+    finally:
+        if servidor is not None:
+            parar_servidor(servidor)
+        shutil.rmtree(pasta, ignore_errors=True)
+
+    texto = json.dumps(relatorio, ensure_ascii=False, indent=2)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(texto)
+    else:
+        print(texto)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,205 @@
+# gerar_dados.py - Gera bancos SQLite sintéticos com o mesmo esquema do meu_dashboard.db, em escala maior
+#
+# Uso:
+#   python benchmarks/gerar_dados.py saida.db --escala 100
+#   python benchmarks/gerar_dados.py saida.db --datas 240 --fundos 800 --planos-extras 4 --indices-extras 10
+#
+# A escala 1 reproduz o tamanho do banco real (20 datas mensais, 40 fundos, ~2.400 linhas em
+# investimentos); a escala N multiplica esse volume por ~N, repartindo o aumento entre datas e fundos.
+import argparse
+import math
+import os
+import sqlite3
+import sys
+
+import numpy as np
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BANCO_MODELO = os.path.join(RAIZ, 'meu_dashboard.db')
+
+# --- DIMENSÕES DO BANCO REAL (ESCALA 1) ---
+DATAS_BASE = 20
+FUNDOS_BASE = 40
+MAX_FATOR_DATAS = 30  # 600 meses; acima disso o volume cresce só em fundos
+ULTIMA_DATA = '2025-08-31'
+
+# (nome em investimentos/imoveis_emprestimos, nome em ativos/planos/segmentos)
+PLANOS_BASE = [
+    ('001 - PLANO A - BD', 'PLANO A - BD'),
+    ('002 - PLANO B - BD', 'PLANO B - BD'),
+    ('003 - INVESTPREV', 'INVESTPREV'),
+    ('004 - VIDAPREV', 'VIDAPREV'),
+    ('009 - PLANO ASSISTENCIAL', 'PLANO ASSISTENCIAL'),
+    ('500 - PGA GERAL', 'PGA GERAL'),
+]
+SEGMENTOS = ['RENDA FIXA', 'RENDA VARIÁVEL', 'EXTERIOR', 'ESTRUTURADO']
+SEGMENTOS_IMOVEIS = ['IMOBILIÁRIO', 'OPERACAO COM PARTICIPANTES']
+
+# Tabelas que o próprio dashboard cria ao abrir o banco (resumos, versões) ficam de fora do modelo.
+PREFIXOS_IGNORADOS = ('sqlite_', 'resumo', 'versao_tabelas')
+
+
+# --- ESCALA -> DIMENSÕES ---
+# O fator de datas cresce com a raiz da escala (até MAX_FATOR_DATAS); o restante vai para os fundos.
+def dimensoes_da_escala(escala):
+    fator_datas = min(max(1, round(math.sqrt(escala))), MAX_FATOR_DATAS)
+    return {
+        'datas': DATAS_BASE * fator_datas,
+        'fundos': max(1, round(FUNDOS_BASE * escala / fator_datas)),
+    }
+
+
+def _estrutura_modelo(caminho_modelo):
+    conn = sqlite3.connect(caminho_modelo)
+    try:
+        return [sql for nome, sql in conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'table' ORDER BY rowid")
+                if not nome.startswith(PREFIXOS_IGNORADOS)]
+    finally:
+        conn.close()
+
+
+def _colunas_indices(conn):
+    return [linha[1] for linha in conn.execute("PRAGMA table_info(indices_taxas)") if linha[1] != 'data_posicao']
+
+
+def _inserir(conn, tabela, colunas):
+    nomes = list(colunas)
+    valores = [colunas[nome].tolist() if isinstance(colunas[nome], np.ndarray) else list(colunas[nome])
+               for nome in nomes]
+    conn.executemany(f"INSERT INTO {tabela} ({', '.join(nomes)}) VALUES ({', '.join('?' * len(nomes))})",
+                     zip(*valores))
+
+
+# --- GERAÇÃO ---
+# Cada fundo entra na carteira de metade dos planos; valores seguem um passeio aleatório por data.
+# A mesma semente gera sempre o mesmo banco.
+def gerar_banco(caminho, datas=DATAS_BASE, fundos=FUNDOS_BASE, planos_extras=0, indices_extras=0, semente=0,
+                caminho_modelo=BANCO_MODELO):
+    if os.path.exists(caminho):
+        os.remove(caminho)
+    rng = np.random.default_rng(semente)
+
+    planos = PLANOS_BASE + [(f"{600 + k:03d} - PLANO SINTETICO {k + 1}", f"PLANO SINTETICO {k + 1}")
+                            for k in range(planos_extras)]
+    datas_posicao = pd.date_range(end=ULTIMA_DATA, periods=datas, freq='ME').strftime('%Y-%m-%d').to_numpy()
+    n_datas, n_planos = len(datas_posicao), len(planos)
+
+    id_fundo = np.arange(fundos)
+    nomes_fundos = np.array([f"FUNDO SINTETICO {i + 1:05d}" for i in id_fundo])
+    isins = np.array([f"BRSINT{i:06d}" for i in id_fundo])
+    segmento_fundo = np.array(SEGMENTOS)[id_fundo % len(SEGMENTOS)]
+    n_gestores = max(1, fundos // 4)
+    gestores = np.array([f"GESTORA SINTETICA {i % n_gestores + 1:04d}" for i in id_fundo])
+
+    # Pares (plano, fundo) da carteira
+    plano_par, fundo_par = np.nonzero((np.arange(n_planos)[:, None] + id_fundo[None, :]) % 2 == 0)
+    n_pares = len(plano_par)
+    nomes_inv = np.array([nome for nome, _ in planos])
+    nomes_ativos = np.array([nome for _, nome in planos])
+
+    conn = sqlite3.connect(caminho)
+    try:
+        for ddl in _estrutura_modelo(caminho_modelo):
+            conn.execute(ddl)
+        for k in range(indices_extras):
+            conn.execute(f"ALTER TABLE indices_taxas ADD COLUMN indice_sintetico_{k + 1} REAL")
+
+        _inserir(conn, 'cadastro_fundos', {
+            'cardeal': np.array([f"SINT {i + 1:05d}" for i in id_fundo]), 'nome_fundo': nomes_fundos,
+            'segmento': segmento_fundo, 'cnpj': np.array([f"{i:02d}.000.000/0001-{i % 100:02d}" for i in id_fundo]),
+            'gestor': gestores, 'administrator': np.array([f"ADMINISTRADORA {i % 5 + 1}" for i in id_fundo]),
+            'codigo_isin': isins, 'data_importacao': np.full(fundos, ULTIMA_DATA),
+        })
+
+        # investimentos: uma linha por data e par (plano, fundo)
+        valor_inicial = rng.uniform(1e5, 5e7, n_pares)
+        crescimento = np.cumprod(1 + rng.normal(0.006, 0.02, (n_datas, n_pares)), axis=0)
+        valor_total = np.round(valor_inicial[None, :] * crescimento, 2)
+        valor_cota = np.round(rng.uniform(1, 5, n_pares)[None, :] * crescimento, 7)
+        _inserir(conn, 'investimentos', {
+            'data_posicao': np.repeat(datas_posicao, n_pares), 'nome_plano': np.tile(nomes_inv[plano_par], n_datas),
+            'codigo_isin_fundo': np.tile(isins[fundo_par], n_datas),
+            'nome_fundo': np.tile(nomes_fundos[fundo_par], n_datas),
+            'segmento': np.tile(segmento_fundo[fundo_par], n_datas),
+            'valor_cota': valor_cota.ravel(), 'quantidade_cotas': (valor_total / valor_cota).ravel(),
+            'valor_total': valor_total.ravel(),
+        })
+
+        # imoveis_emprestimos: imobiliário nos planos de índice par, empréstimos só no primeiro
+        pares_imoveis = [(nomes_inv[p], SEGMENTOS_IMOVEIS[0]) for p in range(0, n_planos, 2)]
+        pares_imoveis.append((nomes_inv[0], SEGMENTOS_IMOVEIS[1]))
+        _inserir(conn, 'imoveis_emprestimos', {
+            'data_posicao': np.repeat(datas_posicao, len(pares_imoveis)),
+            'nome_plano': np.tile([plano for plano, _ in pares_imoveis], n_datas),
+            'segmento': np.tile([segmento for _, segmento in pares_imoveis], n_datas),
+            'valor_total': np.round(rng.uniform(1e5, 2e7, n_datas * len(pares_imoveis)), 2),
+        })
+
+        # Rentabilidades mensais em %, como no banco real
+        _inserir(conn, 'ativos', {
+            'data_posicao': np.repeat(datas_posicao, n_pares), 'nome_plano': np.tile(nomes_ativos[plano_par], n_datas),
+            'segmento': np.tile(segmento_fundo[fundo_par], n_datas),
+            'nome_fundo': np.tile(nomes_fundos[fundo_par], n_datas),
+            'rentabilidade': np.round(rng.normal(0.8, 1.5, n_datas * n_pares), 4),
+        })
+        _inserir(conn, 'planos', {
+            'data_posicao': np.repeat(datas_posicao, n_planos), 'nome_plano': np.tile(nomes_ativos, n_datas),
+            'rentabilidade_plano': np.round(rng.normal(0.8, 0.6, n_datas * n_planos), 4),
+        })
+        segmentos_plano = [(plano, segmento) for plano in nomes_ativos for segmento in SEGMENTOS]
+        segmentos_plano += [(nomes_ativos[p], SEGMENTOS_IMOVEIS[0]) for p in range(0, n_planos, 2)]
+        _inserir(conn, 'segmentos', {
+            'data_posicao': np.repeat(datas_posicao, len(segmentos_plano)),
+            'nome_plano': np.tile([plano for plano, _ in segmentos_plano], n_datas),
+            'segmento': np.tile([segmento for _, segmento in segmentos_plano], n_datas),
+            'Rentabilidade': np.round(rng.normal(0.8, 1.0, n_datas * len(segmentos_plano)), 4),
+        })
+
+        # indices_taxas: taxas mensais em fração, uma coluna por índice
+        colunas_indices = _colunas_indices(conn)
+        _inserir(conn, 'indices_taxas', {
+            'data_posicao': datas_posicao,
+            **{coluna: rng.normal(0.008, 0.01, n_datas) for coluna in colunas_indices},
+        })
+        conn.commit()
+    finally:
+        conn.close()
+    return caminho
+
+
+def contar_linhas(caminho):
+    conn = sqlite3.connect(caminho)
+    try:
+        return {tabela: conn.execute(f"SELECT COUNT(*) FROM {tabela}").fetchone()[0]
+                for tabela in ('investimentos', 'imoveis_emprestimos', 'ativos', 'indices_taxas', 'planos',
+                               'segmentos', 'cadastro_fundos')}
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera um banco sintético com o esquema do meu_dashboard.db.")
+    parser.add_argument('saida', help="arquivo .db a criar (sobrescrito se existir)")
+    parser.add_argument('--escala', type=float, default=None,
+                        help="multiplicador do volume do banco real; define datas e fundos")
+    parser.add_argument('--datas', type=int, default=None, help="número de datas mensais")
+    parser.add_argument('--fundos', type=int, default=None, help="número de fundos")
+    parser.add_argument('--planos-extras', type=int, default=0, help="planos sintéticos além dos seis reais")
+    parser.add_argument('--indices-extras', type=int, default=0, help="colunas extras em indices_taxas")
+    parser.add_argument('--semente', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    dimensoes = dimensoes_da_escala(args.escala) if args.escala else {'datas': DATAS_BASE, 'fundos': FUNDOS_BASE}
+    if args.datas:
+        dimensoes['datas'] = args.datas
+    if args.fundos:
+        dimensoes['fundos'] = args.fundos
+    gerar_banco(args.saida, planos_extras=args.planos_extras, indices_extras=args.indices_extras,
+                semente=args.semente, **dimensoes)
+    print(f"{args.saida}: {dimensoes}, linhas {contar_linhas(args.saida)}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
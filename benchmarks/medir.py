@@ -0,0 +1,329 @@
+# medir.py - Mede latência e pico de memória da carga de dados e de cada seção das páginas
+#
+# Uso:
+#   python benchmarks/medir.py                                # mede o meu_dashboard.db
+#   python benchmarks/medir.py --escalas 1 10 100 --saida resultado.json
+#   python benchmarks/medir.py --banco outro.db --repeticoes 5
+#
+# Cada banco é copiado para uma pasta temporária (índices, gatilhos, resumos e instantâneos que o
+# dashboard cria não tocam o original) e medido num processo próprio, para que a partida a frio e o
+# pico de memória de um banco não contaminem os do próximo. O resultado sai em JSON: por medição, a
+# mediana e o mínimo dos tempos (s) e o pico de memória alocada durante a execução (bytes, via
+# tracemalloc, numa execução à parte para não pesar nos tempos).
+# Os resumos são medidos também em cada motor de agregacoes.py, calculados do zero; as tabelas em que
+# um motor difere do 'sqlite' aparecem em 'resumos.<motor>.diferencas'. O DuckDB só entra se estiver
+# instalado.
+import argparse
+import ast
+import importlib.util
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import gerar_dados  # noqa: E402  (mesma pasta)
+
+
+# --- CONSTANTES DO DASHBOARD ---
+# dashboard.py desenha a página ao ser importado; os dicionários de configuração são lidos do fonte.
+def constantes_dashboard(*nomes):
+    with open(os.path.join(RAIZ, 'dashboard.py'), encoding='utf-8') as arquivo:
+        arvore = ast.parse(arquivo.read())
+    valores = {no.targets[0].id: ast.literal_eval(no.value) for no in arvore.body
+               if isinstance(no, ast.Assign) and isinstance(no.targets[0], ast.Name) and no.targets[0].id in nomes}
+    return tuple(valores[nome] for nome in nomes)
+
+
+PAGINAS = {"🏠": None, "InvestPrev": "INVESTPREV", "Plano A": "PLANO A", "VidaPrev": "VIDAPREV",
+           "Assistencial": "ASSISTENCIAL", "PGA": "PGA"}
+
+
+# --- MEDIÇÃO DE UM PASSO ---
+# 'preparar' (opcional) roda antes de cada execução, fora do tempo medido.
+def medir(funcao, repeticoes, preparar=None):
+    tempos = []
+    for _ in range(repeticoes):
+        if preparar:
+            preparar()
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    if preparar:
+        preparar()
+    tracemalloc.start()
+    try:
+        funcao()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'segundos_mediana': statistics.median(tempos), 'segundos_min': min(tempos),
+            'pico_memoria_bytes': pico}
+
+
+# --- SEÇÕES DAS PÁGINAS, SEM STREAMLIT ---
+# Os mesmos cálculos que cada seção faz por rerun (ver analise.py), com as seleções padrão das páginas.
+def secoes_pagina(resumos_, tabelas, nome_plano=None, df_ativos_plano=None):
+    import analise
+
+    mapa_nomes_planos, = constantes_dashboard('MAPA_NOMES_PLANOS')
+
+    df_resumo_data, df_resumo_plano, df_resumo_segmento, df_resumo_fundo, df_resumo_gestor = resumos_
+    df_evolucao = analise.evolucao_patrimonio(df_resumo_data, df_resumo_plano, nome_plano)
+    meses = analise.meses_posicao(df_evolucao)
+    data = meses[-1]
+    patrimonio = analise.patrimonio_no_mes(df_evolucao, data)
+
+    def evolucao():
+        df = analise.evolucao_patrimonio(df_resumo_data, df_resumo_plano, nome_plano)
+        analise.patrimonio_mais_recente(df)
+
+    def variacao():
+        meses_variacao = analise.meses_posicao(df_evolucao)
+        analise.variacao_patrimonial(df_evolucao, meses_variacao[0], meses_variacao[-1])
+
+    def planos():
+        df_planos = analise.distribuicao_planos(df_resumo_plano, data, mapa_nomes_planos)
+        analise.tabela_participacao(df_planos[['Plano', 'valor_total']])
+        analise.evolucao_distribuicao_planos(df_resumo_plano, mapa_nomes_planos)
+
+    def segmentos():
+        analise.tabela_participacao(analise.distribuicao_segmentos(df_resumo_segmento, data, nome_plano))
+        analise.evolucao_distribuicao_segmentos(df_resumo_segmento, nome_plano)
+
+    def rankings():
+        for df_resumo, coluna in ((df_resumo_fundo, 'nome_fundo'), (df_resumo_gestor, 'gestor')):
+            analise.total_distintos(df_resumo, coluna, data, nome_plano)
+            analise.ranking(df_resumo, coluna, data, 10, patrimonio, nome_plano)
+
+    def rentabilidade():
+        df_indices = tabelas['indices_taxas']
+        matriz_indices = analise.matriz_indices(df_indices)
+        indicadores = [serie for serie in matriz_indices.series if serie == 'CDI']
+        if nome_plano is None:
+            matriz, tipos = analise.matriz_performance(tabelas['planos'], tabelas['segmentos'],
+                                                       'rentabilidade_plano', 'Rentabilidade')
+            selecoes = [(matriz, list(matriz.series[:2]), tipos)]
+        else:
+            matriz = analise.matriz_fundos(df_ativos_plano)
+            selecoes = [(matriz, list(matriz.series[:1]), 'Fundo')]
+        datas_matriz = matriz.datas.union(matriz_indices.datas)
+        if len(datas_matriz):
+            selecoes.append((matriz_indices, indicadores, 'Indicador'))
+            analise.curvas_rentabilidade(selecoes, datas_matriz.min(), datas_matriz.max())
+
+    secoes = {'evolucao': evolucao, 'variacao': variacao, 'segmentos': segmentos, 'rankings': rankings,
+              'rentabilidade': rentabilidade}
+    if nome_plano is None:
+        secoes['planos'] = planos
+    return secoes
+
+
+# --- MEDIÇÃO DE UM BANCO (PROCESSO FILHO) ---
+def medir_banco(caminho, repeticoes, com_paginas):
+    # O dashboard lê o caminho do banco na importação de banco_dados
+    os.environ['DASHBOARD_BANCO_DADOS'] = caminho
+    # Sem aquecimento em segundo plano: a primeira visita de cada página deve pagar os próprios caches
+    os.environ['DASHBOARD_AQUECIMENTO'] = '0'
+    import agregacoes
+    import banco_dados
+    import calendario
+    import carga_incremental
+    import resumos
+
+    tabelas_carga = tuple(banco_dados.CONSULTAS_TABELAS)
+    medicoes = {}
+
+    def preparar_banco():
+        conn = banco_dados.conectar(caminho)
+        try:
+            banco_dados.garantir_indices(conn)
+            banco_dados.garantir_versionamento(conn)
+            resumos.garantir_resumos(conn)
+            calendario.garantir_calendario(conn)
+            resumos.atualizar_resumos(conn)
+        finally:
+            conn.close()
+
+    def ler_versoes():
+        conn = banco_dados.conectar(caminho)
+        try:
+            return banco_dados.ler_versoes(conn)
+        finally:
+            conn.close()
+
+    inicio = time.perf_counter()
+    preparar_banco()
+    medicoes['preparar_banco'] = {'segundos_mediana': time.perf_counter() - inicio}
+    versoes = ler_versoes()
+
+    # carregar_dados: do SQLite (sem instantâneos), dos instantâneos Arrow e já em memória
+    pasta_vazia = tempfile.mkdtemp(prefix='instantaneos_')
+    pasta_cheia = tempfile.mkdtemp(prefix='instantaneos_')
+    carga_cheia = carga_incremental.CargaIncremental(caminho, pasta_cheia)
+    tabelas = {tabela: carga_cheia.obter(tabela, versoes) for tabela in tabelas_carga}
+
+    def limpar_pasta_vazia():
+        shutil.rmtree(pasta_vazia, ignore_errors=True)
+
+    def carregar(pasta):
+        carga_incremental.CargaIncremental(caminho, pasta).obter_varias(tabelas_carga, versoes)
+
+    medicoes['carregar_dados.sqlite'] = medir(lambda: carregar(pasta_vazia), repeticoes, limpar_pasta_vazia)
+    medicoes['carregar_dados.instantaneo'] = medir(lambda: carregar(pasta_cheia), repeticoes)
+    medicoes['carregar_dados.memoria'] = medir(
+        lambda: [carga_cheia.obter(tabela, versoes) for tabela in tabelas_carga], repeticoes)
+
+    def ler_resumos():
+        conn = banco_dados.conectar(caminho)
+        try:
+            return resumos.ler_resumos(conn)
+        finally:
+            conn.close()
+
+    medicoes['carregar_resumos'] = medir(ler_resumos, repeticoes)
+    resumos_ = ler_resumos()
+
+    # Resumos calculados do zero por motor: para o 'sqlite', todas as datas voltam para a fila.
+    def enfileirar_todas():
+        conn = banco_dados.conectar(caminho)
+        try:
+            conn.execute("""
+                INSERT OR IGNORE INTO resumo_pendente (data_posicao)
+                SELECT data_posicao FROM investimentos UNION SELECT data_posicao FROM imoveis_emprestimos""")
+            conn.commit()
+        finally:
+            conn.close()
+
+    pasta_parquet = agregacoes.exportar_parquet(caminho, tempfile.mkdtemp(prefix='parquet_'))
+    motores = {'sqlite': ('sqlite', caminho), 'pandas': ('pandas', caminho),
+               'pandas_parquet': ('pandas', pasta_parquet)}
+    if importlib.util.find_spec('duckdb'):
+        motores.update({'duckdb': ('duckdb', caminho), 'duckdb_parquet': ('duckdb', pasta_parquet)})
+    for nome, (motor, fonte) in motores.items():
+        try:
+            medicoes[f'resumos.{nome}'] = medir(lambda: agregacoes.calcular_resumos(motor, fonte), repeticoes,
+                                                enfileirar_todas if motor == 'sqlite' else None)
+        except Exception as erro:  # ex.: DuckDB sem a extensão sqlite e sem rede para baixá-la
+            medicoes[f'resumos.{nome}.erro'] = str(erro)
+            continue
+        diferencas = agregacoes.comparar_resumos(agregacoes.calcular_resumos(motor, fonte), resumos_)
+        if diferencas:
+            medicoes[f'resumos.{nome}.diferencas'] = diferencas
+    shutil.rmtree(pasta_parquet, ignore_errors=True)
+
+    # Seções de cada página
+    for nome, funcao in secoes_pagina(resumos_, tabelas).items():
+        medicoes[f'home.{nome}'] = medir(funcao, repeticoes)
+    configuracoes_planos, = constantes_dashboard('CONFIGURACOES_PLANOS')
+    for chave, config in configuracoes_planos.items():
+        conn = banco_dados.conectar(caminho)
+        try:
+            df_ativos_plano = banco_dados.ler_ativos(conn, config['filtro_ativos'])
+        finally:
+            conn.close()
+        for nome, funcao in secoes_pagina(resumos_, tabelas, config['filtro_investimentos'],
+                                          df_ativos_plano).items():
+            medicoes[f'plano.{chave}.{nome}'] = medir(funcao, repeticoes)
+
+    # Páginas inteiras pelo AppTest: primeira visita (caches do processo limpos) e rerun da mesma sessão
+    if com_paginas:
+        import streamlit as st
+        from streamlit.testing.v1 import AppTest
+
+        def limpar_caches():
+            st.cache_data.clear()
+            st.cache_resource.clear()
+
+        for pagina, chave in PAGINAS.items():
+            nome = 'pagina.home' if chave is None else f'pagina.{chave}'
+            app = {}
+
+            def primeira_visita():
+                app['at'] = AppTest.from_file(os.path.join(RAIZ, 'dashboard.py'), default_timeout=600)
+                app['at'].session_state['pagina_selecionada'] = pagina
+                app['at'].run()
+
+            medicoes[f'{nome}.primeira_visita'] = medir(primeira_visita, repeticoes, limpar_caches)
+            medicoes[f'{nome}.rerun'] = medir(lambda: app['at'].run(), repeticoes)
+            excecoes = [str(e.value) for e in app['at'].exception]
+            if excecoes:
+                medicoes[f'{nome}.excecoes'] = excecoes
+
+    shutil.rmtree(pasta_vazia, ignore_errors=True)
+    shutil.rmtree(pasta_cheia, ignore_errors=True)
+    return {
+        'linhas': gerar_dados.contar_linhas(caminho),
+        'medicoes': medicoes,
+        'pico_rss_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    }
+
+
+def _medir_em_subprocesso(origem, repeticoes, com_paginas):
+    with tempfile.TemporaryDirectory(prefix='benchmark_') as pasta:
+        copia = os.path.join(pasta, os.path.basename(origem))
+        shutil.copyfile(origem, copia)
+        comando = [sys.executable, os.path.abspath(__file__), '--medir-banco', copia,
+                   '--repeticoes', str(repeticoes)]
+        if not com_paginas:
+            comando.append('--sem-paginas')
+        saida = subprocess.run(comando, cwd=RAIZ, capture_output=True, text=True, check=True).stdout
+    return json.loads(saida.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark da carga de dados e das páginas do dashboard.")
+    parser.add_argument('--banco', nargs='*', default=[], help="bancos existentes a medir")
+    parser.add_argument('--escalas', nargs='*', type=float, default=[],
+                        help="escalas de bancos sintéticos a gerar e medir (ver gerar_dados.py)")
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--sem-paginas', action='store_true', help="não mede as páginas inteiras pelo AppTest")
+    parser.add_argument('--saida', help="arquivo JSON de saída (padrão: stdout)")
+    parser.add_argument('--medir-banco', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.medir_banco:
+        print(json.dumps(medir_banco(args.medir_banco, args.repeticoes, not args.sem_paginas)))
+        return 0
+
+    bancos = list(args.banco)
+    if not bancos and not args.escalas:
+        bancos = [gerar_dados.BANCO_MODELO]
+    resultados = []
+    with tempfile.TemporaryDirectory(prefix='bancos_sinteticos_') as pasta_sintetica:
+        for escala in args.escalas:
+            dimensoes = gerar_dados.dimensoes_da_escala(escala)
+            caminho = gerar_dados.gerar_banco(os.path.join(pasta_sintetica, f'escala_{escala:g}.db'), **dimensoes)
+            resultados.append({'banco': f'sintetico (escala {escala:g})', 'escala': escala, 'dimensoes': dimensoes,
+                               **_medir_em_subprocesso(caminho, args.repeticoes, not args.sem_paginas)})
+        for caminho in bancos:
+            resultados.append({'banco': caminho,
+                               **_medir_em_subprocesso(caminho, args.repeticoes, not args.sem_paginas)})
+
+    relatorio = {
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'repeticoes': args.repeticoes,
+        'bancos': resultados,
+    }
+    texto = json.dumps(relatorio, ensure_ascii=False, indent=2)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(texto)
+    else:
+        print(texto)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,80 @@
+# cache_figuras.py - Cache LRU das figuras Plotly já montadas, guardadas como JSON
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import plotly.io as pio
+
+
+# --- CACHE DE FIGURAS ---
+# A chave reúne tudo o que define a figura (página, gráfico, versão dos dados, data e seleções); o valor
+# é o JSON da figura. Num acerto a figura é reconstruída do JSON, sem refazer o pandas nem o Plotly
+# Express. Descarta as menos usadas quando passa do número de entradas ou do limite de memória.
+class CacheFiguras:
+    def __init__(self, limite_bytes=64 * 1024 * 1024, max_entradas=512):
+        self.limite_bytes = limite_bytes
+        self.max_entradas = max_entradas
+        self._figuras = OrderedDict()
+        self._bytes = 0
+        self._trava = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.descartes = 0
+
+    # Devolve a figura da chave; se não estiver em cache, chama construir() e guarda o resultado.
+    def obter(self, chave, construir):
+        return self.consultar(chave, construir)[0]
+
+    # Como obter(), devolvendo também (acerto, tamanho do JSON em bytes, segundos gastos em construir()).
+    def consultar(self, chave, construir):
+        with self._trava:
+            figura_json = self._figuras.get(chave)
+            if figura_json is not None:
+                self._figuras.move_to_end(chave)
+                self.acertos += 1
+            else:
+                self.falhas += 1
+        if figura_json is not None:
+            return pio.from_json(figura_json), True, len(figura_json), 0.0
+
+        inicio = time.perf_counter()
+        figura = construir()
+        figura_json = figura.to_json()
+        segundos = time.perf_counter() - inicio
+        self._guardar(chave, figura_json)
+        return figura, False, len(figura_json), segundos
+
+    def _guardar(self, chave, figura_json):
+        tamanho = sys.getsizeof(figura_json)
+        if tamanho > self.limite_bytes:
+            return
+        with self._trava:
+            anterior = self._figuras.pop(chave, None)
+            if anterior is not None:
+                self._bytes -= sys.getsizeof(anterior)
+            self._figuras[chave] = figura_json
+            self._bytes += tamanho
+            while self._bytes > self.limite_bytes or len(self._figuras) > self.max_entradas:
+                _, descartada = self._figuras.popitem(last=False)
+                self._bytes -= sys.getsizeof(descartada)
+                self.descartes += 1
+
+    def limpar(self):
+        with self._trava:
+            self._figuras.clear()
+            self._bytes = 0
+
+    def estatisticas(self):
+        with self._trava:
+            consultas = self.acertos + self.falhas
+            return {
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'taxa_acerto': self.acertos / consultas if consultas else 0.0,
+                'descartes': self.descartes,
+                'entradas': len(self._figuras),
+                'max_entradas': self.max_entradas,
+                'bytes': self._bytes,
+                'limite_bytes': self.limite_bytes,
+            }
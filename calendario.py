@@ -0,0 +1,89 @@
+# calendario.py - Dimensão de meses: chave inteira aaaamm nas tabelas e rótulos pt-BR prontos no banco
+#
+# Cada tabela com data_posicao ganha a coluna 'chave_mes' (ex.: 202401), gerada pelo próprio SQLite a
+# partir da data e indexada: filtros e agrupamentos por mês comparam inteiros, no banco e nos DataFrames.
+# A tabela 'calendario' tem uma linha por mês, com início e fim do mês e os rótulos usados nas páginas
+# ("Jan/2024", "Janeiro/2024", "Janeiro de 2024"); as opções dos seletores de mês saem dela, sem
+# montar dicionários de rótulos nem depender do locale a cada rerun.
+import calendar
+
+import pandas as pd
+
+import banco_dados
+import resumos
+
+MESES_ABREV = {1: 'Jan', 2: 'Fev', 3: 'Mar', 4: 'Abr', 5: 'Mai', 6: 'Jun', 7: 'Jul', 8: 'Ago', 9: 'Set', 10: 'Out',
+               11: 'Nov', 12: 'Dez'}
+MESES_COMPLETO = {1: 'Janeiro', 2: 'Fevereiro', 3: 'Março', 4: 'Abril', 5: 'Maio', 6: 'Junho', 7: 'Julho',
+                  8: 'Agosto', 9: 'Setembro', 10: 'Outubro', 11: 'Novembro', 12: 'Dezembro'}
+
+# Faixa fixa de meses: o calendário não precisa acompanhar as importações.
+ANO_INICIAL = 1990
+ANO_FINAL = 2099
+
+ESTRUTURA_CALENDARIO = """
+    CREATE TABLE IF NOT EXISTS calendario (
+        chave_mes INTEGER PRIMARY KEY, ano INTEGER NOT NULL, mes INTEGER NOT NULL, inicio_mes DATE NOT NULL,
+        fim_mes DATE NOT NULL, rotulo_curto TEXT NOT NULL, rotulo_longo TEXT NOT NULL, rotulo_extenso TEXT NOT NULL
+    )"""
+
+COLUNAS_CALENDARIO = ('chave_mes', 'ano', 'mes', 'inicio_mes', 'fim_mes', 'rotulo_curto', 'rotulo_longo',
+                      'rotulo_extenso')
+
+# --- CHAVE DO MÊS NAS TABELAS ---
+# Coluna gerada VIRTUAL (a única que o ALTER TABLE aceita): não ocupa espaço na linha, é calculada na
+# leitura e fica gravada no índice. Não aparece no PRAGMA table_info, então importações, sincronização
+# e gatilhos de versão continuam vendo só as colunas de dados.
+EXPRESSAO_CHAVE_MES = "CAST(substr(data_posicao, 1, 4) || substr(data_posicao, 6, 2) AS INTEGER)"
+
+TABELAS_MENSAIS = tuple(tabela for tabela in banco_dados.TABELAS_VERSIONADAS if tabela != 'cadastro_fundos') \
+    + tuple(resumos.ESTRUTURA_RESUMOS)
+
+
+def linhas_calendario(ano_inicial=ANO_INICIAL, ano_final=ANO_FINAL):
+    for ano in range(ano_inicial, ano_final + 1):
+        for mes in range(1, 13):
+            yield (ano * 100 + mes, ano, mes, f"{ano:04d}-{mes:02d}-01",
+                   f"{ano:04d}-{mes:02d}-{calendar.monthrange(ano, mes)[1]:02d}",
+                   f"{MESES_ABREV[mes]}/{ano}", f"{MESES_COMPLETO[mes]}/{ano}", f"{MESES_COMPLETO[mes]} de {ano}")
+
+
+def _colunas_com_geradas(conn, tabela):
+    return {linha[1] for linha in conn.execute(f"PRAGMA table_xinfo({tabela})")}
+
+
+# Cria (ou completa) o calendário e a chave_mes indexada nas tabelas mensais que já existem.
+def garantir_calendario(conn):
+    conn.execute(ESTRUTURA_CALENDARIO)
+    conn.executemany(banco_dados.sql_upsert('calendario', COLUNAS_CALENDARIO, ('chave_mes',)), linhas_calendario())
+    for tabela in TABELAS_MENSAIS:
+        colunas = _colunas_com_geradas(conn, tabela)
+        if 'data_posicao' not in colunas:
+            continue
+        if 'chave_mes' not in colunas:
+            conn.execute(f"ALTER TABLE {tabela} ADD COLUMN chave_mes INTEGER "
+                         f"GENERATED ALWAYS AS ({EXPRESSAO_CHAVE_MES}) VIRTUAL")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{tabela}_chave_mes ON {tabela} (chave_mes)")
+    conn.commit()
+
+
+# Calendário inteiro, indexado pela chave_mes em ordem crescente, com as datas já convertidas.
+def ler_calendario(conn):
+    df = pd.read_sql_query(f"SELECT {', '.join(COLUNAS_CALENDARIO)} FROM calendario ORDER BY chave_mes", conn,
+                           index_col='chave_mes')
+    df['inicio_mes'] = pd.to_datetime(df['inicio_mes'])
+    df['fim_mes'] = pd.to_datetime(df['fim_mes'])
+    return df
+
+
+# --- RÓTULOS ---
+# Series chave_mes -> rótulo dos meses presentes em 'chaves', na ordem do calendário; pronta para virar
+# as opções de um seletor (índice) e o format_func dele (.get).
+def rotulos_meses(df_calendario, chaves, coluna='rotulo_longo', decrescente=False):
+    meses = df_calendario.loc[df_calendario.index.isin(chaves), coluna]
+    return meses.iloc[::-1] if decrescente else meses
+
+
+# Rótulo de cada chave_mes, na ordem recebida (ex.: textos dos ticks do eixo x).
+def rotulos_chaves(df_calendario, chaves, coluna='rotulo_curto'):
+    return df_calendario[coluna].reindex(chaves).tolist()
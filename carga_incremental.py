@@ -0,0 +1,176 @@
+# carga_incremental.py - Mantém as tabelas do dashboard em memória e as atualiza só com o que mudou
+import contextlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import banco_dados
+import esquema
+import instantaneos
+
+
+# --- ESTADO DE UMA TABELA JÁ CARREGADA ---
+class EstadoTabela:
+    def __init__(self, df, chave, colunas, versoes_dependencias, ultimo_rowid, ultima_data, alteracoes):
+        self.df = df
+        self.chave = chave
+        self.colunas = colunas
+        self.versoes_dependencias = versoes_dependencias
+        self.ultimo_rowid = ultimo_rowid
+        self.ultima_data = ultima_data
+        self.alteracoes = alteracoes
+
+
+# O JSON dos metadados devolve listas; as chaves e versões são comparadas como tuplas.
+def _tupla(valor):
+    return tuple(_tupla(item) for item in valor) if isinstance(valor, list) else valor
+
+
+# Colunas inteiramente nulas no lote novo chegam como object; assumem o tipo já carregado
+# para que a emenda não altere o dtype da coluna.
+def _alinhar_tipos(df_novo, df_carregado):
+    tipos = {coluna: df_carregado[coluna].dtype for coluna in df_novo.columns
+             if coluna in df_carregado.columns and df_novo[coluna].isna().all()}
+    return df_novo.astype(tipos) if tipos else df_novo
+
+
+# --- CARGA INCREMENTAL ---
+# Lembra, por tabela, o maior rowid e a maior data_posicao já carregados. Quando a versão muda:
+#   - se só houve inserções, lê as linhas com rowid maior e as emenda no DataFrame em memória;
+#   - se houve UPDATE/DELETE, mudança de colunas, mudança numa tabela da qual a carga depende
+#     (cadastro_fundos para o gestor dos investimentos), linha nova com data anterior à última
+#     carregada ou contagem de linhas que não fecha (INSERT OR REPLACE), relê a tabela inteira.
+# Cada estado novo também é gravado como instantâneo colunar em disco. Numa partida a frio (processo
+# novo, nada em memória) a tabela sai do instantâneo mapeado em memória, já tipada; se o banco mudou
+# desde a gravação, o instantâneo serve de ponto de partida para a carga incremental. Só valem
+# instantâneos do mesmo arquivo (identidade em banco_dados.ler_versoes), e um instantâneo entregue sem
+# passar pela carga incremental precisa bater com o maior rowid e a contagem de linhas da tabela.
+# Os DataFrames entregues são compartilhados e nunca alterados aqui: cada atualização monta um
+# DataFrame novo, e quem ainda usa o anterior não é afetado.
+# Com 'conexoes' (um conexoes.PoolConexoes), as leituras usam conexões emprestadas do pool; sem ele,
+# cada leitura abre e fecha a sua conexão somente leitura.
+class CargaIncremental:
+    def __init__(self, caminho_banco=banco_dados.NOME_BANCO_DADOS, pasta_instantaneos=None, conexoes=None):
+        self.caminho_banco = caminho_banco
+        self.conexoes = conexoes
+        self.pasta_instantaneos = pasta_instantaneos or instantaneos.pasta_padrao(caminho_banco)
+        self._estados = {}
+        self._travas = {tabela: threading.Lock() for tabela in banco_dados.CONSULTAS_TABELAS}
+        self.recargas_completas = 0
+        self.recargas_incrementais = 0
+        self.leituras_instantaneo = 0
+
+    def obter(self, tabela, versoes):
+        chave = banco_dados.chave_versao(versoes, tabela)
+        estado = self._estados.get(tabela)
+        if estado is not None and estado.chave == chave:
+            return estado.df
+
+        with self._travas[tabela]:
+            estado = self._estados.get(tabela)
+            if estado is None:
+                estado = self._ler_instantaneo(tabela, versoes, chave)
+            if estado is not None and estado.chave == chave:
+                self._estados[tabela] = estado
+                return estado.df
+            with self._conexao() as conn:
+                novo_estado = None
+                if estado is not None:
+                    novo_estado = self._atualizar(conn, tabela, estado, versoes, chave)
+                if novo_estado is None:
+                    novo_estado = self._recarregar(conn, tabela, versoes, chave)
+            self._estados[tabela] = novo_estado
+            self._salvar_instantaneo(tabela, novo_estado)
+            return novo_estado.df
+
+    # Várias tabelas de uma vez, na ordem pedida. As que precisam ir ao disco são lidas ao mesmo tempo,
+    # cada uma na sua thread e na sua conexão somente leitura: enquanto uma converte tipos no pandas,
+    # as outras seguem lendo do SQLite (que solta o GIL durante a consulta). Erros sobem como em obter().
+    def obter_varias(self, tabelas, versoes):
+        atuais = {tabela: self._estados.get(tabela) for tabela in tabelas}
+        pendentes = [tabela for tabela, estado in atuais.items()
+                     if estado is None or estado.chave != banco_dados.chave_versao(versoes, tabela)]
+        if len(pendentes) <= 1:
+            return tuple(self.obter(tabela, versoes) for tabela in tabelas)
+        with ThreadPoolExecutor(max_workers=len(pendentes), thread_name_prefix='carga') as executor:
+            futuros = {tabela: executor.submit(self.obter, tabela, versoes) for tabela in pendentes}
+            return tuple(futuros[tabela].result() if tabela in futuros else self.obter(tabela, versoes)
+                         for tabela in tabelas)
+
+    def _conexao(self):
+        if self.conexoes is not None:
+            return self.conexoes.emprestar()
+        return contextlib.closing(banco_dados.conectar_leitura(self.caminho_banco))
+
+    def _ler_instantaneo(self, tabela, versoes, chave):
+        lido = instantaneos.ler(self.pasta_instantaneos, tabela)
+        if lido is None:
+            return None
+        df, metadados = lido
+        if metadados.get('esquema') != esquema.VERSAO_ESQUEMA or metadados.get('identidade') != versoes['identidade']:
+            return None
+        estado = EstadoTabela(
+            df=df, chave=_tupla(metadados['chave']), colunas=_tupla(metadados['colunas']),
+            versoes_dependencias=_tupla(metadados['versoes_dependencias']),
+            ultimo_rowid=metadados['ultimo_rowid'], ultima_data=metadados['ultima_data'],
+            alteracoes=metadados['alteracoes'])
+        if estado.chave == chave:
+            with self._conexao() as conn:
+                if banco_dados.marca_tabela(conn, tabela) != (estado.ultimo_rowid, len(df)):
+                    return None
+        self.leituras_instantaneo += 1
+        return estado
+
+    def _salvar_instantaneo(self, tabela, estado):
+        metadados = {
+            'esquema': esquema.VERSAO_ESQUEMA,
+            'identidade': estado.chave[0],
+            'chave': estado.chave,
+            'colunas': estado.colunas,
+            'versoes_dependencias': estado.versoes_dependencias,
+            'ultimo_rowid': estado.ultimo_rowid,
+            'alteracoes': estado.alteracoes,
+            'ultima_data': estado.ultima_data.isoformat() if estado.ultima_data is not None else None,
+        }
+        instantaneos.salvar(self.pasta_instantaneos, tabela, estado.df, metadados)
+
+    @staticmethod
+    def _versoes_dependencias(tabela, versoes):
+        return tuple(versoes.get(dependencia, (0, 0)) for dependencia in banco_dados.DEPENDENCIAS_VERSAO[tabela]
+                     if dependencia != tabela)
+
+    def _recarregar(self, conn, tabela, versoes, chave):
+        df = banco_dados.ler_tabela(conn, tabela, com_rowid=True)
+        ultimo_rowid = int(df['rowid_carga'].max()) if not df.empty else 0
+        df = df.drop(columns='rowid_carga')
+        self.recargas_completas += 1
+        return EstadoTabela(
+            df=df, chave=chave, colunas=banco_dados.colunas_tabela(conn, tabela),
+            versoes_dependencias=self._versoes_dependencias(tabela, versoes), ultimo_rowid=ultimo_rowid,
+            ultima_data=df['data_posicao'].max() if not df.empty else None,
+            alteracoes=versoes.get(tabela, (0, 0))[1])
+
+    # Retorna o novo estado com as linhas emendadas, ou None quando é preciso reler tudo.
+    def _atualizar(self, conn, tabela, estado, versoes, chave):
+        if versoes.get(tabela, (0, 0))[1] != estado.alteracoes:
+            return None
+        if self._versoes_dependencias(tabela, versoes) != estado.versoes_dependencias:
+            return None
+        if banco_dados.colunas_tabela(conn, tabela) != estado.colunas:
+            return None
+
+        df_novo = banco_dados.ler_tabela(conn, tabela, apos_rowid=estado.ultimo_rowid, com_rowid=True)
+        if not df_novo.empty and estado.ultima_data is not None and df_novo['data_posicao'].min() < estado.ultima_data:
+            return None
+        if len(estado.df) + len(df_novo) != banco_dados.contar_linhas(conn, tabela):
+            return None
+
+        ultimo_rowid, ultima_data, df = estado.ultimo_rowid, estado.ultima_data, estado.df
+        if not df_novo.empty:
+            ultimo_rowid = int(df_novo['rowid_carga'].max())
+            ultima_data = df_novo['data_posicao'].max()
+            df_novo = df_novo.drop(columns='rowid_carga')
+            df = esquema.concatenar([df, _alinhar_tipos(df_novo, df)]) if not df.empty else df_novo
+        self.recargas_incrementais += 1
+        return EstadoTabela(
+            df=df, chave=chave, colunas=estado.colunas, versoes_dependencias=estado.versoes_dependencias,
+            ultimo_rowid=ultimo_rowid, ultima_data=ultima_data, alteracoes=estado.alteracoes)
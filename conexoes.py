@@ -0,0 +1,142 @@
+# conexoes.py - Conexões somente leitura ao SQLite, abertas uma vez e emprestadas a cada leitura
+#
+# Abrir e fechar uma conexão por leitura joga fora o cache de páginas do SQLite a cada rerun. O pool
+# guarda até 'tamanho' conexões abertas e as empresta uma por vez: quem pede recebe uma livre, ou abre
+# uma nova se ainda houver vaga, ou espera alguém devolver. As conexões são criadas com
+# check_same_thread=False porque cada sessão do Streamlit (e a carga paralela) roda na sua thread; o
+# empréstimo garante que uma conexão nunca está em duas threads ao mesmo tempo.
+# Cada conexão abre com mode=ro e PRAGMA query_only, em autocommit (nenhuma transação fica aberta entre
+# empréstimos, então toda leitura vê a versão mais recente do banco em WAL), com mmap_size e cache_size
+# próprios. 'imutavel' acrescenta immutable=1: o SQLite deixa de travar e de conferir mudanças no
+# arquivo, o que só é seguro para cópias que ninguém grava (bancos de demonstração, benchmarks).
+import contextlib
+import pathlib
+import queue
+import sqlite3
+import threading
+import time
+
+
+class PoolConexoes:
+    def __init__(self, caminho, tamanho=6, mmap_bytes=256 * 1024 * 1024, cache_kib=16 * 1024, imutavel=False,
+                 espera_maxima=30.0):
+        self.caminho = caminho
+        self.tamanho = tamanho
+        self.mmap_bytes = mmap_bytes
+        self.cache_kib = cache_kib
+        self.imutavel = imutavel
+        self.espera_maxima = espera_maxima
+        # LIFO: a conexão devolvida por último, com o cache mais quente, sai primeiro. Cada None é uma
+        # vaga ainda sem conexão aberta; por ficarem no fundo, só são usadas quando todas as abertas
+        # estão emprestadas.
+        self._livres = queue.LifoQueue()
+        for _ in range(tamanho):
+            self._livres.put(None)
+        self._trava = threading.Lock()
+        self.abertas = 0
+        self.em_uso = 0
+        self.maximo_em_uso = 0
+        self.emprestimos = 0
+        self.esperas = 0
+        self.segundos_espera = 0.0
+        self.maior_espera = 0.0
+        self.esgotamentos = 0
+        self.descartes = 0
+
+    def _abrir(self):
+        parametros = "mode=ro&immutable=1" if self.imutavel else "mode=ro"
+        conn = sqlite3.connect(f"{pathlib.Path(self.caminho).resolve().as_uri()}?{parametros}", uri=True,
+                               check_same_thread=False, isolation_level=None)
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_bytes)}")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_kib)}")
+        conn.execute("PRAGMA query_only=ON")
+        with self._trava:
+            self.abertas += 1
+        return conn
+
+    def _retirar(self):
+        try:
+            return self._livres.get_nowait()
+        except queue.Empty:
+            pass
+        inicio = time.perf_counter()
+        try:
+            return self._livres.get(timeout=self.espera_maxima)
+        except queue.Empty:
+            with self._trava:
+                self.esgotamentos += 1
+            raise TimeoutError(f"Nenhuma conexão livre com o banco de dados após {self.espera_maxima:.0f} s")
+        finally:
+            espera = time.perf_counter() - inicio
+            with self._trava:
+                self.esperas += 1
+                self.segundos_espera += espera
+                self.maior_espera = max(self.maior_espera, espera)
+
+    # 'with pool.emprestar() as conn:'. Se a leitura falhar com erro do SQLite, a conexão é fechada e a
+    # vaga volta vazia (a próxima leitura abre outra), para que uma conexão em mau estado não circule.
+    @contextlib.contextmanager
+    def emprestar(self):
+        conn = self._retirar()
+        if conn is None:
+            try:
+                conn = self._abrir()
+            except Exception:
+                self._livres.put(None)
+                raise
+        with self._trava:
+            self.emprestimos += 1
+            self.em_uso += 1
+            self.maximo_em_uso = max(self.maximo_em_uso, self.em_uso)
+        descartar = False
+        try:
+            yield conn
+        except sqlite3.DatabaseError:
+            descartar = True
+            raise
+        finally:
+            with self._trava:
+                self.em_uso -= 1
+            if not descartar and conn.in_transaction:
+                conn.rollback()
+            if descartar:
+                self._descartar(conn)
+                self._livres.put(None)
+            else:
+                self._livres.put(conn)
+
+    def _descartar(self, conn):
+        conn.close()
+        with self._trava:
+            self.abertas -= 1
+            self.descartes += 1
+
+    # Fecha as conexões livres; as emprestadas seguem válidas até voltarem.
+    def fechar(self):
+        while True:
+            try:
+                conn = self._livres.get_nowait()
+            except queue.Empty:
+                break
+            if conn is not None:
+                conn.close()
+                with self._trava:
+                    self.abertas -= 1
+        for _ in range(self.tamanho - self.em_uso):
+            self._livres.put(None)
+
+    def estatisticas(self):
+        with self._trava:
+            return {
+                'tamanho': self.tamanho,
+                'abertas': self.abertas,
+                'em_uso': self.em_uso,
+                'maximo_em_uso': self.maximo_em_uso,
+                'emprestimos': self.emprestimos,
+                'esperas': self.esperas,
+                'segundos_espera': self.segundos_espera,
+                'maior_espera_segundos': self.maior_espera,
+                'esgotamentos': self.esgotamentos,
+                'descartes': self.descartes,
+                'imutavel': self.imutavel,
+            }
@@ -1,12 +1,34 @@
-# dashboard.py (v1.58.0 - Adição de Treemaps de Fundos e Gestores)
+# dashboard.py (v1.77.1 - Aquecimento na Subida do Servidor)
 import os
+import hmac
+import functools
+import time
 import streamlit as st
 import pandas as pd
-import sqlite3
 import base64
 import plotly.express as px
 import plotly.graph_objects as go
-import streamlit.components.v1 as components
+import agregacoes
+import analise
+import banco_dados
+import calendario
+import esquema
+import resumos
+import carga_incremental
+import conexoes
+import cache_figuras
+import formatacao
+import tabela_html
+import metricas
+import aquecimento
+
+# --- DADOS COMPARTILHADOS SOMENTE LEITURA ---
+# As tabelas, resumos e matrizes ficam em st.cache_resource: um único objeto por processo, entregue a
+# todas as sessões sem cópia nem pickle. Contrato: o código das páginas nunca altera esses DataFrames
+# (nada de df[col] = ..., inplace=True ou .loc[...] = ... sobre eles); para derivar, filtre, use
+# assign/rename ou monte um DataFrame novo. Com o Copy-on-Write do pandas, filtros e seleções sobre os
+# dados compartilhados não copiam nada até serem alterados, e a alteração nunca volta ao original.
+pd.set_option('mode.copy_on_write', True)
 
 # --- DICIONÁRIO DE CONFIGURAÇÃO DOS PLANOS ---
 CONFIGURACOES_PLANOS = {
@@ -37,6 +59,14 @@ CONFIGURACOES_PLANOS = {
     }
 }
 
+# --- RÓTULOS E CORES USADOS PELAS SEÇÕES DAS PÁGINAS ---
+MAPA_NOMES_PLANOS = {'001 - PLANO A - BD': 'Plano A', '003 - INVESTPREV': 'InvestPrev', '004 - VIDAPREV': 'VidaPrev',
+                     '009 - PLANO ASSISTENCIAL': 'Assistencial', '500 - PGA GERAL': 'PGA'}
+CORES_AZUIS = ['#0d47a1', '#1976d2', '#42a5f5', '#90caf9', '#bbdefb', '#e3f2fd']
+COLUNAS_TABELA_PLANOS = [('Plano', 'Plano', 'texto'), ('valor_total', 'Valor (R$)', 'moeda'), ('%', '%', 'percentual')]
+COLUNAS_TABELA_SEGMENTOS = [('segmento', 'Segmento', 'texto'), ('valor_total', 'Valor (R$)', 'moeda'),
+                            ('%', '%', 'percentual')]
+
 # --- CONFIGURAÇÃO DA PÁGINA ---
 st.set_page_config(
     page_title="Dashboard de Investimentos",
@@ -55,19 +85,6 @@ def get_image_as_base64(file):
     return base64.b64encode(data).decode()
 
 
-# --- FUNÇÃO AUXILIAR PARA FORMATAR NÚMEROS GRANDES ---
-def formatar_numero_br(num):
-    if pd.isna(num):
-        return ""
-    if abs(num) >= 1_000_000_000:
-        return f'{num / 1_000_000_000:.3f} B'.replace('.', ',')
-    if abs(num) >= 1_000_000:
-        return f'{num / 1_000_000:.3f} M'.replace('.', ',')
-    if abs(num) >= 1_000:
-        return f'{num / 1_000:.3f} K'.replace('.', ',')
-    return f'{num:,.2f}'.replace(",", "X").replace(".", ",").replace("X", ".")
-
-
 # --- FUNÇÃO PARA INJETAR CSS CUSTOMIZADO (VERSÃO FINAL SEM BORDA) ---
 def carregar_css():
     SIDEBAR_WIDTH = 260
@@ -212,81 +229,284 @@ def carregar_css():
 
 
 # --- FUNÇÕES DE DADOS ---
-NOME_BANCO_DADOS = 'meu_dashboard.db'
+NOME_BANCO_DADOS = banco_dados.NOME_BANCO_DADOS
+
+
+# --- INSTRUMENTAÇÃO (TEMPOS POR SEÇÃO, BYTES ENVIADOS E ACERTOS DE CACHE) ---
+# Cada rerun vira uma linha no registro JSONL (DASHBOARD_METRICAS; vazio desliga), ao lado do banco por
+# padrão. O painel de desempenho mostra o último rerun e os p50/p95 por página.
+@st.cache_resource
+def obter_registro_metricas():
+    caminho = os.environ.get('DASHBOARD_METRICAS', f"{NOME_BANCO_DADOS}.metricas.jsonl")
+    return metricas.RegistroMetricas(caminho) if caminho else None
+
+
+def nome_pagina(rotulo):
+    return "Home" if rotulo == "🏠" else rotulo
+
+
+def pagina_atual():
+    return nome_pagina(st.session_state.get("pagina_selecionada", "🏠"))
+
+
+# Decorador das seções; num fragmento refeito sozinho a página vem da navegação.
+def medir_secao(nome):
+    return metricas.secao(nome, pagina=pagina_atual)
+
+
+# Seção em @st.fragment. Na thread de aquecimento não há sessão e o Streamlit não executa fragmentos,
+# então lá a seção roda direto.
+def fragmento(funcao):
+    secao_fragmento = st.fragment(funcao)
+
+    @functools.wraps(funcao)
+    def executar(*args, **kwargs):
+        if aquecimento.em_aquecimento():
+            return funcao(*args, **kwargs)
+        return secao_fragmento(*args, **kwargs)
+    return executar
+
+
+def exibir_grafico(figura):
+    inicio = time.perf_counter()
+    st.plotly_chart(figura, use_container_width=True)
+    metricas.registrar_envio('plotly', time.perf_counter() - inicio, figura=figura)
+
+
+def exibir_html(html):
+    inicio = time.perf_counter()
+    st.html(html)
+    metricas.registrar_envio('html', time.perf_counter() - inicio, len(html.encode('utf-8')))
+
+
+# Tabela de tabela_html.py, montada só quando o conteúdo muda; vai inline na página, sem iframe.
+def exibir_tabela(df, colunas, **kwargs):
+    metricas.registrar_consulta_cache('tabelas')
+    html, acerto = tabela_html.consultar(df, colunas, **kwargs)
+    if not acerto:
+        metricas.registrar_falha_cache('tabelas')
+    exibir_html(html)
+
+
+# Painel só para administradores: ?debug=<DASHBOARD_TOKEN_ADMIN> na URL.
+def modo_admin():
+    token = os.environ.get('DASHBOARD_TOKEN_ADMIN')
+    informado = st.query_params.get("debug")
+    return bool(token) and informado is not None and hmac.compare_digest(informado, token)
+
+
+# --- PREPARAÇÃO DO BANCO (ÍNDICES, VERSÕES E TABELAS DE RESUMO), UMA VEZ POR PROCESSO ---
+@st.cache_resource
+def preparar_banco():
+    conn = banco_dados.conectar(NOME_BANCO_DADOS)
+    try:
+        banco_dados.garantir_wal(conn)
+        banco_dados.garantir_indices(conn)
+        banco_dados.garantir_versionamento(conn)
+        resumos.garantir_resumos(conn)
+        calendario.garantir_calendario(conn)
+    finally:
+        conn.close()
+    return True
+
+
+# --- CONEXÕES SOMENTE LEITURA COMPARTILHADAS PELO PROCESSO ---
+# Todas as leituras (versões, tabelas, ativos por plano) usam conexões emprestadas deste pool, em vez de
+# abrir e fechar uma por leitura; o cache de páginas e o mmap de cada conexão sobrevivem entre reruns.
+# As escritas (preparação do banco, recálculo dos resumos) seguem com conexões próprias.
+# DASHBOARD_POOL_CONEXOES muda o tamanho; DASHBOARD_BANCO_IMUTAVEL=1 só para bancos que ninguém grava.
+@st.cache_resource
+def obter_conexoes():
+    return conexoes.PoolConexoes(
+        NOME_BANCO_DADOS, tamanho=int(os.environ.get('DASHBOARD_POOL_CONEXOES', 6)),
+        imutavel=os.environ.get('DASHBOARD_BANCO_IMUTAVEL') == '1')
+
+
+def _ler_do_banco(leitor, *args):
+    with obter_conexoes().emprestar() as conn:
+        return leitor(conn, *args)
+
+
+# --- CALENDÁRIO: RÓTULOS DOS MESES, LIDOS DO BANCO UMA VEZ POR PROCESSO ---
+# Os seletores de mês têm como opções as chaves_mes (inteiros aaaamm) e mostram o rótulo do calendário;
+# o mês escolhido filtra os resumos pela coluna chave_mes (ver analise.py).
+@st.cache_resource
+def obter_calendario():
+    return _ler_do_banco(calendario.ler_calendario)
+
+
+# Series chave_mes -> rótulo dos meses em 'chaves', para st.selectbox(opções=.index, format_func=.get).
+def meses_calendario(chaves, coluna='rotulo_longo', decrescente=False):
+    return calendario.rotulos_meses(obter_calendario(), chaves, coluna, decrescente)
+
+
+# Textos dos ticks do eixo x ("Jan/2024") para as chaves_mes dos pontos.
+def rotulos_eixo(chaves):
+    return calendario.rotulos_chaves(obter_calendario(), chaves)
+
+
+# --- VERSÕES DAS TABELAS: UMA CONSULTA BARATA POR RERUN DECIDE O QUE PRECISA SER RELIDO ---
+def ler_versoes_banco():
+    return _ler_do_banco(banco_dados.ler_versoes)
+
+
+# --- CARGA INCREMENTAL COMPARTILHADA PELO PROCESSO ---
+# Guarda as tabelas em memória; quando a versão de uma tabela muda, busca só as linhas novas
+# (ou relê a tabela, se houve correção retroativa ou mudança de esquema). Num processo novo, as tabelas
+# saem dos instantâneos Arrow gravados ao lado do banco, sem consultar nem reconverter o SQLite.
+@st.cache_resource
+def obter_carga_incremental():
+    return carga_incremental.CargaIncremental(NOME_BANCO_DADOS, conexoes=obter_conexoes())
+
+
+# Carrega só as tabelas pedidas, cada uma pela sua versão atual; as que precisam ir ao banco são lidas
+# em paralelo. Devolve os DataFrames compartilhados da carga incremental, sem cópia (ver o contrato de
+# somente leitura no início do arquivo). Quem chaveia um cache pela versão passa as 'versoes' já lidas,
+# para que dados e chave venham da mesma leitura.
+@medir_secao("dados")
+def carregar_tabelas(*nomes_tabelas, versoes=None):
+    try:
+        versoes = versoes or ler_versoes_banco()
+        return obter_carga_incremental().obter_varias(nomes_tabelas, versoes)
+
+    except Exception as e:
+        st.error(f"Erro ao carregar os dados do banco de dados: {e}")
+        return tuple(pd.DataFrame() for _ in nomes_tabelas)
 
 
 # --- FUNÇÃO PARA CARREGAR E CACHEAR OS DADOS ---
-@st.cache_data(ttl=600)
 def carregar_dados():
+    # A função agora retorna os seis DataFrames
+    return carregar_tabelas('investimentos', 'imoveis_emprestimos', 'ativos', 'indices_taxas', 'planos', 'segmentos')
+
+
+# --- CARGA POR PLANO: SÓ AS LINHAS DO PLANO SELECIONADO SAEM DO BANCO ---
+# O patrimônio do plano vem das tabelas de resumo; aqui ficam só a rentabilidade dos ativos e os índices.
+@st.cache_resource(max_entries=len(CONFIGURACOES_PLANOS))
+def carregar_ativos_plano(filtro_ativos, chave_versao):
+    metricas.registrar_falha_cache('ativos_plano')
+    return _ler_do_banco(banco_dados.ler_ativos, filtro_ativos)
+
+
+@medir_secao("dados")
+def carregar_dados_plano(nome_plano_key, versoes=None):
+    config = CONFIGURACOES_PLANOS[nome_plano_key]
     try:
-        conn = sqlite3.connect(NOME_BANCO_DADOS)
-
-        # Query para investimentos (SUA LÓGICA ORIGINAL MANTIDA)
-        query_investimentos = "SELECT inv.*, cad.gestor FROM investimentos inv LEFT JOIN cadastro_fundos cad ON inv.codigo_isin_fundo = cad.codigo_isin"
-        df_investimentos = pd.read_sql(query_investimentos, conn)
-        if not df_investimentos.empty:
-            df_investimentos['data_posicao'] = pd.to_datetime(df_investimentos['data_posicao'])
-            df_investimentos['valor_total'] = pd.to_numeric(df_investimentos['valor_total'], errors='coerce')
-            df_investimentos['gestor'] = df_investimentos['gestor'].fillna('Não Cadastrado')
-
-        # Query para imóveis (SUA LÓGICA ORIGINAL MANTIDA)
-        query_imoveis = "SELECT * FROM imoveis_emprestimos"
-        df_imoveis = pd.read_sql_query(query_imoveis, conn)
-        if not df_imoveis.empty:
-            df_imoveis['data_posicao'] = pd.to_datetime(df_imoveis['data_posicao'])
-            df_imoveis['valor_total'] = pd.to_numeric(df_imoveis['valor_total'], errors='coerce')
-
-        # Query para rentabilidade dos ativos (SUA LÓGICA ORIGINAL MANTIDA)
-        query_ativos = "SELECT * FROM Ativos"
-        df_ativos = pd.read_sql_query(query_ativos, conn)
-        if not df_ativos.empty:
-            df_ativos['data_posicao'] = pd.to_datetime(df_ativos['data_posicao'])
-
-        # Query para índices (SUA LÓGICA ORIGINAL MANTIDA)
-        query_indices = "SELECT * FROM indices_taxas"
-        df_indices = pd.read_sql_query(query_indices, conn)
-        if not df_indices.empty:
-            df_indices['data_posicao'] = pd.to_datetime(df_indices['data_posicao'])
-
-        # --- NOVAS TABELAS ADICIONADAS AQUI ---
-        query_planos = "SELECT * FROM Planos"
-        df_planos = pd.read_sql_query(query_planos, conn)
-        if not df_planos.empty:
-            df_planos['data_posicao'] = pd.to_datetime(df_planos['data_posicao'])
-
-        query_segmentos = "SELECT * FROM Segmentos"
-        df_segmentos = pd.read_sql_query(query_segmentos, conn)
-        if not df_segmentos.empty:
-            df_segmentos['data_posicao'] = pd.to_datetime(df_segmentos['data_posicao'])
-        # --- FIM DA ADIÇÃO ---
+        versoes = versoes or ler_versoes_banco()
+        metricas.registrar_consulta_cache('ativos_plano')
+        df_ativos = carregar_ativos_plano(config["filtro_ativos"], banco_dados.chave_versao(versoes, 'ativos'))
+        df_indices = obter_carga_incremental().obter('indices_taxas', versoes)
+        return df_ativos, df_indices
+
+    except Exception as e:
+        st.error(f"Erro ao carregar os dados do plano {nome_plano_key}: {e}")
+        return pd.DataFrame(), pd.DataFrame()
+
+
+# --- MATRIZES DE RENTABILIDADE (MONTADAS UMA VEZ POR VERSÃO DOS DADOS) ---
+# Os DataFrames entram com "_" no nome para o Streamlit não os hashear: a chave é a versão.
+@st.cache_resource(max_entries=1)
+def obter_matriz_performance(chave_versao, _df_planos, _df_segmentos, coluna_rentab_planos, coluna_rentab_segmentos):
+    metricas.registrar_falha_cache('matriz_performance')
+    return analise.matriz_performance(_df_planos, _df_segmentos, coluna_rentab_planos, coluna_rentab_segmentos)
+
+
+@st.cache_resource(max_entries=1)
+def obter_matriz_indices(chave_versao, _df_indices):
+    metricas.registrar_falha_cache('matriz_indices')
+    return analise.matriz_indices(_df_indices)
+
+
+@st.cache_resource(max_entries=len(CONFIGURACOES_PLANOS))
+def obter_matriz_fundos(filtro_ativos, chave_versao, _df_ativos_plano):
+    metricas.registrar_falha_cache('matriz_fundos')
+    return analise.matriz_fundos(_df_ativos_plano)
+
+
+# --- CACHE DE FIGURAS COMPARTILHADO PELO PROCESSO ---
+# Figuras Plotly prontas (em JSON), chaveadas por página, gráfico, versão dos dados e seleções. Como a
+# versão faz parte da chave, dados novos nunca reaproveitam uma figura antiga; as entradas velhas saem
+# pelo LRU.
+@st.cache_resource
+def obter_cache_figuras():
+    return cache_figuras.CacheFiguras(limite_bytes=64 * 1024 * 1024, max_entradas=512)
 
-        conn.close()
 
-        # A função agora retorna os seis DataFrames
-        return df_investimentos, df_imoveis, df_ativos, df_indices, df_planos, df_segmentos
+def figura_em_cache(chave, construir):
+    figura, acerto, tamanho_bytes, segundos = obter_cache_figuras().consultar(chave, construir)
+    metricas.registrar_figura(figura, chave[1], acerto, tamanho_bytes, segundos)
+    return figura
+
+
+# --- RESUMOS MENSAIS (PATRIMÔNIO POR DATA, PLANO, SEGMENTO, FUNDO E GESTOR) ---
+# Com o motor 'sqlite' (padrão), recalcula apenas as datas marcadas como pendentes pelos gatilhos do
+# banco antes de ler. DASHBOARD_MOTOR_RESUMOS=pandas|duckdb recalcula tudo a partir das posições (ver
+# agregacoes.py), com o mesmo resultado; DASHBOARD_FONTE_RESUMOS aponta esses motores para uma
+# exportação Parquet no lugar do banco. Compartilhados entre as sessões como as tabelas (somente leitura).
+MOTOR_RESUMOS = os.environ.get('DASHBOARD_MOTOR_RESUMOS', 'sqlite')
+
+
+@st.cache_resource(max_entries=1)
+def _carregar_resumos(chave_versao):
+    metricas.registrar_falha_cache('resumos')
+    return agregacoes.calcular_resumos(MOTOR_RESUMOS, os.environ.get('DASHBOARD_FONTE_RESUMOS', NOME_BANCO_DADOS))
+
+
+@medir_secao("dados")
+def carregar_resumos(versoes=None):
+    metricas.registrar_consulta_cache('resumos')
+    try:
+        return _carregar_resumos(banco_dados.chave_versao(versoes or ler_versoes_banco(), 'resumos'))
 
     except Exception as e:
-        st.error(f"Erro ao carregar os dados do banco de dados: {e}")
-        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+        st.error(f"Erro ao carregar os resumos do banco de dados: {e}")
+        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
 
 
 # --- FUNÇÕES DE PÁGINA ---
 def pagina_home():
     st.title("Dashboard Consolidado (Agros)")
 
-    df_investimentos, df_imoveis, df_ativos, df_indices, df_planos, df_segmentos = carregar_dados()
+    versoes = ler_versoes_banco()
+    chave_dados = banco_dados.chave_versao(versoes, 'resumos')
+    df_resumo_data, df_resumo_plano, df_resumo_segmento, df_resumo_fundo, df_resumo_gestor = carregar_resumos(versoes)
 
-    if df_investimentos.empty and df_imoveis.empty:
+    if df_resumo_data.empty:
         st.warning("Nenhum dado encontrado.")
         return
 
-    # --- KPIs, Evolução e Variação (CÓDIGO SEM ALTERAÇÃO) ---
-    data_mais_recente = (pd.concat([df_investimentos['data_posicao'], df_imoveis['data_posicao']])
-                         .dropna().max())
-    patrimonio_consolidado = (
-            df_investimentos[df_investimentos['data_posicao'] == data_mais_recente]['valor_total'].sum() +
-            df_imoveis[df_imoveis['data_posicao'] == data_mais_recente]['valor_total'].sum())
-    patrimonio_formatado = f"R$ {patrimonio_consolidado:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    # --- KPIs, Evolução e Variação (LIDOS DO RESUMO POR DATA) ---
+    df_evolucao = analise.evolucao_patrimonio(df_resumo_data, df_resumo_plano)
+    secao_home_evolucao(chave_dados, df_evolucao)
+    st.markdown("---")
+
+    secao_home_variacao(df_evolucao)
+    st.markdown("---")
+
+    # --- ANÁLISE DA CARTEIRA DE INVESTIMENTOS (CÓDIGO SEM ALTERAÇÃO) ---
+    st.subheader("Análise da Carteira de Investimentos")
+    meses_analise = meses_calendario(df_evolucao['chave_mes'], decrescente=True)
+    data_selecionada = st.selectbox("Selecione a data para análise da composição:", meses_analise.index.tolist(),
+                                    format_func=meses_analise.get, key="composicao_data")
+
+    if data_selecionada is None: return
+
+    patrimonio_na_data = analise.patrimonio_no_mes(df_evolucao, data_selecionada)
+
+
+    st.markdown("<br>", unsafe_allow_html=True)
+
+    secao_home_planos(chave_dados, data_selecionada, df_resumo_plano)
+    secao_home_segmentos(chave_dados, data_selecionada, df_resumo_segmento)
+    secao_home_rentabilidade()
+    secao_home_rankings(chave_dados, data_selecionada, df_resumo_fundo, df_resumo_gestor, patrimonio_na_data)
+
+
+# KPIs e gráfico de evolução do patrimônio.
+@medir_secao("evolucao")
+def secao_home_evolucao(chave_dados, df_evolucao):
+    data_mais_recente, patrimonio_consolidado = analise.patrimonio_mais_recente(df_evolucao)
+    patrimonio_formatado = formatacao.moeda(patrimonio_consolidado)
     data_formatada = data_mais_recente.strftime('%d/%m/%Y')
 
     col1, col2 = st.columns(2)
@@ -310,63 +530,55 @@ def pagina_home():
     st.markdown("<br>", unsafe_allow_html=True)
     st.subheader("Evolução do Patrimônio Consolidado")
 
-    df_evol_inv = df_investimentos.groupby('data_posicao')['valor_total'].sum().reset_index().rename(
-        columns={'valor_total': 'valor_investimentos'})
-    df_evol_imo = df_imoveis.groupby('data_posicao')['valor_total'].sum().reset_index().rename(
-        columns={'valor_total': 'valor_imoveis'})
-    df_evolucao = pd.merge(df_evol_inv, df_evol_imo, on='data_posicao', how='outer').fillna(0)
-    df_evolucao['Total'] = df_evolucao['valor_investimentos'] + df_evolucao['valor_imoveis']
-
-    fig_evol = px.line(df_evolucao, x='data_posicao', y='Total', line_shape='spline')
-    fig_evol.update_traces(
-        line=dict(color='#1161e6', width=3),
-        marker=dict(size=8, color='#4361f2', line=dict(width=1, color='#ffffff')),
-        hovertemplate='<b>Data:</b> %{x|%d/%m/%Y}<br><b>Patrimônio:</b> R$ %{y:,.2f}<extra></extra>',
-        text=df_evolucao['Total'].apply(formatar_numero_br),
-    )
-    meses_map_pt = {1: 'Jan', 2: 'Fev', 3: 'Mar', 4: 'Abr', 5: 'Mai', 6: 'Jun', 7: 'Jul', 8: 'Ago', 9: 'Set', 10: 'Out',
-                    11: 'Nov', 12: 'Dez'}
-    tick_values = df_evolucao['data_posicao']
-    tick_labels = [f"{meses_map_pt[d.month]}/{d.year}" for d in tick_values]
-    fig_evol.update_layout(
-        plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
-        xaxis=dict(title='<b>Data</b>', gridcolor='#e0e0e0', tickvals=tick_values, ticktext=tick_labels),
-        yaxis=dict(title='<b>Patrimônio (R$)</b>', gridcolor='#e0e0e0', tickformat=',.0f'),
-        margin=dict(l=40, r=40, t=40, b=40), hovermode="x unified",
-        hoverlabel = dict(
-            bgcolor="white",
-            font_size=17,
-            font_family="sans-serif"
+    def construir_evol():
+        fig_evol = px.line(df_evolucao, x='data_posicao', y='Total', line_shape='spline')
+        fig_evol.update_traces(
+            line=dict(color='#1161e6', width=3),
+            marker=dict(size=8, color='#4361f2', line=dict(width=1, color='#ffffff')),
+            hovertemplate='<b>Data:</b> %{x|%d/%m/%Y}<br><b>Patrimônio:</b> R$ %{y:,.2f}<extra></extra>',
+            text=formatacao.abreviado(df_evolucao['Total']),
         )
-    )
+        tick_values = df_evolucao['data_posicao']
+        tick_labels = rotulos_eixo(df_evolucao['chave_mes'])
+        fig_evol.update_layout(
+            plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
+            xaxis=dict(title='<b>Data</b>', gridcolor='#e0e0e0', tickvals=tick_values, ticktext=tick_labels),
+            yaxis=dict(title='<b>Patrimônio (R$)</b>', gridcolor='#e0e0e0', tickformat=',.0f'),
+            margin=dict(l=40, r=40, t=40, b=40), hovermode="x unified",
+            hoverlabel = dict(
+                bgcolor="white",
+                font_size=17,
+                font_family="sans-serif"
+            )
+        )
+        return fig_evol
 
-    st.plotly_chart(fig_evol, use_container_width=True)
-    st.markdown("---")
+    fig_evol = figura_em_cache(('home', 'evolucao', chave_dados), construir_evol)
 
+    exibir_grafico(fig_evol)
+
+
+# Seletores de data da variação: só esta seção é refeita quando eles mudam.
+@fragmento
+@medir_secao("variacao")
+def secao_home_variacao(df_evolucao):
     st.subheader("Análise de Variação Patrimonial")
-    datas_disponiveis_dt = sorted(pd.to_datetime(df_evolucao['data_posicao'].unique()))
-    meses_pt_full = {1: 'Janeiro', 2: 'Fevereiro', 3: 'Março', 4: 'Abril', 5: 'Maio', 6: 'Junho', 7: 'Julho',
-                     8: 'Agosto', 9: 'Setembro', 10: 'Outubro', 11: 'Novembro', 12: 'Dezembro'}
-    opcoes_map = {f"{meses_pt_full[d.month]}/{d.year}": d for d in datas_disponiveis_dt}
-    opcoes_labels = list(opcoes_map.keys())
+    meses = meses_calendario(df_evolucao['chave_mes'])
+    opcoes_meses = meses.index.tolist()
     col_data1, col_data2 = st.columns(2)
     with col_data1:
-        label_inicial = st.selectbox("Selecione a Data Inicial:", opcoes_labels, index=0)
+        data_inicial = st.selectbox("Selecione a Data Inicial:", opcoes_meses, index=0, format_func=meses.get)
     with col_data2:
-        label_final = st.selectbox("Selecione a Data Final:", opcoes_labels, index=len(opcoes_labels) - 1)
-    data_inicial = opcoes_map[label_inicial]
-    data_final = opcoes_map[label_final]
+        data_final = st.selectbox("Selecione a Data Final:", opcoes_meses, index=len(opcoes_meses) - 1,
+                                  format_func=meses.get)
     if data_inicial >= data_final:
         st.warning("A Data Inicial deve ser anterior à Data Final para calcular a variação.")
     else:
-        valor_inicial = df_evolucao.loc[df_evolucao['data_posicao'] == data_inicial, 'Total'].iloc[0]
-        valor_final = df_evolucao.loc[df_evolucao['data_posicao'] == data_final, 'Total'].iloc[0]
-        variacao_rs = valor_final - valor_inicial
-        variacao_pct = (valor_final / valor_inicial - 1) * 100 if valor_inicial != 0 else 0
+        variacao_rs, variacao_pct = analise.variacao_patrimonial(df_evolucao, data_inicial, data_final)
         sinal_rs = "+" if variacao_rs >= 0 else ""
         sinal_pct = "+" if variacao_pct >= 0 else ""
         cor_variacao = "green" if variacao_rs >= 0 else "red"
-        variacao_rs_f = f"R$ {variacao_rs:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+        variacao_rs_f = formatacao.moeda(variacao_rs)
         col_var1, col_var2 = st.columns(2)
         with col_var1:
             st.markdown(
@@ -374,47 +586,78 @@ def pagina_home():
                 unsafe_allow_html=True)
         with col_var2:
             st.markdown(
-                f'<div class="var-card {cor_variacao}"><div class="var-title">VARIAÇÃO (%)</div><div class="var-value">{sinal_pct}{variacao_pct:.2f}%</div></div>',
+                f'<div class="var-card {cor_variacao}"><div class="var-title">VARIAÇÃO (%)</div><div class="var-value">{sinal_pct}{formatacao.percentual(variacao_pct)}</div></div>',
                 unsafe_allow_html=True)
-    st.markdown("---")
 
-    # --- ANÁLISE DA CARTEIRA DE INVESTIMENTOS (CÓDIGO SEM ALTERAÇÃO) ---
-    st.subheader("Análise da Carteira de Investimentos")
-    datas_analise = sorted(
-        pd.to_datetime(pd.concat([df_investimentos['data_posicao'], df_imoveis['data_posicao']]).dropna().unique()),
-        reverse=True)
-    opcoes_map_analise = {f"{meses_pt_full[d.month]}/{d.year}": d for d in datas_analise}
-    label_selecionada = st.selectbox("Selecione a data para análise da composição:", list(opcoes_map_analise.keys()),
-                                     key="composicao_data")
-
-    if not label_selecionada: return
-    data_selecionada = opcoes_map_analise[label_selecionada]
-
-    df_inv_filtrado = df_investimentos[df_investimentos['data_posicao'] == data_selecionada]
-    df_imo_filtrado = df_imoveis[df_imoveis['data_posicao'] == data_selecionada]
-    patrimonio_na_data = df_inv_filtrado['valor_total'].sum() + df_imo_filtrado['valor_total'].sum()
-
-    mapa_nomes = {'001 - PLANO A - BD': 'Plano A', '003 - INVESTPREV': 'InvestPrev', '004 - VIDAPREV': 'VidaPrev',
-                  '009 - PLANO ASSISTENCIAL': 'Assistencial', '500 - PGA GERAL': 'PGA'}
-    cores_azuis = ['#0d47a1', '#1976d2', '#42a5f5', '#90caf9', '#bbdefb', '#e3f2fd']
-
-    st.markdown("<br>", unsafe_allow_html=True)
 
+# Sem widgets próprios: fica isolada para não ser refeita pelos widgets das outras seções.
+@fragmento
+@medir_secao("planos")
+def secao_home_planos(chave_dados, data_selecionada, df_resumo_plano):
     # --- 1. ANÁLISE POR PLANOS (CÓDIGO SEM ALTERAÇÃO) ---
     col_plano1, col_plano2 = st.columns([0.8, 1.2])
     with col_plano1:
         st.markdown("##### Distribuição por Planos")
-        df_planos_full = pd.concat(
-            [df_inv_filtrado[['nome_plano', 'valor_total']], df_imo_filtrado[['nome_plano', 'valor_total']]])
-        df_planos_agg = df_planos_full.groupby('nome_plano')['valor_total'].sum().reset_index()
-        df_planos_agg['Plano'] = df_planos_agg['nome_plano'].map(mapa_nomes).fillna(df_planos_agg['nome_plano'])
-
-        fig_rosca_plano = go.Figure(data=[
-            go.Pie(labels=df_planos_agg['Plano'], values=df_planos_agg['valor_total'], hole=.4, textinfo='percent',
-                   textfont_size=17, hovertemplate='<b>%{label}</b><br>R$ %{value:,.2f}<br>%{percent}<extra></extra>',
-                   marker=dict(colors=cores_azuis, line=dict(color='#ffffff', width=2)))])
-        fig_rosca_plano.update_layout(showlegend=True, legend=dict(orientation="h", yanchor="bottom", y=-0.2),
-                                      margin=dict(t=0, b=0, l=0, r=0), height=400,
+        df_planos_agg = analise.distribuicao_planos(df_resumo_plano, data_selecionada, MAPA_NOMES_PLANOS)
+
+        def construir_rosca_plano():
+            fig_rosca_plano = go.Figure(data=[
+                go.Pie(labels=df_planos_agg['Plano'], values=df_planos_agg['valor_total'], hole=.4, textinfo='percent',
+                       textfont_size=17, hovertemplate='<b>%{label}</b><br>R$ %{value:,.2f}<br>%{percent}<extra></extra>',
+                       marker=dict(colors=CORES_AZUIS, line=dict(color='#ffffff', width=2)))])
+            fig_rosca_plano.update_layout(showlegend=True, legend=dict(orientation="h", yanchor="bottom", y=-0.2),
+                                          margin=dict(t=0, b=0, l=0, r=0), height=400,
+
+                                          # --- ADICIONE ESTE BLOCO ---
+                                          hoverlabel=dict(
+                                              bgcolor="white",
+                                              font_size=16,
+                                              font_family="sans-serif"
+                                          )
+                                          # ---------------------------
+                                          )
+            return fig_rosca_plano
+
+        chave_figura = ('home', 'rosca_planos', chave_dados, data_selecionada)
+        fig_rosca_plano = figura_em_cache(chave_figura, construir_rosca_plano)
+        exibir_grafico(fig_rosca_plano)
+    with col_plano2:
+        df_tabela_plano, total_planos = analise.tabela_participacao(df_planos_agg[['Plano', 'valor_total']])
+        exibir_tabela(df_tabela_plano, COLUNAS_TABELA_PLANOS,
+                      total={'Plano': 'Total', 'valor_total': total_planos, '%': 100}, altura_maxima=400)
+
+    st.markdown("##### Evolução da Distribuição por Planos")
+    def construir_evol_planos():
+        df_planos_evol_pct, df_planos_evol_val = analise.evolucao_distribuicao_planos(df_resumo_plano, MAPA_NOMES_PLANOS)
+
+        fig_evol_planos = go.Figure()
+        planos_rotulo_cima = ['VidaPrev', 'Plano A', 'InvestPrev']
+        planos_rotulo_meio = ['PGA', 'Assistencial']
+
+        for plano in df_planos_evol_pct.columns:
+            mode = 'lines'
+            text_position = None
+            if plano in planos_rotulo_cima:
+                mode = 'lines+text'
+                text_position = 'top center'
+            elif plano in planos_rotulo_meio:
+                mode = 'lines+text'
+                text_position = 'middle center'
+
+            fig_evol_planos.add_trace(go.Scatter(
+                x=df_planos_evol_pct.index, y=df_planos_evol_pct[plano], name=plano, mode=mode,
+                line_shape='spline', customdata=df_planos_evol_val[plano],
+                text=formatacao.percentual(df_planos_evol_pct[plano].to_numpy(), casas=1), textposition=text_position,
+                textfont=dict(size=12, color="#000000"),
+                hovertemplate='<b>%{x|%B de %Y}</b><br>%{data.name}: %{y:.2f}%<br>Valor: R$ %{customdata:,.2f}<extra></extra>'
+            ))
+
+        evol_tick_values_planos = df_planos_evol_pct.index
+        evol_tick_labels_planos = rotulos_eixo(esquema.chave_mes(evol_tick_values_planos))
+        fig_evol_planos.update_layout(hovermode='x unified', yaxis_ticksuffix='%', legend_title_text='',
+                                      colorway=CORES_AZUIS,
+                                      xaxis=dict(tickvals=evol_tick_values_planos, ticktext=evol_tick_labels_planos),
+                                      margin=dict(t=20, b=40, l=40, r=20),
 
                                       # --- ADICIONE ESTE BLOCO ---
                                       hoverlabel=dict(
@@ -424,175 +667,99 @@ def pagina_home():
                                       )
                                       # ---------------------------
                                       )
-        st.plotly_chart(fig_rosca_plano, use_container_width=True)
-    with col_plano2:
-        df_tabela_plano = df_planos_agg[['Plano', 'valor_total']].copy().sort_values(by='valor_total', ascending=False)
-        total_planos = df_tabela_plano['valor_total'].sum()
-        if total_planos > 0:
-            df_tabela_plano['%'] = (df_tabela_plano['valor_total'] / total_planos) * 100
-        else:
-            df_tabela_plano['%'] = 0
-        df_tabela_plano['valor_total_str'] = df_tabela_plano['valor_total'].apply(lambda x: f"R$ {x:,.2f}")
-        df_tabela_plano['%_str'] = df_tabela_plano['%'].apply(lambda x: f"{x:.2f}%")
-
-        tabela_html_plano = """<table style="width:100%; border-collapse: collapse;">
-                            <tr style="border-bottom: 2px solid #6aa2ff; color: #0d47a1;">
-                                <th style="text-align:left; padding: 8px;">Plano</th>
-                                <th style="text-align:right; padding: 8px;">Valor (R$)</th>
-                                <th style="text-align:right; padding: 8px;">%</th>
-                            </tr>"""
-        for index, row in df_tabela_plano.iterrows():
-            tabela_html_plano += f'<tr style="border-bottom: 1px solid #ddd;"><td style="padding: 8px;">{row["Plano"]}</td><td style="text-align:right; padding: 8px;">{row["valor_total_str"]}</td><td style="text-align:right; padding: 8px;">{row["%_str"]}</td></tr>'
-        tabela_html_plano += f"""<tr style="background-color: #f0f2f6; border-top: 2px solid #6aa2ff;">
-                                <td style="padding: 10px; font-weight: bold;">Total</td>
-                                <td style="text-align:right; padding: 10px; font-weight: bold;">R$ {total_planos:,.2f}</td>
-                                <td style="text-align:right; padding: 10px; font-weight: bold;">100.00%</td>
-                            </tr></table>"""
-        components.html(tabela_html_plano, height=400, scrolling=True)
+        return fig_evol_planos
 
-    st.markdown("##### Evolução da Distribuição por Planos")
-    df_planos_evol = pd.concat([df_investimentos[['data_posicao', 'nome_plano', 'valor_total']],
-                                df_imoveis[['data_posicao', 'nome_plano', 'valor_total']]])
-    df_planos_evol_agg = df_planos_evol.groupby(['data_posicao', 'nome_plano'])['valor_total'].sum().unstack().fillna(0)
-    df_planos_evol_pct = df_planos_evol_agg.div(df_planos_evol_agg.sum(axis=1), axis=0) * 100
-    df_planos_evol_pct.columns = [mapa_nomes.get(col, col) for col in df_planos_evol_pct.columns]
-    df_planos_evol_val = df_planos_evol_agg.copy()
-    df_planos_evol_val.columns = [mapa_nomes.get(col, col) for col in df_planos_evol_val.columns]
-
-    fig_evol_planos = go.Figure()
-    planos_rotulo_cima = ['VidaPrev', 'Plano A', 'InvestPrev']
-    planos_rotulo_meio = ['PGA', 'Assistencial']
-
-    for plano in df_planos_evol_pct.columns:
-        mode = 'lines'
-        text_position = None
-        if plano in planos_rotulo_cima:
-            mode = 'lines+text'
-            text_position = 'top center'
-        elif plano in planos_rotulo_meio:
-            mode = 'lines+text'
-            text_position = 'middle center'
-
-        fig_evol_planos.add_trace(go.Scatter(
-            x=df_planos_evol_pct.index, y=df_planos_evol_pct[plano], name=plano, mode=mode,
-            line_shape='spline', customdata=df_planos_evol_val[plano],
-            text=[f'{y:.1f}%' for y in df_planos_evol_pct[plano]], textposition=text_position,
-            textfont=dict(size=12, color="#000000"),
-            hovertemplate='<b>%{x|%B de %Y}</b><br>%{data.name}: %{y:.2f}%<br>Valor: R$ %{customdata:,.2f}<extra></extra>'
-        ))
-
-    evol_tick_values_planos = df_planos_evol_pct.index
-    evol_tick_labels_planos = [f"{meses_map_pt[d.month]}/{d.year}" for d in evol_tick_values_planos]
-    fig_evol_planos.update_layout(hovermode='x unified', yaxis_ticksuffix='%', legend_title_text='',
-                                  colorway=cores_azuis,
-                                  xaxis=dict(tickvals=evol_tick_values_planos, ticktext=evol_tick_labels_planos),
-                                  margin=dict(t=20, b=40, l=40, r=20),
-
-                                  # --- ADICIONE ESTE BLOCO ---
-                                  hoverlabel=dict(
-                                      bgcolor="white",
-                                      font_size=16,
-                                      font_family="sans-serif"
-                                  )
-                                  # ---------------------------
-                                  )
-    st.plotly_chart(fig_evol_planos, use_container_width=True)
+    fig_evol_planos = figura_em_cache(('home', 'evolucao_planos', chave_dados), construir_evol_planos)
+    exibir_grafico(fig_evol_planos)
     st.markdown("<br>", unsafe_allow_html=True)
 
+
+@fragmento
+@medir_secao("segmentos")
+def secao_home_segmentos(chave_dados, data_selecionada, df_resumo_segmento):
     col_seg1, col_seg2 = st.columns([0.8, 1.2])
     with col_seg1:
         st.markdown("##### Distribuição por Segmentos")
-        df_seg_inv = df_inv_filtrado.groupby('segmento')['valor_total'].sum().reset_index()
-        df_seg_imo = df_imo_filtrado.groupby('segmento')['valor_total'].sum().reset_index()
-        df_segmentos_full = pd.concat([df_seg_inv, df_seg_imo], ignore_index=True)
-
-        fig_rosca_seg = go.Figure(data=[
-            go.Pie(labels=df_segmentos_full['segmento'], values=df_segmentos_full['valor_total'], hole=.4,
-                   textinfo='percent', textfont_size=17,
-                   hovertemplate='<b>%{label}</b><br>R$ %{value:,.2f}<br>%{percent}<extra></extra>',
-                   marker=dict(colors=cores_azuis, line=dict(color='#ffffff', width=2)))])
-        fig_rosca_seg.update_layout(showlegend=True, legend=dict(orientation="h", yanchor="bottom", y=-0.2),
-                                    margin=dict(t=0, b=0, l=0, r=0), height=400,
-
-                                    # --- ADICIONE ESTE BLOCO ---
-                                    hoverlabel=dict(
-                                        bgcolor="white",
-                                        font_size=16,
-                                        font_family="sans-serif"
-                                    )
-                                    # ---------------------------
-                                    )
-        st.plotly_chart(fig_rosca_seg, use_container_width=True)
+        df_segmentos_full = analise.distribuicao_segmentos(df_resumo_segmento, data_selecionada)
+
+        def construir_rosca_seg():
+            fig_rosca_seg = go.Figure(data=[
+                go.Pie(labels=df_segmentos_full['segmento'], values=df_segmentos_full['valor_total'], hole=.4,
+                       textinfo='percent', textfont_size=17,
+                       hovertemplate='<b>%{label}</b><br>R$ %{value:,.2f}<br>%{percent}<extra></extra>',
+                       marker=dict(colors=CORES_AZUIS, line=dict(color='#ffffff', width=2)))])
+            fig_rosca_seg.update_layout(showlegend=True, legend=dict(orientation="h", yanchor="bottom", y=-0.2),
+                                        margin=dict(t=0, b=0, l=0, r=0), height=400,
+
+                                        # --- ADICIONE ESTE BLOCO ---
+                                        hoverlabel=dict(
+                                            bgcolor="white",
+                                            font_size=16,
+                                            font_family="sans-serif"
+                                        )
+                                        # ---------------------------
+                                        )
+            return fig_rosca_seg
+
+        fig_rosca_seg = figura_em_cache(('home', 'rosca_segmentos', chave_dados, data_selecionada), construir_rosca_seg)
+        exibir_grafico(fig_rosca_seg)
     with col_seg2:
-        df_tabela_seg = df_segmentos_full.copy().sort_values(by='valor_total', ascending=False)
-        total_segmentos = df_tabela_seg['valor_total'].sum()
-        if total_segmentos > 0:
-            df_tabela_seg['%'] = (df_tabela_seg['valor_total'] / total_segmentos) * 100
-        else:
-            df_tabela_seg['%'] = 0
-        df_tabela_seg['valor_total_str'] = df_tabela_seg['valor_total'].apply(lambda x: f"R$ {x:,.2f}")
-        df_tabela_seg['%_str'] = df_tabela_seg['%'].apply(lambda x: f"{x:.2f}%")
-        tabela_html_seg = """<table style="width:100%; border-collapse: collapse;">
-                           <tr style="border-bottom: 2px solid #0d47a1; color: #0d47a1;">
-                               <th style="text-align:left; padding: 8px;">Segmento</th>
-                               <th style="text-align:right; padding: 8px;">Valor (R$)</th>
-                               <th style="text-align:right; padding: 8px;">%</th>
-                           </tr>"""
-        for index, row in df_tabela_seg.iterrows():
-            tabela_html_seg += f'<tr style="border-bottom: 1px solid #ddd;"><td style="padding: 8px;">{row["segmento"]}</td><td style="text-align:right; padding: 8px;">{row["valor_total_str"]}</td><td style="text-align:right; padding: 8px;">{row["%_str"]}</td></tr>'
-        tabela_html_seg += f"""<tr style="background-color: #f0f2f6; border-top: 2px solid #0d47a1;">
-                               <td style="padding: 10px; font-weight: bold;">Total</td>
-                               <td style="text-align:right; padding: 10px; font-weight: bold;">R$ {total_segmentos:,.2f}</td>
-                               <td style="text-align:right; padding: 10px; font-weight: bold;">100.00%</td>
-                           </tr></table>"""
-        components.html(tabela_html_seg, height=400, scrolling=False)
+        df_tabela_seg, total_segmentos = analise.tabela_participacao(df_segmentos_full)
+        exibir_tabela(df_tabela_seg, COLUNAS_TABELA_SEGMENTOS,
+                      total={'segmento': 'Total', 'valor_total': total_segmentos, '%': 100},
+                      cor_destaque='#0d47a1', altura_maxima=400)
 
     st.markdown("##### Evolução da Distribuição por Segmentos")
-    df_seg_evol = pd.concat([df_investimentos[['data_posicao', 'segmento', 'valor_total']],
-                             df_imoveis[['data_posicao', 'segmento', 'valor_total']]])
-    df_seg_evol_agg = df_seg_evol.groupby(['data_posicao', 'segmento'])['valor_total'].sum().unstack().fillna(0)
-    df_seg_evol_pct = df_seg_evol_agg.div(df_seg_evol_agg.sum(axis=1), axis=0) * 100
-    df_seg_evol_val = df_seg_evol_agg.copy()
-
-    fig_evol_seg = go.Figure()
-    seg_rotulo_cima = ['ESTRUTURADO', 'RENDA FIXA', 'RENDA VARIÁVEL', 'EXTERIOR', 'OPERACAO COM PARTICIPANTES']
-    seg_rotulo_meio = ['']
-
-    for segmento in df_seg_evol_pct.columns:
-        mode = 'lines'
-        text_position = None
-        if segmento in seg_rotulo_cima:
-            mode = 'lines+text'
-            text_position = 'top center'
-        elif segmento in seg_rotulo_meio:
-            mode = 'lines+text'
-            text_position = 'middle center'
-
-        fig_evol_seg.add_trace(go.Scatter(
-            x=df_seg_evol_pct.index, y=df_seg_evol_pct[segmento], name=segmento, mode=mode,
-            line_shape='spline', customdata=df_seg_evol_val[segmento],
-            text=[f'{y:.1f}%' for y in df_seg_evol_pct[segmento]], textposition=text_position,
-            textfont=dict(size=12, color="#000000"),
-            hovertemplate='<b>%{x|%B de %Y}</b><br>%{data.name}: %{y:.2f}%<br>Valor: R$ %{customdata:,.2f}<extra></extra>'
-        ))
-
-    evol_tick_values_seg = df_seg_evol_pct.index
-    evol_tick_labels_seg = [f"{meses_map_pt[d.month]}/{d.year}" for d in evol_tick_values_seg]
-    fig_evol_seg.update_layout(hovermode='x unified', yaxis_ticksuffix='%', legend_title_text='', colorway=cores_azuis,
-                               xaxis=dict(tickvals=evol_tick_values_seg, ticktext=evol_tick_labels_seg),
-                               margin=dict(t=20, b=40, l=40, r=20),
-
-                               # --- ADICIONE ESTE BLOCO ---
-                               hoverlabel=dict(
-                                   bgcolor="white",
-                                   font_size=16,
-                                   font_family="sans-serif"
-                               )
-                               # ---------------------------
-                               )
-    st.plotly_chart(fig_evol_seg, use_container_width=True)
+    def construir_evol_seg():
+        df_seg_evol_pct, df_seg_evol_val = analise.evolucao_distribuicao_segmentos(df_resumo_segmento)
+
+        fig_evol_seg = go.Figure()
+        seg_rotulo_cima = ['ESTRUTURADO', 'RENDA FIXA', 'RENDA VARIÁVEL', 'EXTERIOR', 'OPERACAO COM PARTICIPANTES']
+        seg_rotulo_meio = ['']
+
+        for segmento in df_seg_evol_pct.columns:
+            mode = 'lines'
+            text_position = None
+            if segmento in seg_rotulo_cima:
+                mode = 'lines+text'
+                text_position = 'top center'
+            elif segmento in seg_rotulo_meio:
+                mode = 'lines+text'
+                text_position = 'middle center'
+
+            fig_evol_seg.add_trace(go.Scatter(
+                x=df_seg_evol_pct.index, y=df_seg_evol_pct[segmento], name=segmento, mode=mode,
+                line_shape='spline', customdata=df_seg_evol_val[segmento],
+                text=formatacao.percentual(df_seg_evol_pct[segmento].to_numpy(), casas=1), textposition=text_position,
+                textfont=dict(size=12, color="#000000"),
+                hovertemplate='<b>%{x|%B de %Y}</b><br>%{data.name}: %{y:.2f}%<br>Valor: R$ %{customdata:,.2f}<extra></extra>'
+            ))
+
+        evol_tick_values_seg = df_seg_evol_pct.index
+        evol_tick_labels_seg = rotulos_eixo(esquema.chave_mes(evol_tick_values_seg))
+        fig_evol_seg.update_layout(hovermode='x unified', yaxis_ticksuffix='%', legend_title_text='', colorway=CORES_AZUIS,
+                                   xaxis=dict(tickvals=evol_tick_values_seg, ticktext=evol_tick_labels_seg),
+                                   margin=dict(t=20, b=40, l=40, r=20),
+
+                                   # --- ADICIONE ESTE BLOCO ---
+                                   hoverlabel=dict(
+                                       bgcolor="white",
+                                       font_size=16,
+                                       font_family="sans-serif"
+                                   )
+                                   # ---------------------------
+                                   )
+        return fig_evol_seg
+
+    fig_evol_seg = figura_em_cache(('home', 'evolucao_segmentos', chave_dados), construir_evol_seg)
+    exibir_grafico(fig_evol_seg)
     st.markdown("<br>", unsafe_allow_html=True)
 
+
+# Multiselects e datas da rentabilidade refazem só este gráfico.
+@fragmento
+@medir_secao("rentabilidade")
+def secao_home_rentabilidade():
     # --- ANÁLISE DE RENTABILIDADE ACUMULADA (PLANOS E SEGMENTOS) ---
     st.markdown("---")
     st.subheader("Análise de Rentabilidade Acumulada (Planos e Segmentos)")
@@ -602,6 +769,9 @@ def pagina_home():
     COLUNA_RENTAB_PLANOS = 'rentabilidade_plano'
     COLUNA_RENTAB_SEGMENTOS = 'Rentabilidade'
 
+    versoes = ler_versoes_banco()
+    df_planos, df_segmentos, df_indices = carregar_tabelas('planos', 'segmentos', 'indices_taxas', versoes=versoes)
+
     if COLUNA_RENTAB_PLANOS not in df_planos.columns or COLUNA_RENTAB_SEGMENTOS not in df_segmentos.columns:
         st.error(f"Erro de configuração: A coluna de rentabilidade não foi encontrada em uma das tabelas.")
         st.write(
@@ -610,28 +780,18 @@ def pagina_home():
         st.write("Colunas encontradas em Segmentos:", df_segmentos.columns.to_list())
 
     elif not df_planos.empty and not df_segmentos.empty:
-        # Renomeia as colunas específicas para um nome padrão 'rentabilidade' para o resto do código
-        df_planos_prep = df_planos.rename(columns={COLUNA_RENTAB_PLANOS: 'rentabilidade'})
-        df_planos_prep['nome_unico'] = df_planos_prep['nome_plano']
-        df_planos_prep['Tipo'] = 'Plano'
-
-        df_segmentos_prep = df_segmentos.rename(columns={COLUNA_RENTAB_SEGMENTOS: 'rentabilidade'})
-        df_segmentos_prep['nome_unico'] = df_segmentos_prep['nome_plano'] + " - " + df_segmentos_prep['segmento']
-        df_segmentos_prep['Tipo'] = 'Segmento'
-
-        df_performance = pd.concat([
-            df_planos_prep[['data_posicao', 'nome_unico', 'rentabilidade', 'Tipo']],
-            df_segmentos_prep[['data_posicao', 'nome_unico', 'rentabilidade', 'Tipo']]
-        ])
-
-        df_performance['rentabilidade'] = pd.to_numeric(df_performance['rentabilidade'], errors='coerce')
-        df_performance.dropna(subset=['rentabilidade'], inplace=True)
-        df_performance['rentabilidade'] = df_performance['rentabilidade'] / 100
-        df_performance['data_posicao'] = df_performance['data_posicao'].dt.to_period('M').dt.start_time
-
-        # O resto do código continua como antes, pois ele já espera uma coluna chamada 'rentabilidade'
-        lista_performance = sorted(df_performance['nome_unico'].unique())
-        lista_indicadores = sorted([col for col in df_indices.columns if col not in ['data_posicao']])
+        # Matrizes data × série montadas uma vez por versão dos dados (ver obter_matriz_performance)
+        metricas.registrar_consulta_cache('matriz_performance')
+        metricas.registrar_consulta_cache('matriz_indices')
+        matriz_performance, tipos_performance = obter_matriz_performance(
+            banco_dados.chave_versao(versoes, 'planos') + banco_dados.chave_versao(versoes, 'segmentos'),
+            df_planos, df_segmentos, COLUNA_RENTAB_PLANOS, COLUNA_RENTAB_SEGMENTOS)
+        matriz_indices = obter_matriz_indices(banco_dados.chave_versao(versoes, 'indices_taxas'), df_indices)
+        chave_rentabilidade = tuple(banco_dados.chave_versao(versoes, tabela)
+                                    for tabela in ('planos', 'segmentos', 'indices_taxas'))
+
+        lista_performance = list(matriz_performance.series)
+        lista_indicadores = list(matriz_indices.series)
 
         planos_segmentos_selecionados = st.multiselect(
             "Selecione um ou mais Planos/Segmentos para comparar a performance:",
@@ -646,100 +806,76 @@ def pagina_home():
             key="home_indicadores"
         )
 
-        df_indices_norm = df_indices.copy()
-        df_indices_norm['data_posicao'] = df_indices_norm['data_posicao'].dt.to_period('M').dt.start_time
-
-        all_dates_series = pd.concat([df_performance['data_posicao'], df_indices_norm['data_posicao']]).dropna()
-        datas_disponiveis = all_dates_series.drop_duplicates().sort_values(ascending=False)
-        opcoes_data = {d.strftime('%B de %Y'): d for d in datas_disponiveis}
+        meses = meses_calendario(esquema.chave_mes(matriz_performance.datas.union(matriz_indices.datas)),
+                                 'rotulo_extenso', decrescente=True)
+        opcoes_meses = meses.index.tolist()
 
         col_data1, col_data2 = st.columns(2)
         with col_data1:
-            data_inicial_str = st.selectbox("Data Inicial da Análise:", options=list(opcoes_data.keys()),
-                                            index=len(opcoes_data) - 1, key="home_rent_data_inicial")
+            mes_inicial = st.selectbox("Data Inicial da Análise:", options=opcoes_meses, index=len(opcoes_meses) - 1,
+                                       format_func=meses.get, key="home_rent_data_inicial")
         with col_data2:
-            data_final_str = st.selectbox("Data Final da Análise:", options=list(opcoes_data.keys()), index=0,
-                                          key="home_rent_data_final")
+            mes_final = st.selectbox("Data Final da Análise:", options=opcoes_meses, index=0, format_func=meses.get,
+                                     key="home_rent_data_final")
 
-        data_inicial_selecionada = opcoes_data[data_inicial_str]
-        data_final_selecionada = opcoes_data[data_final_str]
+        # As matrizes de retorno são indexadas pelo primeiro dia de cada mês
+        data_inicial_selecionada = obter_calendario().at[mes_inicial, 'inicio_mes']
+        data_final_selecionada = obter_calendario().at[mes_final, 'inicio_mes']
 
         if not planos_segmentos_selecionados and not indicadores_selecionados:
             st.info("Selecione pelo menos um item para visualizar o gráfico.")
         elif data_inicial_selecionada > data_final_selecionada:
             st.warning("A Data Inicial deve ser anterior ou igual à Data Final.")
         else:
-            dfs_combinados = []
-
-            if planos_segmentos_selecionados:
-                df_perf_full = df_performance[df_performance['nome_unico'].isin(planos_segmentos_selecionados)].copy()
-                df_perf_full.sort_values(by='data_posicao', inplace=True)
-                df_perf_full['ret_acum_hist'] = df_perf_full.groupby('nome_unico')['rentabilidade'].transform(
-                    lambda x: (1 + x).cumprod())
-                df_perf_periodo = df_perf_full[(df_perf_full['data_posicao'] >= data_inicial_selecionada) & (
-                            df_perf_full['data_posicao'] <= data_final_selecionada)].copy()
-
-                if not df_perf_periodo.empty:
-                    base_values = df_perf_periodo.groupby('nome_unico')['ret_acum_hist'].first()
-                    df_perf_periodo['base'] = df_perf_periodo['nome_unico'].map(base_values)
-                    df_perf_periodo['retorno_acumulado'] = (df_perf_periodo['ret_acum_hist'] / df_perf_periodo[
-                        'base']) - 1
-                    df_perf_periodo.rename(columns={'nome_unico': 'Nome'}, inplace=True)
-                    dfs_combinados.append(df_perf_periodo[['data_posicao', 'Nome', 'retorno_acumulado', 'Tipo']])
-
-            if indicadores_selecionados:
-                df_indices_long = df_indices_norm.melt(id_vars=['data_posicao'], value_vars=indicadores_selecionados,
-                                                       var_name='Nome', value_name='rentabilidade')
-                df_indices_long['rentabilidade'] = pd.to_numeric(df_indices_long['rentabilidade'], errors='coerce')
-                df_indices_long.sort_values(by='data_posicao', inplace=True)
-                df_indices_long['ret_acum_hist'] = df_indices_long.groupby('Nome')['rentabilidade'].transform(
-                    lambda x: (1 + x).cumprod())
-
-                df_indices_periodo = df_indices_long[(df_indices_long['data_posicao'] >= data_inicial_selecionada) & (
-                            df_indices_long['data_posicao'] <= data_final_selecionada)].copy()
-
-                if not df_indices_periodo.empty:
-                    base_values_ind = df_indices_periodo.groupby('Nome')['ret_acum_hist'].first()
-                    df_indices_periodo['base'] = df_indices_periodo['Nome'].map(base_values_ind)
-                    df_indices_periodo['retorno_acumulado'] = (df_indices_periodo['ret_acum_hist'] / df_indices_periodo[
-                        'base']) - 1
-                    df_indices_periodo['Tipo'] = 'Indicador'
-                    dfs_combinados.append(df_indices_periodo[['data_posicao', 'Nome', 'retorno_acumulado', 'Tipo']])
-
-            if dfs_combinados:
-                df_final_plot = pd.concat(dfs_combinados, ignore_index=True).sort_values(by='data_posicao')
-                fig_rentabilidade = px.line(
-                    df_final_plot, x='data_posicao', y='retorno_acumulado', color='Nome',
-                    line_dash='Tipo', line_shape='spline',
-                    labels={"data_posicao": "<b>Data</b>", "retorno_acumulado": "<b>Rentabilidade Acumulada (%)</b>",
-                            "Nome": "<b>Ativo</b>"}
-                )
-                fig_rentabilidade.update_traces(mode='lines+markers')
-                fig_rentabilidade.update_layout(
-                    plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
-                    xaxis=dict(gridcolor='#e0e0e0', tickformat='%b/%Y', dtick="M1"),
-                    yaxis=dict(gridcolor='#e0e0e0', tickformat=".2%"),
-                    legend=dict(orientation="h", yanchor="bottom", y=-0.4, title_text=""),
-                    margin=dict(l=40, r=40, t=40, b=40),
-                    hovermode="x unified",
-                    hoverlabel=dict(bgcolor="white", font_size=16),
-                    legend_traceorder="grouped"
-                )
-                st.plotly_chart(fig_rentabilidade, use_container_width=True)
+            df_final_plot = analise.curvas_rentabilidade(
+                [(matriz_performance, planos_segmentos_selecionados, tipos_performance),
+                 (matriz_indices, indicadores_selecionados, 'Indicador')],
+                data_inicial_selecionada, data_final_selecionada)
+
+            if not df_final_plot.empty:
+                def construir_rentabilidade():
+                    fig_rentabilidade = px.line(
+                        df_final_plot, x='data_posicao', y='retorno_acumulado', color='Nome',
+                        line_dash='Tipo', line_shape='spline',
+                        labels={"data_posicao": "<b>Data</b>", "retorno_acumulado": "<b>Rentabilidade Acumulada (%)</b>",
+                                "Nome": "<b>Ativo</b>"}
+                    )
+                    fig_rentabilidade.update_traces(mode='lines+markers')
+                    fig_rentabilidade.update_layout(
+                        plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
+                        xaxis=dict(gridcolor='#e0e0e0', tickformat='%b/%Y', dtick="M1"),
+                        yaxis=dict(gridcolor='#e0e0e0', tickformat=".2%"),
+                        legend=dict(orientation="h", yanchor="bottom", y=-0.4, title_text=""),
+                        margin=dict(l=40, r=40, t=40, b=40),
+                        hovermode="x unified",
+                        hoverlabel=dict(bgcolor="white", font_size=16),
+                        legend_traceorder="grouped"
+                    )
+                    return fig_rentabilidade
+
+                chave_figura = ('home', 'rentabilidade', chave_rentabilidade, tuple(planos_segmentos_selecionados),
+                                tuple(indicadores_selecionados), data_inicial_selecionada, data_final_selecionada)
+                fig_rentabilidade = figura_em_cache(chave_figura, construir_rentabilidade)
+                exibir_grafico(fig_rentabilidade)
             else:
                 st.warning("Nenhum dado encontrado para os ativos selecionados no período especificado.")
     else:
         st.warning(
             "Não foi possível carregar os dados das tabelas 'Planos' ou 'Segmentos' para exibir o gráfico de rentabilidade.")
 
+
+# Os sliders de quantidade refazem só os dois treemaps.
+@fragmento
+@medir_secao("rankings")
+def secao_home_rankings(chave_dados, data_selecionada, df_resumo_fundo, df_resumo_gestor, patrimonio_na_data):
     # --- INÍCIO DO BLOCO DE RANKINGS ---
     st.markdown("---")
     st.subheader("Rankings de Fundos e Gestores")
 
     # Garante que há dados de investimento para a data selecionada
-    if not df_inv_filtrado.empty:
-        total_fundos = df_inv_filtrado['nome_fundo'].nunique()
-        total_gestores = df_inv_filtrado['gestor'].nunique()
+    total_fundos = analise.total_distintos(df_resumo_fundo, 'nome_fundo', data_selecionada)
+    if total_fundos > 0:
+        total_gestores = analise.total_distintos(df_resumo_gestor, 'gestor', data_selecionada)
 
         num_fundos = st.slider(
             "Selecione o número de fundos para exibir:",
@@ -749,29 +885,28 @@ def pagina_home():
             key="num_fundos"
         )
 
-        df_fundos = df_inv_filtrado.groupby('nome_fundo')['valor_total'].sum().nlargest(num_fundos).reset_index()
+        def construir_treemap_fundos():
+            df_fundos = analise.ranking(df_resumo_fundo, 'nome_fundo', data_selecionada, num_fundos, patrimonio_na_data)
 
-        # Calcula o percentual em relação ao patrimônio total da data
-        if patrimonio_na_data > 0:
-            df_fundos['percentual_patrimonio'] = (df_fundos['valor_total'] / patrimonio_na_data) * 100
-        else:
-            df_fundos['percentual_patrimonio'] = 0
-
-        fig_treemap_fundos = px.treemap(
-            df_fundos,
-            path=[px.Constant(f"Top {num_fundos} Maiores Fundos"), 'nome_fundo'],
-            values='valor_total',
-            color='valor_total',
-            color_continuous_scale='Blues',
-            custom_data=['percentual_patrimonio']
-        )
-        fig_treemap_fundos.update_traces(
-            texttemplate='<b>%{label}</b><br>R$ %{value:,.2f}<br>%{customdata[0]:.2f}% do Total',
-            textfont_size=16,
-            hovertemplate='<b>%{label}</b><br>Valor: R$ %{value:,.2f}<br>%{customdata[0]:.2f}% do Patrimônio Total<extra></extra>'
-        )
-        fig_treemap_fundos.update_layout(margin=dict(t=30, l=10, r=10, b=10))
-        st.plotly_chart(fig_treemap_fundos, use_container_width=True)
+            fig_treemap_fundos = px.treemap(
+                df_fundos,
+                path=[px.Constant(f"Top {num_fundos} Maiores Fundos"), 'nome_fundo'],
+                values='valor_total',
+                color='valor_total',
+                color_continuous_scale='Blues',
+                custom_data=['percentual_patrimonio']
+            )
+            fig_treemap_fundos.update_traces(
+                texttemplate='<b>%{label}</b><br>R$ %{value:,.2f}<br>%{customdata[0]:.2f}% do Total',
+                textfont_size=16,
+                hovertemplate='<b>%{label}</b><br>Valor: R$ %{value:,.2f}<br>%{customdata[0]:.2f}% do Patrimônio Total<extra></extra>'
+            )
+            fig_treemap_fundos.update_layout(margin=dict(t=30, l=10, r=10, b=10))
+            return fig_treemap_fundos
+
+        chave_figura = ('home', 'treemap_fundos', chave_dados, data_selecionada, num_fundos)
+        fig_treemap_fundos = figura_em_cache(chave_figura, construir_treemap_fundos)
+        exibir_grafico(fig_treemap_fundos)
 
         # --- Ranking de Gestores ---
         num_gestores = st.slider(
@@ -782,29 +917,28 @@ def pagina_home():
             key="num_gestores"
         )
 
-        df_gestores = df_inv_filtrado.groupby('gestor')['valor_total'].sum().nlargest(num_gestores).reset_index()
+        def construir_treemap_gestores():
+            df_gestores = analise.ranking(df_resumo_gestor, 'gestor', data_selecionada, num_gestores, patrimonio_na_data)
 
-        # Calcula o percentual em relação ao patrimônio total da data
-        if patrimonio_na_data > 0:
-            df_gestores['percentual_patrimonio'] = (df_gestores['valor_total'] / patrimonio_na_data) * 100
-        else:
-            df_gestores['percentual_patrimonio'] = 0
-
-        fig_treemap_gestores = px.treemap(
-            df_gestores,
-            path=[px.Constant(f"Top {num_gestores} Maiores Gestores"), 'gestor'],
-            values='valor_total',
-            color='valor_total',
-            color_continuous_scale='Blues',
-            custom_data=['percentual_patrimonio']
-        )
-        fig_treemap_gestores.update_traces(
-            texttemplate='<b>%{label}</b><br>R$ %{value:,.2f}<br>%{customdata[0]:.2f}% do Total',
-            textfont_size=16,
-            hovertemplate='<b>%{label}</b><br>Valor: R$ %{value:,.2f}<br>%{customdata[0]:.2f}% do Patrimônio Total<extra></extra>'
-        )
-        fig_treemap_gestores.update_layout(margin=dict(t=30, l=10, r=10, b=10))
-        st.plotly_chart(fig_treemap_gestores, use_container_width=True)
+            fig_treemap_gestores = px.treemap(
+                df_gestores,
+                path=[px.Constant(f"Top {num_gestores} Maiores Gestores"), 'gestor'],
+                values='valor_total',
+                color='valor_total',
+                color_continuous_scale='Blues',
+                custom_data=['percentual_patrimonio']
+            )
+            fig_treemap_gestores.update_traces(
+                texttemplate='<b>%{label}</b><br>R$ %{value:,.2f}<br>%{customdata[0]:.2f}% do Total',
+                textfont_size=16,
+                hovertemplate='<b>%{label}</b><br>Valor: R$ %{value:,.2f}<br>%{customdata[0]:.2f}% do Patrimônio Total<extra></extra>'
+            )
+            fig_treemap_gestores.update_layout(margin=dict(t=30, l=10, r=10, b=10))
+            return fig_treemap_gestores
+
+        chave_figura = ('home', 'treemap_gestores', chave_dados, data_selecionada, num_gestores)
+        fig_treemap_gestores = figura_em_cache(chave_figura, construir_treemap_gestores)
+        exibir_grafico(fig_treemap_gestores)
 
     else:
         st.warning("Não há dados de investimentos para a data selecionada para exibir os rankings.")
@@ -816,23 +950,46 @@ def criar_pagina_plano(nome_plano_key):
     config = CONFIGURACOES_PLANOS[nome_plano_key]
     st.title(config["titulo"])
 
-    df_investimentos, df_imoveis, df_ativos, df_indices, df_planos, df_segmentos = carregar_dados()
+    # --- RESUMOS DO PLANO (FILTRADOS PELA CONFIGURAÇÃO) ---
+    versoes = ler_versoes_banco()
+    chave_dados = banco_dados.chave_versao(versoes, 'resumos')
+    df_resumo_data, df_resumo_plano, df_resumo_segmento, df_resumo_fundo, df_resumo_gestor = carregar_resumos(versoes)
 
-    # --- FILTRAGEM DOS DADOS USANDO A CONFIGURAÇÃO DO PLANO ---
-    df_investimentos_plano = df_investimentos[df_investimentos['nome_plano'] == config["filtro_investimentos"]].copy()
-    df_imoveis_plano = df_imoveis[df_imoveis['nome_plano'] == config["filtro_investimentos"]].copy()
+    filtro_plano = config["filtro_investimentos"]
+    df_evolucao = analise.evolucao_patrimonio(df_resumo_data, df_resumo_plano, filtro_plano)
 
-    if df_investimentos_plano.empty and df_imoveis_plano.empty:
+    if df_evolucao.empty:
         st.warning(f"Nenhum dado encontrado para o plano {nome_plano_key}.")
         return
 
     # --- KPIs, Evolução e Variação ---
-    data_mais_recente = (pd.concat([df_investimentos_plano['data_posicao'], df_imoveis_plano['data_posicao']])
-                         .dropna().max())
-    patrimonio_consolidado = (
-            df_investimentos_plano[df_investimentos_plano['data_posicao'] == data_mais_recente]['valor_total'].sum() +
-            df_imoveis_plano[df_imoveis_plano['data_posicao'] == data_mais_recente]['valor_total'].sum())
-    patrimonio_formatado = f"R$ {patrimonio_consolidado:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    secao_plano_evolucao(nome_plano_key, chave_dados, df_evolucao)
+
+    st.markdown("---")
+
+    secao_plano_variacao(nome_plano_key, df_evolucao)
+    st.markdown("---")
+
+    st.subheader(f"Análise da Carteira de Investimentos ({nome_plano_key})")
+
+    meses_analise = meses_calendario(df_evolucao['chave_mes'], decrescente=True)
+    data_selecionada = st.selectbox("Selecione a data para análise da composição:", meses_analise.index.tolist(),
+                                    format_func=meses_analise.get, key=f"{nome_plano_key}_composicao_data")
+    if data_selecionada is None: return
+    patrimonio_na_data = analise.patrimonio_no_mes(df_evolucao, data_selecionada)
+    st.markdown("<br>", unsafe_allow_html=True)
+
+    secao_plano_segmentos(nome_plano_key, chave_dados, data_selecionada, df_resumo_segmento, filtro_plano)
+    secao_plano_rankings(nome_plano_key, chave_dados, data_selecionada, df_resumo_fundo, df_resumo_gestor,
+                         filtro_plano, patrimonio_na_data)
+    secao_plano_rentabilidade(nome_plano_key)
+
+
+# KPIs e gráfico de evolução do patrimônio do plano.
+@medir_secao("evolucao")
+def secao_plano_evolucao(nome_plano_key, chave_dados, df_evolucao):
+    data_mais_recente, patrimonio_consolidado = analise.patrimonio_mais_recente(df_evolucao)
+    patrimonio_formatado = formatacao.moeda(patrimonio_consolidado)
     data_formatada = data_mais_recente.strftime('%d/%m/%Y')
 
     col1, col2 = st.columns(2)
@@ -856,63 +1013,51 @@ def criar_pagina_plano(nome_plano_key):
     st.markdown("<br>", unsafe_allow_html=True)
     st.subheader(f"Evolução do Patrimônio ({nome_plano_key})")
 
-    df_evol_inv = df_investimentos_plano.groupby('data_posicao')['valor_total'].sum().reset_index().rename(
-        columns={'valor_total': 'valor_investimentos'})
-    df_evol_imo = df_imoveis_plano.groupby('data_posicao')['valor_total'].sum().reset_index().rename(
-        columns={'valor_total': 'valor_imoveis'})
-    df_evolucao = pd.merge(df_evol_inv, df_evol_imo, on='data_posicao', how='outer').fillna(0)
-    df_evolucao['Total'] = df_evolucao['valor_investimentos'] + df_evolucao['valor_imoveis']
-
-    fig_evol = px.line(df_evolucao, x='data_posicao', y='Total', line_shape='spline')
-    fig_evol.update_traces(
-        line=dict(color='#1161e6', width=3),
-        marker=dict(size=8, color='#4361f2', line=dict(width=1, color='#ffffff')),
-        hovertemplate='<b>Data:</b> %{x|%d/%m/%Y}<br><b>Patrimônio:</b> R$ %{y:,.2f}<extra></extra>',
-        text=df_evolucao['Total'].apply(formatar_numero_br),
-    )
-    meses_map_pt = {1: 'Jan', 2: 'Fev', 3: 'Mar', 4: 'Abr', 5: 'Mai', 6: 'Jun', 7: 'Jul', 8: 'Ago', 9: 'Set', 10: 'Out',
-                    11: 'Nov', 12: 'Dez'}
-    tick_values = df_evolucao['data_posicao']
-    tick_labels = [f"{meses_map_pt[d.month]}/{d.year}" for d in tick_values]
-    fig_evol.update_layout(
-        plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
-        xaxis=dict(title='<b>Data</b>', gridcolor='#e0e0e0', tickvals=tick_values, ticktext=tick_labels),
-        yaxis=dict(title='<b>Patrimônio (R$)</b>', gridcolor='#e0e0e0', tickformat=',.0f'),
-        margin=dict(l=40, r=40, t=40, b=40), hovermode="x unified",
-        hoverlabel=dict(bgcolor="white", font_size=17, font_family="sans-serif")
-    )
-    st.plotly_chart(fig_evol, use_container_width=True)
+    def construir_evol():
+        fig_evol = px.line(df_evolucao, x='data_posicao', y='Total', line_shape='spline')
+        fig_evol.update_traces(
+            line=dict(color='#1161e6', width=3),
+            marker=dict(size=8, color='#4361f2', line=dict(width=1, color='#ffffff')),
+            hovertemplate='<b>Data:</b> %{x|%d/%m/%Y}<br><b>Patrimônio:</b> R$ %{y:,.2f}<extra></extra>',
+            text=formatacao.abreviado(df_evolucao['Total']),
+        )
+        tick_values = df_evolucao['data_posicao']
+        tick_labels = rotulos_eixo(df_evolucao['chave_mes'])
+        fig_evol.update_layout(
+            plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
+            xaxis=dict(title='<b>Data</b>', gridcolor='#e0e0e0', tickvals=tick_values, ticktext=tick_labels),
+            yaxis=dict(title='<b>Patrimônio (R$)</b>', gridcolor='#e0e0e0', tickformat=',.0f'),
+            margin=dict(l=40, r=40, t=40, b=40), hovermode="x unified",
+            hoverlabel=dict(bgcolor="white", font_size=17, font_family="sans-serif")
+        )
+        return fig_evol
+
+    fig_evol = figura_em_cache((nome_plano_key, 'evolucao', chave_dados), construir_evol)
+    exibir_grafico(fig_evol)
 
-    st.markdown("---")
 
+@fragmento
+@medir_secao("variacao")
+def secao_plano_variacao(nome_plano_key, df_evolucao):
     st.subheader(f"Análise de Variação Patrimonial ({nome_plano_key})")
-    datas_disponiveis_dt = sorted(pd.to_datetime(df_evolucao['data_posicao'].unique()))
-    meses_pt_full = {1: 'Janeiro', 2: 'Fevereiro', 3: 'Março', 4: 'Abril', 5: 'Maio', 6: 'Junho', 7: 'Julho',
-                     8: 'Agosto', 9: 'Setembro', 10: 'Outubro', 11: 'Novembro', 12: 'Dezembro'}
-    opcoes_map = {f"{meses_pt_full[d.month]}/{d.year}": d for d in datas_disponiveis_dt}
-    opcoes_labels = list(opcoes_map.keys())
+    meses = meses_calendario(df_evolucao['chave_mes'])
+    opcoes_meses = meses.index.tolist()
     col_data1, col_data2 = st.columns(2)
     with col_data1:
-        label_inicial = st.selectbox("Selecione a Data Inicial:", opcoes_labels, index=0,
-                                     key=f"{nome_plano_key}_data_inicial")
+        data_inicial = st.selectbox("Selecione a Data Inicial:", opcoes_meses, index=0, format_func=meses.get,
+                                    key=f"{nome_plano_key}_data_inicial")
     with col_data2:
-        label_final = st.selectbox("Selecione a Data Final:", opcoes_labels, index=len(opcoes_labels) - 1,
-                                   key=f"{nome_plano_key}_data_final")
-
-    data_inicial = opcoes_map[label_inicial]
-    data_final = opcoes_map[label_final]
+        data_final = st.selectbox("Selecione a Data Final:", opcoes_meses, index=len(opcoes_meses) - 1,
+                                  format_func=meses.get, key=f"{nome_plano_key}_data_final")
 
     if data_inicial >= data_final:
         st.warning("A Data Inicial deve ser anterior à Data Final para calcular a variação.")
     else:
-        valor_inicial = df_evolucao.loc[df_evolucao['data_posicao'] == data_inicial, 'Total'].iloc[0]
-        valor_final = df_evolucao.loc[df_evolucao['data_posicao'] == data_final, 'Total'].iloc[0]
-        variacao_rs = valor_final - valor_inicial
-        variacao_pct = (valor_final / valor_inicial - 1) * 100 if valor_inicial != 0 else 0
+        variacao_rs, variacao_pct = analise.variacao_patrimonial(df_evolucao, data_inicial, data_final)
         sinal_rs = "+" if variacao_rs >= 0 else ""
         sinal_pct = "+" if variacao_pct >= 0 else ""
         cor_variacao = "green" if variacao_rs >= 0 else "red"
-        variacao_rs_f = f"R$ {variacao_rs:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+        variacao_rs_f = formatacao.moeda(variacao_rs)
         col_var1, col_var2 = st.columns(2)
         with col_var1:
             st.markdown(
@@ -920,179 +1065,169 @@ def criar_pagina_plano(nome_plano_key):
                 unsafe_allow_html=True)
         with col_var2:
             st.markdown(
-                f'<div class="var-card {cor_variacao}"><div class="var-title">VARIAÇÃO (%)</div><div class="var-value">{sinal_pct}{variacao_pct:.2f}%</div></div>',
+                f'<div class="var-card {cor_variacao}"><div class="var-title">VARIAÇÃO (%)</div><div class="var-value">{sinal_pct}{formatacao.percentual(variacao_pct)}</div></div>',
                 unsafe_allow_html=True)
 
-    st.markdown("---")
-
-    st.subheader(f"Análise da Carteira de Investimentos ({nome_plano_key})")
-
-    datas_analise = sorted(pd.to_datetime(df_evolucao['data_posicao'].unique()), reverse=True)
-    opcoes_map_analise = {f"{meses_pt_full[d.month]}/{d.year}": d for d in datas_analise}
-    label_selecionada = st.selectbox("Selecione a data para análise da composição:", list(opcoes_map_analise.keys()),
-                                     key=f"{nome_plano_key}_composicao_data")
-    if not label_selecionada: return
-    data_selecionada = opcoes_map_analise[label_selecionada]
-    df_inv_filtrado_data = df_investimentos_plano[df_investimentos_plano['data_posicao'] == data_selecionada]
-    df_imo_filtrado_data = df_imoveis_plano[df_imoveis_plano['data_posicao'] == data_selecionada]
-    patrimonio_na_data = df_inv_filtrado_data['valor_total'].sum() + df_imo_filtrado_data['valor_total'].sum()
-    cores_azuis = ['#0d47a1', '#1976d2', '#42a5f5', '#90caf9', '#bbdefb', '#e3f2fd']
-    st.markdown("<br>", unsafe_allow_html=True)
 
+@fragmento
+@medir_secao("segmentos")
+def secao_plano_segmentos(nome_plano_key, chave_dados, data_selecionada, df_resumo_segmento, nome_plano):
     col_seg1, col_seg2 = st.columns([0.8, 1.2])
     with col_seg1:
         st.markdown("##### Distribuição por Segmentos")
-        df_seg_inv = df_inv_filtrado_data.groupby('segmento')['valor_total'].sum().reset_index()
-        df_seg_imo = df_imo_filtrado_data.groupby('segmento')['valor_total'].sum().reset_index()
-        df_segmentos_full = pd.concat([df_seg_inv, df_seg_imo], ignore_index=True)
-        fig_rosca_seg = go.Figure(data=[
-            go.Pie(labels=df_segmentos_full['segmento'], values=df_segmentos_full['valor_total'], hole=.4,
-                   textinfo='percent', textfont_size=17,
-                   hovertemplate='<b>%{label}</b><br>R$ %{value:,.2f}<br>%{percent}<extra></extra>',
-                   marker=dict(colors=cores_azuis, line=dict(color='#ffffff', width=2)))])
-        fig_rosca_seg.update_layout(showlegend=True, legend=dict(orientation="h", yanchor="bottom", y=-0.2),
-                                    margin=dict(t=0, b=0, l=0, r=0), height=400,
-                                    hoverlabel=dict(bgcolor="white", font_size=16, font_family="sans-serif"))
-        st.plotly_chart(fig_rosca_seg, use_container_width=True)
+        df_segmentos_full = analise.distribuicao_segmentos(df_resumo_segmento, data_selecionada, nome_plano)
+        def construir_rosca_seg():
+            fig_rosca_seg = go.Figure(data=[
+                go.Pie(labels=df_segmentos_full['segmento'], values=df_segmentos_full['valor_total'], hole=.4,
+                       textinfo='percent', textfont_size=17,
+                       hovertemplate='<b>%{label}</b><br>R$ %{value:,.2f}<br>%{percent}<extra></extra>',
+                       marker=dict(colors=CORES_AZUIS, line=dict(color='#ffffff', width=2)))])
+            fig_rosca_seg.update_layout(showlegend=True, legend=dict(orientation="h", yanchor="bottom", y=-0.2),
+                                        margin=dict(t=0, b=0, l=0, r=0), height=400,
+                                        hoverlabel=dict(bgcolor="white", font_size=16, font_family="sans-serif"))
+            return fig_rosca_seg
+
+        chave_figura = (nome_plano_key, 'rosca_segmentos', chave_dados, data_selecionada)
+        fig_rosca_seg = figura_em_cache(chave_figura, construir_rosca_seg)
+        exibir_grafico(fig_rosca_seg)
 
     with col_seg2:
-        df_tabela_seg = df_segmentos_full.copy().sort_values(by='valor_total', ascending=False)
-        total_segmentos = df_tabela_seg['valor_total'].sum()
-        df_tabela_seg['%'] = (df_tabela_seg['valor_total'] / total_segmentos * 100) if total_segmentos > 0 else 0
-        df_tabela_seg['valor_total_str'] = df_tabela_seg['valor_total'].apply(lambda x: f"R$ {x:,.2f}")
-        df_tabela_seg['%_str'] = df_tabela_seg['%'].apply(lambda x: f"{x:.2f}%")
-        tabela_html_seg = """<table style="width:100%; border-collapse: collapse;">
-                           <tr style="border-bottom: 2px solid #0d47a1; color: #0d47a1;">
-                               <th style="text-align:left; padding: 8px;">Segmento</th>
-                               <th style="text-align:right; padding: 8px;">Valor (R$)</th>
-                               <th style="text-align:right; padding: 8px;">%</th>
-                           </tr>"""
-        for index, row in df_tabela_seg.iterrows():
-            tabela_html_seg += f'<tr style="border-bottom: 1px solid #ddd;"><td style="padding: 8px;">{row["segmento"]}</td><td style="text-align:right; padding: 8px;">{row["valor_total_str"]}</td><td style="text-align:right; padding: 8px;">{row["%_str"]}</td></tr>'
-        tabela_html_seg += f"""<tr style="background-color: #f0f2f6; border-top: 2px solid #0d47a1;">
-                               <td style="padding: 10px; font-weight: bold;">Total</td>
-                               <td style="text-align:right; padding: 10px; font-weight: bold;">R$ {total_segmentos:,.2f}</td>
-                               <td style="text-align:right; padding: 10px; font-weight: bold;">100.00%</td>
-                           </tr></table>"""
-        components.html(tabela_html_seg, height=400, scrolling=False)
+        df_tabela_seg, total_segmentos = analise.tabela_participacao(df_segmentos_full)
+        exibir_tabela(df_tabela_seg, COLUNAS_TABELA_SEGMENTOS,
+                      total={'segmento': 'Total', 'valor_total': total_segmentos, '%': 100},
+                      cor_destaque='#0d47a1', altura_maxima=400)
 
     st.markdown("<br>", unsafe_allow_html=True)
     st.markdown(f"##### Evolução da Distribuição por Segmentos ({nome_plano_key})")
 
-    df_seg_evol = pd.concat([
-        df_investimentos_plano[['data_posicao', 'segmento', 'valor_total']],
-        df_imoveis_plano[['data_posicao', 'segmento', 'valor_total']]
-    ])
-    df_seg_evol_agg = df_seg_evol.groupby(['data_posicao', 'segmento'])['valor_total'].sum().unstack().fillna(0)
-    df_seg_evol_pct = df_seg_evol_agg.div(df_seg_evol_agg.sum(axis=1), axis=0) * 100
-    df_seg_evol_val = df_seg_evol_agg.copy()
-
-    fig_evol_seg = go.Figure()
-
-    seg_rotulo_cima = ['ESTRUTURADO', 'RENDA FIXA', 'RENDA VARIÁVEL', 'OPERACAO COM PARTICIPANTES']
-    seg_rotulo_meio = []
-
-    for segmento in df_seg_evol_pct.columns:
-        mode = 'lines'
-        text_position = None
-        if segmento in seg_rotulo_cima:
-            mode = 'lines+text'
-            text_position = 'top center'
-        elif segmento in seg_rotulo_meio:
-            mode = 'lines+text'
-            text_position = 'middle center'
-
-        fig_evol_seg.add_trace(go.Scatter(
-            x=df_seg_evol_pct.index,
-            y=df_seg_evol_pct[segmento],
-            name=segmento,
-            mode=mode,
-            line_shape='spline',
-            customdata=df_seg_evol_val[segmento],
-            text=[f'{y:.1f}%' for y in df_seg_evol_pct[segmento]],
-            textposition=text_position,
-            textfont=dict(size=12, color="#000000"),
-            hovertemplate='<b>%{x|%B de %Y}</b><br>%{data.name}: %{y:.2f}%<br>Valor: R$ %{customdata:,.2f}<extra></extra>'
-        ))
-
-    evol_tick_values_seg = df_seg_evol_pct.index
-    evol_tick_labels_seg = [f"{meses_map_pt[d.month]}/{d.year}" for d in evol_tick_values_seg]
-
-    fig_evol_seg.update_layout(
-        hovermode='x unified',
-        yaxis_ticksuffix='%',
-        legend_title_text='',
-        colorway=cores_azuis,
-        xaxis=dict(tickvals=evol_tick_values_seg, ticktext=evol_tick_labels_seg),
-        margin=dict(t=20, b=40, l=40, r=20),
-        hoverlabel=dict(bgcolor="white", font_size=16, font_family="sans-serif")
-    )
-    st.plotly_chart(fig_evol_seg, use_container_width=True)
+    def construir_evol_seg():
+        df_seg_evol_pct, df_seg_evol_val = analise.evolucao_distribuicao_segmentos(df_resumo_segmento, nome_plano)
+
+        fig_evol_seg = go.Figure()
+
+        seg_rotulo_cima = ['ESTRUTURADO', 'RENDA FIXA', 'RENDA VARIÁVEL', 'OPERACAO COM PARTICIPANTES']
+        seg_rotulo_meio = []
+
+        for segmento in df_seg_evol_pct.columns:
+            mode = 'lines'
+            text_position = None
+            if segmento in seg_rotulo_cima:
+                mode = 'lines+text'
+                text_position = 'top center'
+            elif segmento in seg_rotulo_meio:
+                mode = 'lines+text'
+                text_position = 'middle center'
+
+            fig_evol_seg.add_trace(go.Scatter(
+                x=df_seg_evol_pct.index,
+                y=df_seg_evol_pct[segmento],
+                name=segmento,
+                mode=mode,
+                line_shape='spline',
+                customdata=df_seg_evol_val[segmento],
+                text=formatacao.percentual(df_seg_evol_pct[segmento].to_numpy(), casas=1),
+                textposition=text_position,
+                textfont=dict(size=12, color="#000000"),
+                hovertemplate='<b>%{x|%B de %Y}</b><br>%{data.name}: %{y:.2f}%<br>Valor: R$ %{customdata:,.2f}<extra></extra>'
+            ))
+
+        evol_tick_values_seg = df_seg_evol_pct.index
+        evol_tick_labels_seg = rotulos_eixo(esquema.chave_mes(evol_tick_values_seg))
+
+        fig_evol_seg.update_layout(
+            hovermode='x unified',
+            yaxis_ticksuffix='%',
+            legend_title_text='',
+            colorway=CORES_AZUIS,
+            xaxis=dict(tickvals=evol_tick_values_seg, ticktext=evol_tick_labels_seg),
+            margin=dict(t=20, b=40, l=40, r=20),
+            hoverlabel=dict(bgcolor="white", font_size=16, font_family="sans-serif")
+        )
+        return fig_evol_seg
+
+    fig_evol_seg = figura_em_cache((nome_plano_key, 'evolucao_segmentos', chave_dados), construir_evol_seg)
+    exibir_grafico(fig_evol_seg)
+
 
+@fragmento
+@medir_secao("rankings")
+def secao_plano_rankings(nome_plano_key, chave_dados, data_selecionada, df_resumo_fundo, df_resumo_gestor,
+                         nome_plano, patrimonio_na_data):
     st.markdown("---")
     st.subheader(f"Rankings de Fundos e Gestores ({nome_plano_key})")
 
-    if not df_inv_filtrado_data.empty:
-        total_fundos = df_inv_filtrado_data['nome_fundo'].nunique()
-        total_gestores = df_inv_filtrado_data['gestor'].nunique()
+    total_fundos = analise.total_distintos(df_resumo_fundo, 'nome_fundo', data_selecionada, nome_plano)
+    if total_fundos > 0:
+        total_gestores = analise.total_distintos(df_resumo_gestor, 'gestor', data_selecionada, nome_plano)
         st.markdown("##### Maiores Alocações por Fundo")
         num_fundos = st.slider(
             "Selecione o número de fundos para exibir:", min_value=min(5, total_fundos),
             max_value=total_fundos, value=min(10, total_fundos), key=f"{nome_plano_key}_num_fundos")
-        df_fundos = df_inv_filtrado_data.groupby('nome_fundo')['valor_total'].sum().nlargest(num_fundos).reset_index()
-        df_fundos['percentual_patrimonio'] = (
-                    df_fundos['valor_total'] / patrimonio_na_data * 100) if patrimonio_na_data > 0 else 0
-        fig_treemap_fundos = px.treemap(
-            df_fundos, path=[px.Constant(f"Top {num_fundos} Maiores Fundos"), 'nome_fundo'],
-            values='valor_total', color='valor_total', color_continuous_scale='Blues',
-            custom_data=['percentual_patrimonio'])
-        fig_treemap_fundos.update_traces(
-            texttemplate='<b>%{label}</b><br>R$ %{value:,.2f}<br>%{customdata[0]:.2f}% do Total',
-            textfont_size=16,
-            hovertemplate='<b>%{label}</b><br>Valor: R$ %{value:,.2f}<br>%{customdata[0]:.2f}% do Patrimônio Total<extra></extra>')
-        fig_treemap_fundos.update_layout(margin=dict(t=30, l=10, r=10, b=10))
-        st.plotly_chart(fig_treemap_fundos, use_container_width=True)
+        def construir_treemap_fundos():
+            df_fundos = analise.ranking(df_resumo_fundo, 'nome_fundo', data_selecionada, num_fundos,
+                                        patrimonio_na_data, nome_plano)
+            fig_treemap_fundos = px.treemap(
+                df_fundos, path=[px.Constant(f"Top {num_fundos} Maiores Fundos"), 'nome_fundo'],
+                values='valor_total', color='valor_total', color_continuous_scale='Blues',
+                custom_data=['percentual_patrimonio'])
+            fig_treemap_fundos.update_traces(
+                texttemplate='<b>%{label}</b><br>R$ %{value:,.2f}<br>%{customdata[0]:.2f}% do Total',
+                textfont_size=16,
+                hovertemplate='<b>%{label}</b><br>Valor: R$ %{value:,.2f}<br>%{customdata[0]:.2f}% do Patrimônio Total<extra></extra>')
+            fig_treemap_fundos.update_layout(margin=dict(t=30, l=10, r=10, b=10))
+            return fig_treemap_fundos
+
+        chave_figura = (nome_plano_key, 'treemap_fundos', chave_dados, data_selecionada, num_fundos)
+        fig_treemap_fundos = figura_em_cache(chave_figura, construir_treemap_fundos)
+        exibir_grafico(fig_treemap_fundos)
 
         st.markdown("##### Maiores Alocações por Gestor")
         num_gestores = st.slider(
             "Selecione o número de gestores para exibir:", min_value=min(5, total_gestores),
             max_value=total_gestores, value=min(10, total_gestores), key=f"{nome_plano_key}_num_gestores")
-        df_gestores = df_inv_filtrado_data.groupby('gestor')['valor_total'].sum().nlargest(num_gestores).reset_index()
-        df_gestores['percentual_patrimonio'] = (
-                    df_gestores['valor_total'] / patrimonio_na_data * 100) if patrimonio_na_data > 0 else 0
-        fig_treemap_gestores = px.treemap(
-            df_gestores, path=[px.Constant(f"Top {num_gestores} Maiores Gestores"), 'gestor'],
-            values='valor_total', color='valor_total', color_continuous_scale='Blues',
-            custom_data=['percentual_patrimonio'])
-        fig_treemap_gestores.update_traces(
-            texttemplate='<b>%{label}</b><br>R$ %{value:,.2f}<br>%{customdata[0]:.2f}% do Total',
-            textfont_size=16,
-            hovertemplate='<b>%{label}</b><br>Valor: R$ %{value:,.2f}<br>%{customdata[0]:.2f}% do Patrimônio Total<extra></extra>')
-        fig_treemap_gestores.update_layout(margin=dict(t=30, l=10, r=10, b=10))
-        st.plotly_chart(fig_treemap_gestores, use_container_width=True)
+        def construir_treemap_gestores():
+            df_gestores = analise.ranking(df_resumo_gestor, 'gestor', data_selecionada, num_gestores,
+                                          patrimonio_na_data, nome_plano)
+            fig_treemap_gestores = px.treemap(
+                df_gestores, path=[px.Constant(f"Top {num_gestores} Maiores Gestores"), 'gestor'],
+                values='valor_total', color='valor_total', color_continuous_scale='Blues',
+                custom_data=['percentual_patrimonio'])
+            fig_treemap_gestores.update_traces(
+                texttemplate='<b>%{label}</b><br>R$ %{value:,.2f}<br>%{customdata[0]:.2f}% do Total',
+                textfont_size=16,
+                hovertemplate='<b>%{label}</b><br>Valor: R$ %{value:,.2f}<br>%{customdata[0]:.2f}% do Patrimônio Total<extra></extra>')
+            fig_treemap_gestores.update_layout(margin=dict(t=30, l=10, r=10, b=10))
+            return fig_treemap_gestores
+
+        chave_figura = (nome_plano_key, 'treemap_gestores', chave_dados, data_selecionada, num_gestores)
+        fig_treemap_gestores = figura_em_cache(chave_figura, construir_treemap_gestores)
+        exibir_grafico(fig_treemap_gestores)
     else:
         st.warning("Não há dados de investimentos para a data selecionada para exibir os rankings.")
 
+
+@fragmento
+@medir_secao("rentabilidade")
+def secao_plano_rentabilidade(nome_plano_key):
+    config = CONFIGURACOES_PLANOS[nome_plano_key]
     # --- ANÁLISE DE RENTABILIDADE ACUMULADA (COM NOME E SEGMENTO) ---
     st.markdown("---")
     st.subheader("Análise de Rentabilidade Acumulada (Fundos vs. Indicadores)")
 
-    # --- PREPARAÇÃO E NORMALIZAÇÃO DOS DADOS ---
-    df_ativos_plano = df_ativos[df_ativos['nome_plano'] == config["filtro_ativos"]].copy()
-    df_ativos_plano['rentabilidade'] = pd.to_numeric(df_ativos_plano['rentabilidade'], errors='coerce').dropna()
-    df_ativos_plano['data_posicao'] = df_ativos_plano['data_posicao'].dt.to_period('M').dt.start_time
-    df_indices_norm = df_indices.copy()
-    df_indices_norm['data_posicao'] = df_indices_norm['data_posicao'].dt.to_period('M').dt.start_time
-
-    # >>> ALTERAÇÃO APLICADA AQUI <<<
-    # 1. Cria a nova coluna combinando nome e segmento
-    df_ativos_plano['nome_fundo_segmento'] = df_ativos_plano['nome_fundo'] + " - " + df_ativos_plano['segmento']
+    # --- MATRIZES DE RENTABILIDADE DO PLANO E DOS ÍNDICES ---
+    versoes = ler_versoes_banco()
+    df_ativos_plano, df_indices = carregar_dados_plano(nome_plano_key, versoes)
+    metricas.registrar_consulta_cache('matriz_fundos')
+    metricas.registrar_consulta_cache('matriz_indices')
+    matriz_fundos = obter_matriz_fundos(config["filtro_ativos"], banco_dados.chave_versao(versoes, 'ativos'),
+                                        df_ativos_plano)
+    matriz_indices = obter_matriz_indices(banco_dados.chave_versao(versoes, 'indices_taxas'), df_indices)
+    chave_rentabilidade = (banco_dados.chave_versao(versoes, 'ativos'), banco_dados.chave_versao(versoes, 'indices_taxas'))
 
     # --- WIDGETS DE SELEÇÃO ---
-    # 2. Usa a nova coluna para criar a lista de opções
-    lista_fundos = sorted(df_ativos_plano['nome_fundo_segmento'].unique()) if not df_ativos_plano.empty else []
-    lista_indicadores = sorted(
-        [col for col in df_indices_norm.columns if col not in ['data_posicao']]) if not df_indices_norm.empty else []
+    # As opções são as séries da matriz (fundos identificados por "nome - segmento")
+    lista_fundos = list(matriz_fundos.series)
+    lista_indicadores = list(matriz_indices.series)
 
     fundos_selecionados = st.multiselect(
         "Selecione um ou mais fundos:", options=lista_fundos, default=lista_fundos[:1] if lista_fundos else [],
@@ -1104,19 +1239,20 @@ def criar_pagina_plano(nome_plano_key):
     )
 
     # --- SELETORES DE DATA ---
-    all_dates_series = pd.concat([df_ativos_plano['data_posicao'], df_indices_norm['data_posicao']]).dropna()
-    datas_disponiveis = all_dates_series.drop_duplicates().sort_values(ascending=False)
-    opcoes_data = {d.strftime('%B de %Y'): d for d in datas_disponiveis}
+    meses = meses_calendario(esquema.chave_mes(matriz_fundos.datas.union(matriz_indices.datas)),
+                             'rotulo_extenso', decrescente=True)
+    opcoes_meses = meses.index.tolist()
     col_data1, col_data2 = st.columns(2)
     with col_data1:
-        data_inicial_str = st.selectbox("Data Inicial da Análise:", options=list(opcoes_data.keys()),
-                                        index=len(opcoes_data) - 1, key=f"{nome_plano_key}_rent_data_inicial")
+        mes_inicial = st.selectbox("Data Inicial da Análise:", options=opcoes_meses, index=len(opcoes_meses) - 1,
+                                   format_func=meses.get, key=f"{nome_plano_key}_rent_data_inicial")
     with col_data2:
-        data_final_str = st.selectbox("Data Final da Análise:", options=list(opcoes_data.keys()), index=0,
-                                      key=f"{nome_plano_key}_rent_data_final")
+        mes_final = st.selectbox("Data Final da Análise:", options=opcoes_meses, index=0, format_func=meses.get,
+                                 key=f"{nome_plano_key}_rent_data_final")
 
-    data_inicial_selecionada = opcoes_data[data_inicial_str]
-    data_final_selecionada = opcoes_data[data_final_str]
+    # As matrizes de retorno são indexadas pelo primeiro dia de cada mês
+    data_inicial_selecionada = obter_calendario().at[mes_inicial, 'inicio_mes']
+    data_final_selecionada = obter_calendario().at[mes_final, 'inicio_mes']
 
     # --- LÓGICA DE CÁLCULO E PLOTAGEM ---
     if not fundos_selecionados and not indicadores_selecionados:
@@ -1124,67 +1260,42 @@ def criar_pagina_plano(nome_plano_key):
     elif data_inicial_selecionada > data_final_selecionada:
         st.warning("A Data Inicial deve ser anterior ou igual à Data Final.")
     else:
-        dfs_combinados = []
-
-        # 3. Processa os FUNDOS usando a nova coluna para filtrar e agrupar
-        if fundos_selecionados:
-            df_fundos_full = df_ativos_plano[df_ativos_plano['nome_fundo_segmento'].isin(fundos_selecionados)].copy()
-            df_fundos_full.sort_values(by='data_posicao', inplace=True)
-            df_fundos_full['ret_acum_hist'] = df_fundos_full.groupby('nome_fundo_segmento')['rentabilidade'].transform(
-                lambda x: (1 + x / 100).cumprod())
-            df_fundos_periodo = df_fundos_full[(df_fundos_full['data_posicao'] >= data_inicial_selecionada) & (
-                    df_fundos_full['data_posicao'] <= data_final_selecionada)].copy()
-            base_values = df_fundos_periodo.groupby('nome_fundo_segmento')['ret_acum_hist'].first()
-            df_fundos_periodo['base'] = df_fundos_periodo['nome_fundo_segmento'].map(base_values)
-            df_fundos_periodo['retorno_acumulado'] = (df_fundos_periodo['ret_acum_hist'] / df_fundos_periodo[
-                'base']) - 1
-            df_fundos_periodo['Tipo'] = 'Fundo'
-            df_fundos_periodo.rename(columns={'nome_fundo_segmento': 'Nome'},
-                                     inplace=True)  # Renomeia a coluna combinada
-            dfs_combinados.append(df_fundos_periodo[['data_posicao', 'Nome', 'retorno_acumulado', 'Tipo']])
-
-        # Processa os INDICADORES (sem alteração)
-        if indicadores_selecionados:
-            df_indices_long = df_indices_norm.melt(id_vars=['data_posicao'], value_vars=indicadores_selecionados,
-                                                   var_name='Nome', value_name='rentabilidade')
-            df_indices_long['rentabilidade'] = pd.to_numeric(df_indices_long['rentabilidade'], errors='coerce')
-            df_indices_long.sort_values(by='data_posicao', inplace=True)
-            df_indices_long['ret_acum_hist'] = df_indices_long.groupby('Nome')['rentabilidade'].transform(
-                lambda x: (1 + x).cumprod())
-            df_indices_periodo = df_indices_long[(df_indices_long['data_posicao'] >= data_inicial_selecionada) & (
-                    df_indices_long['data_posicao'] <= data_final_selecionada)].copy()
-            base_values_ind = df_indices_periodo.groupby('Nome')['ret_acum_hist'].first()
-            df_indices_periodo['base'] = df_indices_periodo['Nome'].map(base_values_ind)
-            df_indices_periodo['retorno_acumulado'] = (df_indices_periodo['ret_acum_hist'] / df_indices_periodo[
-                'base']) - 1
-            df_indices_periodo['Tipo'] = 'Indicador'
-            dfs_combinados.append(df_indices_periodo[['data_posicao', 'Nome', 'retorno_acumulado', 'Tipo']])
+        df_final_plot = analise.curvas_rentabilidade(
+            [(matriz_fundos, fundos_selecionados, 'Fundo'), (matriz_indices, indicadores_selecionados, 'Indicador')],
+            data_inicial_selecionada, data_final_selecionada)
 
         # Combina tudo e plota o gráfico
-        if dfs_combinados:
-            df_final_plot = pd.concat(dfs_combinados, ignore_index=True).sort_values(by='data_posicao')
-            fig_rentabilidade = px.line(
-                df_final_plot, x='data_posicao', y='retorno_acumulado', color='Nome',
-                line_dash='Tipo', line_shape='spline',
-                labels={"data_posicao": "<b>Data</b>", "retorno_acumulado": "<b>Rentabilidade Acumulada (%)</b>",
-                        "Nome": "<b>Ativo</b>"}
-            )
-            fig_rentabilidade.update_traces(mode='lines+markers')
-            fig_rentabilidade.update_layout(
-                plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
-                xaxis=dict(gridcolor='#e0e0e0', tickformat='%b/%Y', dtick="M1"),
-                yaxis=dict(gridcolor='#e0e0e0', tickformat=".2%"),
-                legend=dict(orientation="h", yanchor="bottom", y=-0.4, title_text=""),
-                margin=dict(l=40, r=40, t=40, b=40),
-                hovermode="x unified",
-                hoverlabel=dict(bgcolor="white", font_size=16),
-                legend_traceorder="grouped"
-            )
-            st.plotly_chart(fig_rentabilidade, use_container_width=True)
+        if not df_final_plot.empty:
+            def construir_rentabilidade():
+                fig_rentabilidade = px.line(
+                    df_final_plot, x='data_posicao', y='retorno_acumulado', color='Nome',
+                    line_dash='Tipo', line_shape='spline',
+                    labels={"data_posicao": "<b>Data</b>", "retorno_acumulado": "<b>Rentabilidade Acumulada (%)</b>",
+                            "Nome": "<b>Ativo</b>"}
+                )
+                fig_rentabilidade.update_traces(mode='lines+markers')
+                fig_rentabilidade.update_layout(
+                    plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
+                    xaxis=dict(gridcolor='#e0e0e0', tickformat='%b/%Y', dtick="M1"),
+                    yaxis=dict(gridcolor='#e0e0e0', tickformat=".2%"),
+                    legend=dict(orientation="h", yanchor="bottom", y=-0.4, title_text=""),
+                    margin=dict(l=40, r=40, t=40, b=40),
+                    hovermode="x unified",
+                    hoverlabel=dict(bgcolor="white", font_size=16),
+                    legend_traceorder="grouped"
+                )
+                return fig_rentabilidade
+
+            chave_figura = (nome_plano_key, 'rentabilidade', chave_rentabilidade, tuple(fundos_selecionados),
+                            tuple(indicadores_selecionados), data_inicial_selecionada, data_final_selecionada)
+            fig_rentabilidade = figura_em_cache(chave_figura, construir_rentabilidade)
+            exibir_grafico(fig_rentabilidade)
         else:
             st.warning("Nenhum dado encontrado para os ativos selecionados no período especificado.")
 
+
 carregar_css()
+preparar_banco()
 
 # --- FUNÇÕES DE PÁGINA (agora simplificadas) ---
 # Cole este bloco DEPOIS da função criar_pagina_plano
@@ -1227,5 +1338,81 @@ with st.sidebar:
     st.radio("Selecione um plano:", options=list(paginas.keys()), label_visibility="collapsed",
              key="pagina_selecionada")
 
-paginas[st.session_state.pagina_selecionada]()
+# --- EXECUÇÃO DA PÁGINA, MEDIDA SEÇÃO A SEÇÃO ---
+metricas.definir_registro(obter_registro_metricas())
+metricas.iniciar_rerun(pagina_atual())
+completo = False
+try:
+    paginas[st.session_state.pagina_selecionada]()
+    completo = True
+finally:
+    rerun = metricas.finalizar_rerun(completo)
+
+
+# --- AQUECIMENTO DOS CACHES (THREAD DE FUNDO, AO SUBIR E A CADA IMPORTAÇÃO) ---
+# Percorre a Home e as páginas de plano sem sessão, com os valores padrão dos widgets (composição na
+# data mais recente): as seções preenchem os mesmos caches, com as mesmas chaves, de uma visita real.
+# Subindo por servidor.py, o script roda uma vez sem sessão assim que o servidor existe e a thread nasce
+# aí, antes da primeira visita; com 'streamlit run', só quando a primeira sessão abre. Ela volta a
+# aquecer quando a versão dos dados muda, conferida a cada DASHBOARD_AQUECIMENTO_INTERVALO segundos ou
+# logo após o aviso de uma importação ou sincronização. DASHBOARD_AQUECIMENTO=0 desliga.
+def aquecer_caches(chave):
+    etapas = [("Dados", carregar_dados)] + [(nome_pagina(rotulo), pagina) for rotulo, pagina in paginas.items()]
+    for nome, etapa in etapas:
+        metricas.iniciar_rerun(nome, 'aquecimento')
+        completo = False
+        try:
+            etapa()
+            completo = True
+        finally:
+            metricas.finalizar_rerun(completo)
+
+
+@st.cache_resource
+def obter_aquecimento():
+    intervalo = float(os.environ.get('DASHBOARD_AQUECIMENTO_INTERVALO', 30))
+    return aquecimento.Aquecimento(aquecer_caches, lambda: tuple(sorted(ler_versoes_banco().items())), intervalo,
+                                   aviso=aquecimento.arquivo_aviso(NOME_BANCO_DADOS))
+
+
+if os.environ.get('DASHBOARD_AQUECIMENTO', '1') != '0':
+    obter_aquecimento().iniciar()
+
+
+# --- PAINEL DE DESEMPENHO (SÓ ADMINISTRADORES) ---
+def painel_desempenho(rerun):
+    st.caption(f"Último rerun ({rerun.pagina}): {rerun.segundos * 1000:.0f} ms")
+    st.markdown("**Seções**")
+    st.dataframe(pd.DataFrame([{'seção': nome, 'ms': medida['segundos'] * 1000,
+                                'memória (KB)': medida['memoria_bytes'] / 1024}
+                               for nome, medida in rerun.secoes.items()]), hide_index=True)
+    st.markdown("**Enviado ao navegador**")
+    st.dataframe(pd.DataFrame(rerun.envios), hide_index=True)
+    st.markdown("**Caches neste rerun**")
+    st.dataframe(pd.DataFrame([{'cache': nome, 'acertos': c['consultas'] - c['falhas'], 'falhas': c['falhas']}
+                               for nome, c in rerun.caches.items()]), hide_index=True)
+
+    registro = obter_registro_metricas()
+    if registro is not None:
+        registros = registro.ler(ultimas=5000)
+        st.markdown(f"**p50/p95 por página** (últimos {len(registros)} reruns)")
+        st.dataframe(metricas.percentis_reruns(registros).round(1), hide_index=True)
+        st.markdown("**p50/p95 por seção**")
+        st.dataframe(metricas.percentis_secoes(registros).round(1), hide_index=True)
+
+    carga = obter_carga_incremental()
+    st.markdown("**Processo**")
+    st.json({'motor_resumos': MOTOR_RESUMOS,
+             'aquecimento': obter_aquecimento().status(),
+             'cache_figuras': obter_cache_figuras().estatisticas(),
+             'conexoes': obter_conexoes().estatisticas(),
+             'carga_incremental': {'recargas_completas': carga.recargas_completas,
+                                   'recargas_incrementais': carga.recargas_incrementais,
+                                   'leituras_instantaneo': carga.leituras_instantaneo}})
+
+
+if modo_admin():
+    with st.sidebar:
+        with st.expander("Desempenho"):
+            painel_desempenho(rerun)
 
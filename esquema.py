@@ -0,0 +1,93 @@
+# esquema.py - Tipos compactos aplicados uma única vez, na leitura das tabelas do banco
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# Versão do esquema em memória; instantâneos gravados com outra versão são descartados.
+VERSAO_ESQUEMA = 2
+
+# --- COLUNAS DE DIMENSÃO (CATEGÓRICAS) ---
+# Poucos valores distintos repetidos em milhares de linhas: como categóricas ocupam um código inteiro
+# por linha, e filtros (==, isin) e agrupamentos comparam códigos em vez de strings.
+DIMENSOES = ('nome_plano', 'segmento', 'nome_fundo', 'gestor', 'codigo_isin_fundo', 'origem',
+             'nome_fundo_segmento', 'nome_unico')
+
+# --- RENTABILIDADES EM FLOAT32 ---
+# Percentuais mensais com poucas casas decimais cabem em float32 sem perda visível. Valores em reais
+# (valor_total, valor_cota, quantidade_cotas) continuam em float64: as somas do patrimônio precisam
+# dos centavos.
+RENTABILIDADES = {
+    'ativos': ('rentabilidade',),
+    'planos': ('rentabilidade_plano',),
+    'segmentos': ('Rentabilidade',),
+}
+
+# --- COLUNAS DERIVADAS ---
+# Rótulos que as páginas montavam a cada rerun concatenando strings; agora saem prontos da carga.
+DERIVADAS = {
+    'ativos': {'nome_fundo_segmento': ('nome_fundo', 'segmento')},
+    'planos': {'nome_unico': ('nome_plano',)},
+    'segmentos': {'nome_unico': ('nome_plano', 'segmento')},
+}
+
+
+# Colunas de data e de mês; em indices_taxas todas as outras são séries de retorno.
+COLUNAS_DATA = ('data_posicao', 'mes', 'chave_mes')
+
+
+def _colunas_rentabilidade(tabela, df):
+    if tabela == 'indices_taxas':
+        return [coluna for coluna in df.columns if coluna not in COLUNAS_DATA]
+    return [coluna for coluna in RENTABILIDADES.get(tabela, ()) if coluna in df.columns]
+
+
+# Primeiro dia do mês, calculado uma vez (em vez de .dt.to_period('M').dt.start_time a cada uso).
+def inicio_mes(datas):
+    return pd.Series(datas.to_numpy().astype('datetime64[M]').astype('datetime64[ns]'), index=datas.index)
+
+
+# Chave inteira do mês (aaaamm, ex.: 202401), como a coluna chave_mes do banco (ver calendario.py).
+# Aceita uma Series ou um DatetimeIndex de datas.
+def chave_mes(datas):
+    partes = datas.dt if isinstance(datas, pd.Series) else datas
+    return pd.to_numeric(partes.year * 100 + partes.month, downcast='integer')
+
+
+# --- APLICAÇÃO DO ESQUEMA ---
+# Recebe o DataFrame já com data_posicao convertida. 'mes' só é criada nas tabelas de dados
+# (com_mes=True); os resumos já são agregados por data. 'chave_mes' vem do banco (coluna gerada) e é
+# calculada aqui só em bancos que ainda não a têm.
+def aplicar(tabela, df, com_mes=True):
+    for coluna, origem in DERIVADAS.get(tabela, {}).items():
+        if all(parte in df.columns for parte in origem):
+            rotulo = df[origem[0]].astype(str)
+            for parte in origem[1:]:
+                rotulo = rotulo + " - " + df[parte].astype(str)
+            df[coluna] = rotulo.where(df[list(origem)].notna().all(axis=1))
+    for coluna in DIMENSOES:
+        if coluna in df.columns and not isinstance(df[coluna].dtype, pd.CategoricalDtype):
+            df[coluna] = df[coluna].astype('category')
+    colunas_float = _colunas_rentabilidade(tabela, df)
+    if colunas_float:
+        df[colunas_float] = df[colunas_float].apply(pd.to_numeric, errors='coerce').astype(np.float32)
+    if 'data_posicao' in df.columns:
+        df['chave_mes'] = (pd.to_numeric(df['chave_mes'], downcast='integer') if 'chave_mes' in df.columns
+                           else chave_mes(df['data_posicao']))
+    if com_mes and 'data_posicao' in df.columns:
+        df['mes'] = inicio_mes(df['data_posicao'])
+    return df
+
+
+# --- CONCATENAÇÃO PRESERVANDO AS CATEGÓRICAS ---
+# pd.concat de categóricas com categorias diferentes devolve object; aqui as categorias de cada coluna
+# são unidas antes, para que o resultado continue categórico.
+def concatenar(dfs):
+    dfs = [df for df in dfs if not df.empty] or dfs[:1]
+    if len(dfs) > 1:
+        categoricas = [coluna for coluna in dfs[0].columns
+                       if isinstance(dfs[0][coluna].dtype, pd.CategoricalDtype)
+                       and all(coluna in df.columns and isinstance(df[coluna].dtype, pd.CategoricalDtype) for df in dfs)]
+        for coluna in categoricas:
+            categorias = union_categoricals([df[coluna].array for df in dfs], ignore_order=True).categories
+            dfs = [df.assign(**{coluna: df[coluna].cat.set_categories(categorias)}) for df in dfs]
+    return pd.concat(dfs, ignore_index=True)
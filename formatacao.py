@@ -0,0 +1,92 @@
+# formatacao.py - Números em pt-BR (R$, %, K/M/B) para escalares, listas, arrays e Series inteiras
+#
+# Cada função aceita um escalar (devolve str) ou uma coleção (devolve uma lista de str, ou uma Series
+# com o mesmo índice). Nas coleções, só os valores distintos são formatados (pd.factorize), todos de
+# uma vez: os textos no formato en-US são unidos num só str e os separadores trocados numa única
+# passada de str.translate; o resultado volta para as posições pelo código de cada valor.
+# O texto de cada valor fica em cache por formato, então valores que se repetem entre reruns
+# (totais, percentuais, posições de datas já vistas) não são formatados de novo.
+# Valores ausentes (None/NaN) viram "".
+
+import numpy as np
+import pandas as pd
+
+TAMANHO_CACHE = 200_000  # textos por formato; ao passar disso, o cache do formato recomeça
+
+# Troca os separadores do formato en-US ("1,234.56") pelos do pt-BR ("1.234,56").
+_PARA_PT_BR = str.maketrans(',.', '.,')
+
+# (limite inferior do valor absoluto, divisor, sufixo) das abreviações
+_ESCALAS = ((1_000_000_000, 1_000_000_000, 'B'), (1_000_000, 1_000_000, 'M'), (1_000, 1_000, 'K'))
+
+_caches = {}
+
+
+# --- FORMATAÇÃO EM LOTE ---
+# 'modelo' é um str.format en-US com um campo, por exemplo "R$ {:,.2f}".
+def _em_lote(modelo, valores):
+    return "\n".join(map(modelo.format, valores)).translate(_PARA_PT_BR).split("\n")
+
+
+# Textos dos valores (floats distintos), consultando e alimentando o cache do modelo.
+def _textos(modelo, valores):
+    cache = _caches.setdefault(modelo, {})
+    textos = list(map(cache.get, valores))
+    if None not in textos:
+        return textos
+    faltam = [valor for valor, texto in zip(valores, textos) if texto is None]
+    novos = dict(zip(faltam, _em_lote(modelo, faltam)))
+    if len(cache) + len(novos) > TAMANHO_CACHE:
+        cache.clear()
+    cache.update(novos)
+    return [novos[valor] if texto is None else texto for valor, texto in zip(valores, textos)]
+
+
+# --- UM VALOR OU UMA COLEÇÃO ---
+# 'formatar' recebe um array de floats distintos e devolve a lista de textos na mesma ordem.
+def _aplicar(valores, formatar):
+    if np.ndim(valores) == 0:
+        return "" if pd.isna(valores) else formatar(np.array([float(valores)]))[0]
+    codigos, unicos = pd.factorize(np.asarray(valores, dtype=float), use_na_sentinel=True)
+    # O código -1 (ausente) aponta para o "" acrescentado no fim
+    textos = np.array(formatar(unicos) + [""], dtype=object)
+    resultado = textos[codigos]
+    if isinstance(valores, pd.Series):
+        return pd.Series(resultado, index=valores.index, name=valores.name)
+    return resultado.tolist()
+
+
+def numero(valores, casas=2):
+    modelo = f"{{:,.{casas}f}}"
+    return _aplicar(valores, lambda unicos: _textos(modelo, unicos.tolist()))
+
+
+def moeda(valores, casas=2):
+    modelo = f"R$ {{:,.{casas}f}}"
+    return _aplicar(valores, lambda unicos: _textos(modelo, unicos.tolist()))
+
+
+def percentual(valores, casas=2):
+    modelo = f"{{:,.{casas}f}}%"
+    return _aplicar(valores, lambda unicos: _textos(modelo, unicos.tolist()))
+
+
+# 1,235 B / 12,500 M / 3,400 K; abaixo de mil, o número com duas casas.
+def _abreviados(unicos):
+    textos = np.empty(len(unicos), dtype=object)
+    restantes = np.ones(len(unicos), dtype=bool)
+    absolutos = np.abs(unicos)
+    for limite, divisor, sufixo in _ESCALAS:
+        na_escala = restantes & (absolutos >= limite)
+        textos[na_escala] = _textos(f"{{:.3f}} {sufixo}", (unicos[na_escala] / divisor).tolist())
+        restantes &= ~na_escala
+    textos[restantes] = _textos("{:,.2f}", unicos[restantes].tolist())
+    return textos.tolist()
+
+
+def abreviado(valores):
+    return _aplicar(valores, _abreviados)
+
+
+def limpar_cache():
+    _caches.clear()
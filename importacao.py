@@ -0,0 +1,334 @@
+# importacao.py - Importa planilhas de posições do custodiante para investimentos e imoveis_emprestimos
+#
+# Uso:
+#   python importacao.py posicoes_2025.xlsx                                   # investimentos, primeira aba
+#   python importacao.py imoveis.xls --tabela imoveis_emprestimos --aba "Imóveis"
+#   python importacao.py posicoes.xlsx --banco outro.db --sem-resumos        # resumos depois, via precalculo.py
+#
+# A planilha é lida em modo streaming (openpyxl read_only para .xlsx/.xlsm, xlrd para .xls): as linhas
+# passam uma a uma, sem montar a planilha inteira na memória. O cabeçalho é procurado nas primeiras
+# linhas (o custodiante costuma pôr títulos acima dele) e reconhecido pelos nomes das colunas do banco
+# ou pelos apelidos em APELIDOS_COLUNAS; colunas desconhecidas são ignoradas.
+# A gravação é um upsert em lotes (executemany) pela chave de cada tabela, tudo numa única transação:
+# ou o arquivo entra inteiro, ou nada muda. Linhas iguais às já gravadas não são reescritas, então
+# reimportar o mesmo arquivo não conta como alteração para a carga incremental do dashboard. Os gatilhos
+# de versionamento e de resumos pendentes registram o que mudou; ao fim, os resumos das datas afetadas
+# são recalculados e o dashboard encontra tudo pronto na próxima leitura das versões. Se algo mudou, o
+# aquecimento do dashboard é avisado (aquecimento.avisar) e refaz os caches logo em seguida.
+import argparse
+import datetime
+import functools
+import json
+import operator
+import pathlib
+import sys
+import time
+import unicodedata
+
+import aquecimento
+import banco_dados
+import resumos
+
+TAMANHO_LOTE = 5000
+LINHAS_BUSCA_CABECALHO = 20
+VALORES_EM_CACHE = 65_536  # conversões guardadas por coluna de texto/data numa importação
+
+# --- TABELAS IMPORTÁVEIS ---
+# Chave do upsert e colunas aceitas. As colunas da chave e as obrigatórias precisam estar no cabeçalho;
+# linhas com alguma delas vazia são ignoradas (e contadas). Com 'copia_cadastro' (a coluna do ISIN), as
+# posições já entram com gestor, administrador e CNPJ do cadastro (banco_dados.COLUNAS_CADASTRO), e o
+# gatilho que faria essa cópia linha a linha não precisa agir.
+IMPORTACOES = {
+    'investimentos': {
+        'chave': ('data_posicao', 'nome_plano', 'codigo_isin_fundo'),
+        'obrigatorias': ('nome_fundo', 'valor_total'),
+        'colunas': ('data_posicao', 'nome_plano', 'codigo_isin_fundo', 'nome_fundo', 'segmento', 'valor_cota',
+                    'quantidade_cotas', 'valor_total'),
+        'copia_cadastro': 'codigo_isin_fundo',
+    },
+    'imoveis_emprestimos': {
+        'chave': ('data_posicao', 'nome_plano', 'segmento'),
+        'obrigatorias': ('valor_total',),
+        'colunas': ('data_posicao', 'nome_plano', 'segmento', 'valor_total'),
+    },
+}
+
+# investimentos não tem restrição de unicidade na chave da posição (o id é autoincremento); o upsert
+# precisa de um índice único. imoveis_emprestimos já tem a chave como PRIMARY KEY.
+INDICES_CHAVE = {
+    'investimentos': "CREATE UNIQUE INDEX IF NOT EXISTS idx_investimentos_chave "
+                     "ON investimentos (data_posicao, nome_plano, codigo_isin_fundo)",
+}
+
+COLUNAS_NUMERICAS = ('valor_cota', 'quantidade_cotas', 'valor_total')
+
+# Nomes de cabeçalho (já normalizados, ver normalizar_nome) usados pelos custodiantes para as colunas do banco.
+APELIDOS_COLUNAS = {
+    'data': 'data_posicao', 'data_da_posicao': 'data_posicao', 'data_base': 'data_posicao',
+    'plano': 'nome_plano',
+    'isin': 'codigo_isin_fundo', 'codigo_isin': 'codigo_isin_fundo', 'cod_isin': 'codigo_isin_fundo',
+    'fundo': 'nome_fundo', 'nome_do_fundo': 'nome_fundo', 'ativo': 'nome_fundo',
+    'classe': 'segmento',
+    'cota': 'valor_cota', 'valor_da_cota': 'valor_cota',
+    'quantidade': 'quantidade_cotas', 'qtde_cotas': 'quantidade_cotas', 'quantidade_de_cotas': 'quantidade_cotas',
+    'valor': 'valor_total', 'saldo': 'valor_total', 'saldo_bruto': 'valor_total', 'valor_bruto': 'valor_total',
+}
+
+
+# --- LEITURA DA PLANILHA (STREAMING) ---
+def _linhas_xlsx(caminho, aba):
+    import openpyxl
+
+    livro = openpyxl.load_workbook(caminho, read_only=True, data_only=True)
+    try:
+        planilha = livro[aba] if aba else livro.worksheets[0]
+        yield from planilha.iter_rows(values_only=True)
+    finally:
+        livro.close()
+
+
+def _linhas_xls(caminho, aba):
+    import xlrd
+
+    livro = xlrd.open_workbook(caminho, on_demand=True)
+    try:
+        planilha = livro.sheet_by_name(aba) if aba else livro.sheet_by_index(0)
+        for indice in range(planilha.nrows):
+            tipos = planilha.row_types(indice)
+            yield tuple(xlrd.xldate_as_datetime(valor, livro.datemode) if tipo == xlrd.XL_CELL_DATE else valor
+                        for valor, tipo in zip(planilha.row_values(indice), tipos))
+    finally:
+        livro.release_resources()
+
+
+def ler_planilha(caminho, aba=None):
+    if pathlib.Path(caminho).suffix.lower() == '.xls':
+        return _linhas_xls(caminho, aba)
+    return _linhas_xlsx(caminho, aba)
+
+
+# --- CABEÇALHO ---
+# "Código ISIN" -> "codigo_isin"; "Data da Posição" -> "data_da_posicao".
+def normalizar_nome(nome):
+    texto = unicodedata.normalize('NFKD', str(nome)).encode('ascii', 'ignore').decode('ascii').lower()
+    return "_".join("".join(c if c.isalnum() else " " for c in texto).split())
+
+
+# Posição de cada coluna da tabela na linha de cabeçalho, ou None se a linha não tem a chave completa.
+def _mapear_cabecalho(linha, tabela):
+    config = IMPORTACOES[tabela]
+    posicoes = {}
+    for posicao, nome in enumerate(linha):
+        if nome is None:
+            continue
+        normalizado = normalizar_nome(nome)
+        coluna = normalizado if normalizado in config['colunas'] else APELIDOS_COLUNAS.get(normalizado)
+        if coluna in config['colunas'] and coluna not in posicoes:
+            posicoes[coluna] = posicao
+    if not all(coluna in posicoes for coluna in config['chave']):
+        return None
+    return posicoes
+
+
+# --- CONVERSÃO DOS VALORES ---
+# Texto sem nenhum dígito na coluna de data é rótulo de rodapé ("Total", "Subtotal"): a linha fica sem
+# data e é ignorada. Um texto com dígitos que não é uma data válida interrompe a importação.
+def converter_data(valor):
+    if isinstance(valor, datetime.datetime):
+        return valor.date().isoformat()
+    if isinstance(valor, datetime.date):
+        return valor.isoformat()
+    texto = converter_texto(valor)
+    if texto is None or not any(caractere.isdigit() for caractere in texto):
+        return None
+    for formato in ('%Y-%m-%d', '%d/%m/%Y', '%Y-%m-%d %H:%M:%S'):
+        try:
+            return datetime.datetime.strptime(texto, formato).date().isoformat()
+        except ValueError:
+            continue
+    raise ValueError(f"Data inválida: {valor!r}")
+
+
+# Aceita números e textos em pt-BR ("R$ 1.234,56").
+def converter_numero(valor):
+    if valor is None or isinstance(valor, (int, float)):
+        return None if valor is None else float(valor)
+    texto = converter_texto(valor)
+    if texto is None:
+        return None
+    texto = texto.replace('R$', '').replace(' ', '')
+    if ',' in texto:
+        texto = texto.replace('.', '').replace(',', '.')
+    return float(texto)
+
+
+def converter_texto(valor):
+    if valor is None:
+        return None
+    texto = str(valor).strip()
+    return texto or None
+
+
+def converter_isin(valor):
+    texto = converter_texto(valor)
+    return texto.upper() if texto is not None else None
+
+
+# Datas, planos, ISINs, fundos e segmentos se repetem a cada linha; a conversão de cada valor distinto
+# fica em cache durante a importação. Os números quase nunca se repetem e são convertidos direto.
+def _conversor(coluna):
+    if coluna in COLUNAS_NUMERICAS:
+        return converter_numero
+    converter = {'data_posicao': converter_data, 'codigo_isin_fundo': converter_isin}.get(coluna, converter_texto)
+    return functools.lru_cache(maxsize=VALORES_EM_CACHE)(converter)
+
+
+# Converte um lote coluna a coluna (um map por coluna) e devolve as linhas convertidas. Se algum valor
+# for inválido, refaz o lote linha a linha só para apontar a linha da planilha com o erro.
+def _converter_lote(brutas, conversores, primeira_linha):
+    try:
+        colunas = [list(map(converter, valores)) for converter, valores in zip(conversores, zip(*brutas))]
+    except ValueError:
+        for deslocamento, linha in enumerate(brutas):
+            try:
+                [converter(valor) for converter, valor in zip(conversores, linha)]
+            except ValueError as erro:
+                raise ValueError(f"Linha {primeira_linha + deslocamento}: {erro}") from erro
+        raise
+    return list(zip(*colunas))
+
+
+# --- CHAVES DO UPSERT (ver banco_dados.sql_upsert) ---
+def garantir_chaves(conn):
+    for tabela, ddl in INDICES_CHAVE.items():
+        chave = ", ".join(IMPORTACOES[tabela]['chave'])
+        repetidas = conn.execute(f"SELECT COUNT(*) FROM (SELECT 1 FROM {tabela} GROUP BY {chave} "
+                                 "HAVING COUNT(*) > 1)").fetchone()[0]
+        if repetidas:
+            raise ValueError(f"{tabela} tem {repetidas} posições repetidas em ({chave}); "
+                             "remova as duplicatas antes de importar")
+        conn.execute(ddl)
+    conn.commit()
+
+
+# Lê a planilha e grava as posições numa única transação. Devolve um resumo da execução.
+def importar(caminho_planilha, tabela='investimentos', aba=None, caminho_banco=banco_dados.NOME_BANCO_DADOS,
+             atualizar_resumos=True):
+    if tabela not in IMPORTACOES:
+        raise ValueError(f"Tabela não importável: {tabela} (use {', '.join(IMPORTACOES)})")
+    config = IMPORTACOES[tabela]
+    inicio = time.perf_counter()
+
+    conn = banco_dados.conectar(caminho_banco)
+    linhas = ler_planilha(caminho_planilha, aba)
+    try:
+        banco_dados.garantir_versionamento(conn)
+        resumos.garantir_resumos(conn)
+        garantir_chaves(conn)
+        versoes_antes = banco_dados.ler_versoes(conn)[tabela]
+
+        posicoes, numero_linha = None, 0
+        for numero_linha, linha in enumerate(linhas, start=1):
+            posicoes = _mapear_cabecalho(linha, tabela)
+            if posicoes is not None or numero_linha >= LINHAS_BUSCA_CABECALHO:
+                break
+        if posicoes is None:
+            raise ValueError(f"Cabeçalho com as colunas {', '.join(config['chave'])} não encontrado nas "
+                             f"primeiras {LINHAS_BUSCA_CABECALHO} linhas")
+        faltam = [coluna for coluna in config['obrigatorias'] if coluna not in posicoes]
+        if faltam:
+            raise ValueError(f"Colunas obrigatórias ausentes na planilha: {', '.join(faltam)}")
+
+        colunas = [coluna for coluna in config['colunas'] if coluna in posicoes]
+        indices = [posicoes[coluna] for coluna in colunas]
+        largura = max(indices) + 1
+        separar = operator.itemgetter(*indices)
+        conversores = [_conversor(coluna) for coluna in colunas]
+        exigidas = operator.itemgetter(*(colunas.index(coluna) for coluna in config['chave'] + config['obrigatorias']))
+        vazia = (None,) * len(colunas)
+        copia = config.get('copia_cadastro') in colunas
+        extras = list(banco_dados.COLUNAS_CADASTRO) if copia else []
+        cadastro = banco_dados.ler_cadastro_copiado(conn) if copia else {}
+        sem_cadastro = (None,) * len(extras)
+        indice_isin = colunas.index(config['copia_cadastro']) if copia else None
+        sql = banco_dados.sql_upsert(tabela, colunas + extras, config['chave'], sem_comparar=extras)
+
+        # Linhas sem nenhum valor nas colunas importadas (separadores, rodapés em branco) não contam.
+        def gravar(brutas, primeira_linha):
+            lote = []
+            lidas = ignoradas = 0
+            for valores in _converter_lote(brutas, conversores, primeira_linha):
+                if valores == vazia:
+                    continue
+                lidas += 1
+                if None in exigidas(valores):
+                    ignoradas += 1
+                    continue
+                lote.append(valores + cadastro.get(valores[indice_isin], sem_cadastro) if copia else valores)
+            if lote:
+                conn.executemany(sql, lote)
+            return lidas, ignoradas
+
+        lidas = ignoradas = 0
+        brutas, primeira_linha = [], numero_linha + 1
+        inicio_importacao = time.perf_counter()
+        with conn:
+            for linha in linhas:
+                if len(linha) < largura:
+                    linha = tuple(linha) + (None,) * (largura - len(linha))
+                brutas.append(separar(linha))
+                if len(brutas) >= TAMANHO_LOTE:
+                    lidas_lote, ignoradas_lote = gravar(brutas, primeira_linha)
+                    lidas, ignoradas = lidas + lidas_lote, ignoradas + ignoradas_lote
+                    primeira_linha += len(brutas)
+                    brutas = []
+            if brutas:
+                lidas_lote, ignoradas_lote = gravar(brutas, primeira_linha)
+                lidas, ignoradas = lidas + lidas_lote, ignoradas + ignoradas_lote
+        segundos_importacao = time.perf_counter() - inicio_importacao
+
+        # Os gatilhos contam cada escrita em 'versao' e só as atualizações em 'alteracoes'.
+        versao, alteracoes = banco_dados.ler_versoes(conn)[tabela]
+        atualizadas = alteracoes - versoes_antes[1]
+        inseridas = versao - versoes_antes[0] - atualizadas
+
+        inicio_resumos = time.perf_counter()
+        datas_resumos = resumos.atualizar_resumos(conn) if atualizar_resumos else []
+        segundos_resumos = time.perf_counter() - inicio_resumos
+        if inseridas or atualizadas:
+            aquecimento.avisar(caminho_banco)
+    finally:
+        linhas.close()
+        conn.close()
+
+    return {
+        'tabela': tabela,
+        'colunas': colunas,
+        'linhas_lidas': lidas,
+        'linhas_ignoradas': ignoradas,
+        'inseridas': inseridas,
+        'atualizadas': atualizadas,
+        'inalteradas': lidas - ignoradas - inseridas - atualizadas,
+        'datas_resumos': len(datas_resumos),
+        'segundos_importacao': segundos_importacao,
+        'segundos_resumos': segundos_resumos,
+        'segundos_total': time.perf_counter() - inicio,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa uma planilha de posições para o banco do dashboard.")
+    parser.add_argument('planilha', help="arquivo .xlsx/.xlsm (openpyxl) ou .xls (xlrd)")
+    parser.add_argument('--tabela', choices=sorted(IMPORTACOES), default='investimentos')
+    parser.add_argument('--aba', default=None, help="nome da aba (padrão: a primeira)")
+    parser.add_argument('--banco', default=banco_dados.NOME_BANCO_DADOS)
+    parser.add_argument('--sem-resumos', action='store_true',
+                        help="não recalcula os resumos (ex.: para rodar precalculo.py em seguida)")
+    args = parser.parse_args(argv)
+    print(json.dumps(importar(args.planilha, args.tabela, args.aba, args.banco, not args.sem_resumos),
+                     indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
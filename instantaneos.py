@@ -0,0 +1,61 @@
+# instantaneos.py - Cópias colunares (Arrow/Feather) das tabelas carregadas, para partidas a frio rápidas
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+
+# --- PASTA DOS INSTANTÂNEOS ---
+# Fica ao lado do banco ('meu_dashboard.db' -> 'meu_dashboard.db.instantaneos/'), um arquivo por tabela.
+def pasta_padrao(caminho_banco):
+    return f"{caminho_banco}.instantaneos"
+
+
+def _caminho(pasta, tabela):
+    return os.path.join(pasta, f"{tabela}.feather")
+
+
+# --- GRAVAÇÃO ---
+# Feather sem compressão, para que a leitura possa mapear o arquivo em memória em vez de
+# descompactá-lo. Os metadados guardam a versão do banco em que a cópia foi tirada e o estado
+# da carga incremental (último rowid, última data), para que a partir dela só se busque o que mudou.
+# O arquivo é escrito ao lado e renomeado no fim: um leitor nunca vê uma cópia pela metade.
+# Retorna False se não foi possível gravar (disco cheio, pasta sem permissão, coluna com tipos
+# misturados); o dashboard segue com os dados em memória.
+def salvar(pasta, tabela, df, metadados):
+    caminho = _caminho(pasta, tabela)
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(pasta, exist_ok=True)
+        tabela_arrow = pa.Table.from_pandas(df, preserve_index=False)
+        tabela_arrow = tabela_arrow.replace_schema_metadata({
+            **(tabela_arrow.schema.metadata or {}),
+            b'instantaneo': json.dumps(metadados, default=str).encode('utf-8'),
+        })
+        feather.write_feather(tabela_arrow, temporario, compression='uncompressed')
+        os.replace(temporario, caminho)
+        return True
+    except (OSError, pa.ArrowException):
+        return False
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+
+# --- LEITURA ---
+# Retorna (df, metadados), ou None se não houver cópia ou se ela estiver ilegível.
+def ler(pasta, tabela):
+    caminho = _caminho(pasta, tabela)
+    if not os.path.exists(caminho):
+        return None
+    try:
+        tabela_arrow = feather.read_table(caminho, memory_map=True)
+        metadados = json.loads((tabela_arrow.schema.metadata or {})[b'instantaneo'])
+        df = tabela_arrow.to_pandas()
+    except (OSError, KeyError, ValueError, pa.ArrowException):
+        return None
+    if metadados.get('ultima_data') is not None:
+        metadados['ultima_data'] = pd.Timestamp(metadados['ultima_data'])
+    return df, metadados
@@ -0,0 +1,227 @@
+# metricas.py - Tempo, memória, bytes enviados ao navegador e acertos de cache de cada rerun do dashboard
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows: sem pico de RSS por seção
+    resource = None
+
+# Cada sessão do Streamlit roda o script na sua própria thread; o rerun em andamento fica nela.
+_local = threading.local()
+
+
+def _pico_rss():
+    if resource is None:
+        return 0
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico if sys.platform == 'darwin' else pico * 1024  # Linux informa em KB
+
+
+# --- UM RERUN ---
+# 'tipo' é 'pagina' (script inteiro) ou 'fragmento' (só uma seção @st.fragment refeita).
+class Rerun:
+    def __init__(self, pagina, tipo):
+        self.pagina = pagina
+        self.tipo = tipo
+        self.momento = datetime.now().isoformat(timespec='milliseconds')
+        self.inicio = time.perf_counter()
+        self.segundos = None
+        self.completo = False
+        self.secoes = {}
+        self.envios = []
+        self.caches = {}
+        self._figuras = {}
+
+    def registro(self):
+        return {
+            'momento': self.momento, 'pagina': self.pagina, 'tipo': self.tipo, 'segundos': self.segundos,
+            'completo': self.completo, 'secoes': self.secoes, 'envios': self.envios, 'caches': self.caches,
+            'pico_rss_bytes': _pico_rss(),
+        }
+
+    # Figuras construídas ou lidas do cache neste rerun, à espera do envio que as mostra.
+    def registrar_figura(self, figura, nome, tamanho_bytes, segundos_construcao):
+        self._figuras[id(figura)] = (nome, tamanho_bytes, segundos_construcao)
+
+    def retirar_figura(self, figura):
+        return self._figuras.pop(id(figura), (None, None, 0.0))
+
+
+def rerun_atual():
+    return getattr(_local, 'rerun', None)
+
+
+def _secao_atual():
+    return getattr(_local, 'secao', None)
+
+
+def iniciar_rerun(pagina, tipo='pagina'):
+    _local.rerun = Rerun(pagina, tipo)
+    _local.secao = None
+    return _local.rerun
+
+
+# Encerra o rerun da thread e o grava no registro padrão (ver definir_registro).
+def finalizar_rerun(completo=True):
+    rerun = rerun_atual()
+    if rerun is None:
+        return None
+    rerun.segundos = time.perf_counter() - rerun.inicio
+    rerun.completo = completo
+    _local.rerun = None
+    _local.secao = None
+    if _registro is not None:
+        _registro.gravar(rerun.registro())
+    return rerun
+
+
+# --- SEÇÕES ---
+# Cronômetro nomeado; serve como 'with' ou como decorador. Seções aninhadas viram "externa/interna".
+# A memória é o quanto o pico de RSS do processo subiu durante a seção (0 se o pico não mudou).
+# Fora de um rerun de página (fragmento refeito sozinho), a seção abre e grava o próprio rerun;
+# 'pagina' pode ser uma função, chamada só nesse caso.
+@contextmanager
+def secao(nome, pagina=None):
+    rerun = rerun_atual()
+    proprio = rerun is None
+    if proprio:
+        rerun = iniciar_rerun(pagina() if callable(pagina) else pagina, 'fragmento')
+    anterior = _secao_atual()
+    caminho = f"{anterior}/{nome}" if anterior else nome
+    _local.secao = caminho
+    inicio, pico_inicial = time.perf_counter(), _pico_rss()
+    completo = False
+    try:
+        yield
+        completo = True
+    finally:
+        medida = rerun.secoes.setdefault(caminho, {'segundos': 0.0, 'memoria_bytes': 0, 'chamadas': 0})
+        medida['segundos'] += time.perf_counter() - inicio
+        medida['memoria_bytes'] += _pico_rss() - pico_inicial
+        medida['chamadas'] += 1
+        _local.secao = anterior
+        if proprio:
+            finalizar_rerun(completo)
+
+
+# --- CACHES ---
+# Consultas e falhas por cache; acertos = consultas - falhas. A falha é registrada de dentro da
+# função cacheada, que só executa quando o valor não estava em cache.
+def registrar_consulta_cache(nome):
+    rerun = rerun_atual()
+    if rerun is not None:
+        rerun.caches.setdefault(nome, {'consultas': 0, 'falhas': 0})['consultas'] += 1
+
+
+def registrar_falha_cache(nome):
+    rerun = rerun_atual()
+    if rerun is not None:
+        rerun.caches.setdefault(nome, {'consultas': 0, 'falhas': 0})['falhas'] += 1
+
+
+# --- ENVIOS AO NAVEGADOR ---
+# A figura vem do cache de figuras com o tamanho do seu JSON; o envio (st.plotly_chart) é casado
+# com ela pelo objeto.
+def registrar_figura(figura, nome, acerto, tamanho_bytes, segundos_construcao):
+    rerun = rerun_atual()
+    if rerun is None:
+        return
+    rerun.caches.setdefault('figuras', {'consultas': 0, 'falhas': 0})['consultas'] += 1
+    if not acerto:
+        rerun.caches['figuras']['falhas'] += 1
+    rerun.registrar_figura(figura, nome, tamanho_bytes, segundos_construcao)
+
+
+def registrar_envio(tipo, segundos, tamanho_bytes=None, figura=None):
+    rerun = rerun_atual()
+    if rerun is None:
+        return
+    envio = {'secao': _secao_atual(), 'tipo': tipo, 'bytes': tamanho_bytes, 'segundos': segundos}
+    if figura is not None:
+        nome, envio['bytes'], envio['segundos_construcao'] = rerun.retirar_figura(figura)
+        envio['nome'] = nome
+    rerun.envios.append(envio)
+
+
+# --- REGISTRO EM JSONL ---
+# Uma linha por rerun, acrescentada ao fim do arquivo. Falhas de escrita não interrompem a página.
+class RegistroMetricas:
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._trava = threading.Lock()
+
+    def gravar(self, registro):
+        linha = json.dumps(registro, ensure_ascii=False, default=str) + "\n"
+        with self._trava:
+            try:
+                with open(self.caminho, 'a', encoding='utf-8') as arquivo:
+                    arquivo.write(linha)
+                return True
+            except OSError:
+                return False
+
+    def ler(self, ultimas=None):
+        if not os.path.exists(self.caminho):
+            return []
+        with self._trava, open(self.caminho, encoding='utf-8') as arquivo:
+            linhas = deque(arquivo, maxlen=ultimas)
+        registros = []
+        for linha in linhas:
+            try:
+                registros.append(json.loads(linha))
+            except ValueError:
+                continue
+        return registros
+
+
+_registro = None
+
+
+def definir_registro(registro):
+    global _registro
+    _registro = registro
+
+
+# --- PERCENTIS ---
+# p50/p95 (ms) do rerun inteiro por página e tipo, e de cada seção por página.
+def percentis_reruns(registros):
+    df = pd.DataFrame([{'pagina': r['pagina'], 'tipo': r['tipo'], 'ms': r['segundos'] * 1000}
+                       for r in registros if r.get('segundos') is not None],
+                      columns=['pagina', 'tipo', 'ms'])
+    return _percentis(df, ['pagina', 'tipo'])
+
+
+def percentis_secoes(registros):
+    df = pd.DataFrame([{'pagina': r['pagina'], 'secao': nome, 'ms': medida['segundos'] * 1000}
+                       for r in registros for nome, medida in r.get('secoes', {}).items()],
+                      columns=['pagina', 'secao', 'ms'])
+    return _percentis(df, ['pagina', 'secao'])
+
+
+def _percentis(df, grupos):
+    if df.empty:
+        return pd.DataFrame(columns=grupos + ['reruns', 'p50_ms', 'p95_ms'])
+    agrupado = df.groupby(grupos, dropna=False)['ms']
+    return pd.DataFrame({
+        'reruns': agrupado.size(),
+        'p50_ms': agrupado.quantile(0.50),
+        'p95_ms': agrupado.quantile(0.95),
+    }).reset_index()
+
+
+# python metricas.py <arquivo.jsonl> [últimas N linhas]
+if __name__ == '__main__':
+    registros_lidos = RegistroMetricas(sys.argv[1]).ler(int(sys.argv[2]) if len(sys.argv) > 2 else None)
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        print(percentis_reruns(registros_lidos).round(1).to_string(index=False))
+        print()
+        print(percentis_secoes(registros_lidos).round(1).to_string(index=False))
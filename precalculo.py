@@ -0,0 +1,91 @@
+# precalculo.py - Recalcula os resumos mensais de todos os planos em paralelo, um processo por plano
+#
+# Uso:
+#   python precalculo.py                          # datas pendentes (ex.: depois da importação do mês)
+#   python precalculo.py --todas-as-datas --processos 4
+#   python precalculo.py --banco outro.db --processos 1   # sequencial, para comparar
+#
+# Os planos não compartilham linhas nos resumos: cada (plano, lote de datas) é calculado num processo
+# do ProcessPoolExecutor, com a própria conexão somente leitura. O processo principal grava tudo numa
+# única transação (o SQLite aceita um escritor só) e tira as datas da fila de pendentes; o dashboard
+# encontra os resumos prontos e só precisa lê-los. O tempo total fica perto do plano mais lento.
+# Se uma importação gravar durante o cálculo, as linhas calculadas são descartadas e as datas são
+# refeitas pelo SQLite na gravação (resumos.gravar_resumos); 'refeito_na_gravacao' indica isso.
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import banco_dados
+import resumos
+
+
+def _calcular(caminho_banco, nome_plano, datas):
+    conn = banco_dados.conectar_leitura(caminho_banco)
+    try:
+        return resumos.calcular_resumos_plano(conn, nome_plano, datas)
+    finally:
+        conn.close()
+
+
+def _todas_as_datas(conn):
+    return [linha[0] for linha in conn.execute("""
+        SELECT data_posicao FROM investimentos UNION SELECT data_posicao FROM imoveis_emprestimos
+        UNION SELECT data_posicao FROM resumo_patrimonio_data ORDER BY 1""")]
+
+
+# Devolve um resumo da execução (datas, tarefas, processos e tempos).
+def precalcular(caminho_banco=banco_dados.NOME_BANCO_DADOS, processos=None, todas_as_datas=False):
+    conn = banco_dados.conectar(caminho_banco)
+    try:
+        resumos.garantir_resumos(conn)
+        # Lida antes das datas: qualquer escrita depois dela aparece na conferência da gravação.
+        chave_versao = resumos.chave_versao_resumos(conn)
+        datas = _todas_as_datas(conn) if todas_as_datas else resumos.datas_pendentes(conn)
+        tarefas = [(plano, lote) for lote in resumos.lotes_de_datas(datas)
+                   for plano in resumos.planos_nas_datas(conn, lote)]
+        processos = min(processos or os.cpu_count() or 1, max(len(tarefas), 1))
+
+        inicio = time.perf_counter()
+        planos = [plano for plano, _ in tarefas]
+        lotes = [lote for _, lote in tarefas]
+        if processos == 1:
+            linhas_por_plano = list(map(_calcular, repeat(caminho_banco), planos, lotes))
+        else:
+            with ProcessPoolExecutor(max_workers=processos) as executor:
+                linhas_por_plano = list(executor.map(_calcular, repeat(caminho_banco), planos, lotes))
+        segundos_calculo = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        gravadas = resumos.gravar_resumos(conn, datas, linhas_por_plano, chave_versao)
+        segundos_gravacao = time.perf_counter() - inicio
+    finally:
+        conn.close()
+
+    return {
+        'datas': len(datas),
+        'planos': len(set(planos)),
+        'tarefas': len(tarefas),
+        'processos': processos,
+        'refeito_na_gravacao': not gravadas,
+        'segundos_calculo': segundos_calculo,
+        'segundos_gravacao': segundos_gravacao,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recalcula os resumos mensais de todos os planos em paralelo.")
+    parser.add_argument('--banco', default=banco_dados.NOME_BANCO_DADOS)
+    parser.add_argument('--processos', type=int, default=None, help="processos (padrão: um por núcleo)")
+    parser.add_argument('--todas-as-datas', action='store_true',
+                        help="recalcula todas as datas, não só as pendentes")
+    args = parser.parse_args(argv)
+    print(json.dumps(precalcular(args.banco, args.processos, args.todas_as_datas), indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
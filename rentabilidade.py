@@ -0,0 +1,74 @@
+# rentabilidade.py - Motor de rentabilidade acumulada sobre uma matriz densa data × série
+import numpy as np
+import pandas as pd
+
+
+# --- MATRIZ DE RETORNOS COM SOMAS DE PREFIXO DOS LOGARITMOS ---
+# As séries (fundos, planos, segmentos, índices) viram colunas de uma matriz data × série, montada uma
+# única vez. O prefixo acumulado de log(1 + r) permite obter o retorno composto de qualquer série
+# entre duas datas como exp(P[fim] - P[inicio]) - 1, sem refazer o cumprod a cada troca de período.
+class MatrizRetornos:
+    def __init__(self, datas, series, log_retornos, presentes, validos):
+        self.datas = pd.DatetimeIndex(datas)
+        self.series = pd.Index(series).astype(object)
+        # presentes: a série tem linha na data (mesmo com retorno nulo); validos: a linha tem retorno.
+        self._presentes = presentes
+        self._validos = validos
+        self._prefixo = np.cumsum(log_retornos, axis=0)
+
+    # Formato longo: uma linha por (data, série). Retornos em decimal (0.01 = 1%). Linhas repetidas
+    # da mesma série na mesma data são compostas entre si.
+    @classmethod
+    def de_formato_longo(cls, df, coluna_data, coluna_serie, coluna_retorno):
+        codigos_data, datas = pd.factorize(df[coluna_data], sort=True)
+        codigos_serie, series = pd.factorize(df[coluna_serie], sort=True)
+        retornos = pd.to_numeric(df[coluna_retorno], errors='coerce').to_numpy(dtype=float)
+        tem_retorno = ~np.isnan(retornos)
+
+        formato = (len(datas), len(series))
+        log_retornos = np.zeros(formato)
+        np.add.at(log_retornos, (codigos_data, codigos_serie), np.where(tem_retorno, np.log1p(retornos), 0.0))
+        presentes = np.zeros(formato, dtype=bool)
+        presentes[codigos_data, codigos_serie] = True
+        validos = np.zeros(formato, dtype=bool)
+        validos[codigos_data[tem_retorno], codigos_serie[tem_retorno]] = True
+        return cls(datas, series, log_retornos, presentes, validos)
+
+    # Formato largo: uma linha por data e uma coluna por série (como a tabela indices_taxas).
+    @classmethod
+    def de_formato_largo(cls, df, coluna_data, colunas_series):
+        df = df.sort_values(coluna_data)
+        retornos = df[list(colunas_series)].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+        validos = ~np.isnan(retornos)
+        log_retornos = np.where(validos, np.log1p(np.where(validos, retornos, 0.0)), 0.0)
+        presentes = np.ones(retornos.shape, dtype=bool)
+        return cls(df[coluna_data].to_numpy(), list(colunas_series), log_retornos, presentes, validos)
+
+    def _janela(self, inicio, fim):
+        return self.datas.searchsorted(inicio, side='left'), self.datas.searchsorted(fim, side='right')
+
+    def _colunas(self, series):
+        colunas = self.series.get_indexer(list(series))
+        return colunas[colunas >= 0]
+
+    # Curvas de rentabilidade acumulada dentro da janela, rebaseadas no primeiro mês com retorno de
+    # cada série. Retorna formato longo (data_posicao, Nome, retorno_acumulado), pronto para o px.line.
+    def curvas(self, series, inicio, fim):
+        i0, i1 = self._janela(inicio, fim)
+        colunas = self._colunas(series)
+        if i1 <= i0 or len(colunas) == 0:
+            return pd.DataFrame(columns=['data_posicao', 'Nome', 'retorno_acumulado'])
+
+        prefixo = self._prefixo[i0:i1, colunas]
+        validos = self._validos[i0:i1, colunas]
+        presentes = self._presentes[i0:i1, colunas]
+        linha_base = validos.argmax(axis=0)
+        base = prefixo[linha_base, np.arange(len(colunas))]
+        retorno = np.where(validos, np.exp(prefixo - base) - 1, np.nan)
+
+        linhas, cols = np.nonzero(presentes)
+        return pd.DataFrame({
+            'data_posicao': self.datas[i0:i1][linhas],
+            'Nome': self.series[colunas][cols],
+            'retorno_acumulado': retorno[linhas, cols],
+        })
@@ -0,0 +1,279 @@
+# resumos.py - Tabelas de resumo mensal do patrimônio, mantidas no próprio meu_dashboard.db
+import pandas as pd
+
+import banco_dados
+import esquema
+
+# Limite de parâmetros por "IN (...)" para ficar abaixo do máximo do SQLite.
+TAMANHO_LOTE_DATAS = 500
+
+# --- ESTRUTURA DAS TABELAS DE RESUMO ---
+ESTRUTURA_RESUMOS = {
+    "resumo_patrimonio_data": """
+        CREATE TABLE IF NOT EXISTS resumo_patrimonio_data (
+            data_posicao DATE PRIMARY KEY, valor_investimentos REAL, valor_imoveis REAL, valor_total REAL
+        )""",
+    "resumo_patrimonio_plano": """
+        CREATE TABLE IF NOT EXISTS resumo_patrimonio_plano (
+            data_posicao DATE, nome_plano TEXT, valor_investimentos REAL, valor_imoveis REAL, valor_total REAL,
+            PRIMARY KEY (data_posicao, nome_plano)
+        )""",
+    "resumo_patrimonio_segmento": """
+        CREATE TABLE IF NOT EXISTS resumo_patrimonio_segmento (
+            data_posicao DATE, nome_plano TEXT, origem TEXT, segmento TEXT, valor_total REAL,
+            PRIMARY KEY (data_posicao, nome_plano, origem, segmento)
+        )""",
+    "resumo_patrimonio_fundo": """
+        CREATE TABLE IF NOT EXISTS resumo_patrimonio_fundo (
+            data_posicao DATE, nome_plano TEXT, nome_fundo TEXT, valor_total REAL,
+            PRIMARY KEY (data_posicao, nome_plano, nome_fundo)
+        )""",
+    "resumo_patrimonio_gestor": """
+        CREATE TABLE IF NOT EXISTS resumo_patrimonio_gestor (
+            data_posicao DATE, nome_plano TEXT, gestor TEXT, valor_total REAL,
+            PRIMARY KEY (data_posicao, nome_plano, gestor)
+        )""",
+}
+
+# Datas cujas posições mudaram e cujo resumo ainda precisa ser recalculado.
+ESTRUTURA_PENDENTES = "CREATE TABLE IF NOT EXISTS resumo_pendente (data_posicao DATE PRIMARY KEY)"
+
+# O recálculo filtra por data; sem este índice cada data pendente varre investimentos inteira.
+INDICE_INVESTIMENTOS_DATA = "CREATE INDEX IF NOT EXISTS idx_investimentos_data ON investimentos (data_posicao)"
+
+# --- GATILHOS QUE MARCAM AS DATAS AFETADAS ---
+# Qualquer escrita nas posições (inclusive scripts manuais) enfileira a data_posicao afetada.
+# Mudanças de gestor no cadastro enfileiram todas as datas em que o fundo aparece.
+# As datas já na fila são filtradas com NOT EXISTS/NOT IN em vez de INSERT OR IGNORE: num upsert
+# (INSERT ... ON CONFLICT DO UPDATE, ver importacao.py) o SQLite aplica aos gatilhos a política de
+# conflito do comando externo, e o OR IGNORE deixaria de valer.
+def _enfileirar(data):
+    return (f"INSERT INTO resumo_pendente (data_posicao) SELECT {data} "
+            f"WHERE NOT EXISTS (SELECT 1 FROM resumo_pendente WHERE data_posicao = {data});")
+
+
+def _enfileirar_fundo(*codigos):
+    return ("INSERT INTO resumo_pendente (data_posicao) SELECT DISTINCT data_posicao FROM investimentos "
+            f"WHERE codigo_isin_fundo IN ({', '.join(codigos)}) "
+            "AND data_posicao NOT IN (SELECT data_posicao FROM resumo_pendente);")
+
+
+GATILHOS_PENDENTES = {
+    "trg_investimentos_resumo_ins": f"""
+        CREATE TRIGGER trg_investimentos_resumo_ins AFTER INSERT ON investimentos
+        BEGIN {_enfileirar('NEW.data_posicao')} END""",
+    "trg_investimentos_resumo_upd": f"""
+        CREATE TRIGGER trg_investimentos_resumo_upd AFTER UPDATE ON investimentos
+        BEGIN
+            {_enfileirar('OLD.data_posicao')}
+            {_enfileirar('NEW.data_posicao')}
+        END""",
+    "trg_investimentos_resumo_del": f"""
+        CREATE TRIGGER trg_investimentos_resumo_del AFTER DELETE ON investimentos
+        BEGIN {_enfileirar('OLD.data_posicao')} END""",
+    "trg_imoveis_resumo_ins": f"""
+        CREATE TRIGGER trg_imoveis_resumo_ins AFTER INSERT ON imoveis_emprestimos
+        BEGIN {_enfileirar('NEW.data_posicao')} END""",
+    "trg_imoveis_resumo_upd": f"""
+        CREATE TRIGGER trg_imoveis_resumo_upd AFTER UPDATE ON imoveis_emprestimos
+        BEGIN
+            {_enfileirar('OLD.data_posicao')}
+            {_enfileirar('NEW.data_posicao')}
+        END""",
+    "trg_imoveis_resumo_del": f"""
+        CREATE TRIGGER trg_imoveis_resumo_del AFTER DELETE ON imoveis_emprestimos
+        BEGIN {_enfileirar('OLD.data_posicao')} END""",
+    "trg_cadastro_resumo_ins": f"""
+        CREATE TRIGGER trg_cadastro_resumo_ins AFTER INSERT ON cadastro_fundos
+        BEGIN {_enfileirar_fundo('NEW.codigo_isin')} END""",
+    "trg_cadastro_resumo_upd": f"""
+        CREATE TRIGGER trg_cadastro_resumo_upd AFTER UPDATE OF gestor, codigo_isin ON cadastro_fundos
+        BEGIN {_enfileirar_fundo('OLD.codigo_isin', 'NEW.codigo_isin')} END""",
+    "trg_cadastro_resumo_del": f"""
+        CREATE TRIGGER trg_cadastro_resumo_del AFTER DELETE ON cadastro_fundos
+        BEGIN {_enfileirar_fundo('OLD.codigo_isin')} END""",
+}
+
+# --- CONSULTAS DE RECÁLCULO (uma por tabela, filtradas pelas datas do lote) ---
+# (colunas, SELECT) de cada tabela. O marcador {datas} recebe a lista de "?" do lote e {plano} recebe
+# "" ou um filtro " AND nome_plano = ?" (recálculo de um plano só, ver calcular_resumos_plano).
+# A ordem importa: o resumo por data é derivado do resumo por plano, que precisa estar atualizado antes.
+RECALCULO_RESUMOS = {
+    "resumo_patrimonio_plano": ("data_posicao, nome_plano, valor_investimentos, valor_imoveis, valor_total", """
+        SELECT data_posicao, nome_plano, TOTAL(valor_investimentos), TOTAL(valor_imoveis),
+               TOTAL(valor_investimentos) + TOTAL(valor_imoveis)
+        FROM (SELECT data_posicao, nome_plano, valor_total AS valor_investimentos, 0.0 AS valor_imoveis
+              FROM investimentos WHERE data_posicao IN ({datas}){plano}
+              UNION ALL
+              SELECT data_posicao, nome_plano, 0.0, valor_total
+              FROM imoveis_emprestimos WHERE data_posicao IN ({datas}){plano})
+        GROUP BY data_posicao, nome_plano"""),
+    "resumo_patrimonio_data": ("data_posicao, valor_investimentos, valor_imoveis, valor_total", """
+        SELECT data_posicao, TOTAL(valor_investimentos), TOTAL(valor_imoveis), TOTAL(valor_total)
+        FROM resumo_patrimonio_plano WHERE data_posicao IN ({datas})
+        GROUP BY data_posicao"""),
+    "resumo_patrimonio_segmento": ("data_posicao, nome_plano, origem, segmento, valor_total", """
+        SELECT data_posicao, nome_plano, 'investimentos', segmento, TOTAL(valor_total)
+        FROM investimentos WHERE data_posicao IN ({datas}){plano} AND segmento IS NOT NULL
+        GROUP BY data_posicao, nome_plano, segmento
+        UNION ALL
+        SELECT data_posicao, nome_plano, 'imoveis', segmento, TOTAL(valor_total)
+        FROM imoveis_emprestimos WHERE data_posicao IN ({datas}){plano} AND segmento IS NOT NULL
+        GROUP BY data_posicao, nome_plano, segmento"""),
+    "resumo_patrimonio_fundo": ("data_posicao, nome_plano, nome_fundo, valor_total", """
+        SELECT data_posicao, nome_plano, nome_fundo, TOTAL(valor_total)
+        FROM investimentos WHERE data_posicao IN ({datas}){plano}
+        GROUP BY data_posicao, nome_plano, nome_fundo"""),
+    "resumo_patrimonio_gestor": ("data_posicao, nome_plano, gestor, valor_total", """
+        SELECT data_posicao, nome_plano, COALESCE(gestor, 'Não Cadastrado'), TOTAL(valor_total)
+        FROM investimentos WHERE data_posicao IN ({datas}){plano}
+        GROUP BY data_posicao, nome_plano, COALESCE(gestor, 'Não Cadastrado')"""),
+}
+
+# Tabelas somadas a partir de outro resumo, sem filtro por plano: recalculadas depois das demais.
+RESUMOS_DERIVADOS = ('resumo_patrimonio_data',)
+
+# Ordenação de leitura: mantém a mesma ordem que os groupby do pandas produziam nas páginas.
+ORDEM_LEITURA = {
+    "resumo_patrimonio_data": "data_posicao",
+    "resumo_patrimonio_plano": "data_posicao, nome_plano",
+    "resumo_patrimonio_segmento": "data_posicao, nome_plano, origem DESC, segmento",
+    "resumo_patrimonio_fundo": "data_posicao, nome_plano, nome_fundo",
+    "resumo_patrimonio_gestor": "data_posicao, nome_plano, gestor",
+}
+
+
+def garantir_resumos(conn):
+    # O resumo por gestor usa o gestor copiado para investimentos.
+    banco_dados.garantir_cadastro_investimentos(conn)
+    for ddl in ESTRUTURA_RESUMOS.values():
+        conn.execute(ddl)
+    conn.execute(ESTRUTURA_PENDENTES)
+    conn.execute(INDICE_INVESTIMENTOS_DATA)
+    for nome, ddl in GATILHOS_PENDENTES.items():
+        banco_dados.criar_gatilho(conn, nome, ddl)
+    # Datas com posições mas ainda sem resumo (primeira execução ou cargas anteriores aos gatilhos).
+    conn.execute("""
+        INSERT OR IGNORE INTO resumo_pendente (data_posicao)
+        SELECT data_posicao FROM (SELECT DISTINCT data_posicao FROM investimentos
+                                  UNION SELECT DISTINCT data_posicao FROM imoveis_emprestimos)
+        WHERE data_posicao NOT IN (SELECT data_posicao FROM resumo_patrimonio_data)""")
+    conn.commit()
+
+
+def datas_pendentes(conn):
+    return [linha[0] for linha in conn.execute("SELECT data_posicao FROM resumo_pendente ORDER BY data_posicao")]
+
+
+# Recalcula os resumos apenas das datas informadas (ou das pendentes), numa única transação.
+# Retorna a lista de datas recalculadas.
+def atualizar_resumos(conn, datas=None):
+    if datas is None:
+        datas = datas_pendentes(conn)
+    datas = list(datas)
+    if not datas:
+        return []
+
+    with conn:
+        _recalcular(conn, datas)
+    return datas
+
+
+# Refaz os resumos das datas no próprio SQLite e as tira da fila; roda dentro da transação de quem chama.
+def _recalcular(conn, datas):
+    for lote in lotes_de_datas(datas):
+        marcadores = ", ".join("?" * len(lote))
+        for tabela, (colunas, consulta) in RECALCULO_RESUMOS.items():
+            conn.execute(f"DELETE FROM {tabela} WHERE data_posicao IN ({marcadores})", lote)
+            # Cada "{datas}" da consulta consome o lote inteiro de parâmetros.
+            conn.execute(f"INSERT INTO {tabela} ({colunas}) {consulta.format(datas=marcadores, plano='')}",
+                         lote * consulta.count("{datas}"))
+        conn.execute(f"DELETE FROM resumo_pendente WHERE data_posicao IN ({marcadores})", lote)
+
+
+# --- RECÁLCULO POR PLANO (PARALELIZÁVEL, VER precalculo.py) ---
+# Os planos não compartilham linhas nos resumos, então cada (plano, lote de datas) pode ser calculado
+# por um processo separado, numa conexão somente leitura; a gravação fica num único processo.
+def lotes_de_datas(datas):
+    datas = list(datas)
+    return [datas[inicio:inicio + TAMANHO_LOTE_DATAS] for inicio in range(0, len(datas), TAMANHO_LOTE_DATAS)]
+
+
+def planos_nas_datas(conn, datas):
+    marcadores = ", ".join("?" * len(datas))
+    return [linha[0] for linha in conn.execute(f"""
+        SELECT nome_plano FROM investimentos WHERE data_posicao IN ({marcadores})
+        UNION SELECT nome_plano FROM imoveis_emprestimos WHERE data_posicao IN ({marcadores})
+        ORDER BY 1""", list(datas) * 2)]
+
+
+# Linhas dos resumos não derivados de um plano num lote de datas: {tabela: [tuplas]}.
+def calcular_resumos_plano(conn, nome_plano, datas):
+    marcadores = ", ".join("?" * len(datas))
+    linhas = {}
+    for tabela, (_, consulta) in RECALCULO_RESUMOS.items():
+        if tabela in RESUMOS_DERIVADOS:
+            continue
+        sql = consulta.format(datas=marcadores, plano=" AND nome_plano = ?")
+        linhas[tabela] = conn.execute(sql, (list(datas) + [nome_plano]) * consulta.count("{datas}")).fetchall()
+    return linhas
+
+
+# Versão das tabelas de que os resumos dependem (banco_dados.DEPENDENCIAS_VERSAO['resumos']).
+def chave_versao_resumos(conn):
+    return banco_dados.chave_versao(banco_dados.ler_versoes(conn), 'resumos')
+
+
+# Substitui os resumos das datas pelas linhas calculadas por plano ({tabela: [tuplas]} de cada plano),
+# refaz os derivados e tira as datas da fila de pendentes, numa única transação.
+# As linhas foram calculadas em outras conexões, sobre o banco na versão 'chave_versao'
+# (chave_versao_resumos, lida antes do cálculo). Uma escrita nesse meio tempo numa data que já estava
+# pendente não volta a marcá-la, e gravar as linhas velhas a tiraria da fila para sempre. Por isso a
+# gravação trava o banco para escrita (BEGIN IMMEDIATE) e confere a versão: se ela mudou, as datas são
+# refeitas ali mesmo pelo SQLite, já sem ninguém escrevendo. Devolve False nesse caso.
+def gravar_resumos(conn, datas, linhas_por_plano, chave_versao=None):
+    datas = list(datas)
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        if chave_versao is not None and chave_versao_resumos(conn) != chave_versao:
+            _recalcular(conn, datas)
+            return False
+        for lote in lotes_de_datas(datas):
+            marcadores = ", ".join("?" * len(lote))
+            for tabela in RECALCULO_RESUMOS:
+                conn.execute(f"DELETE FROM {tabela} WHERE data_posicao IN ({marcadores})", lote)
+        for tabela, (colunas, _) in RECALCULO_RESUMOS.items():
+            if tabela in RESUMOS_DERIVADOS:
+                continue
+            insercao = f"INSERT INTO {tabela} ({colunas}) VALUES ({', '.join('?' * len(colunas.split(',')))})"
+            for linhas in linhas_por_plano:
+                conn.executemany(insercao, linhas[tabela])
+        for lote in lotes_de_datas(datas):
+            marcadores = ", ".join("?" * len(lote))
+            for tabela in RESUMOS_DERIVADOS:
+                colunas, consulta = RECALCULO_RESUMOS[tabela]
+                conn.execute(f"INSERT INTO {tabela} ({colunas}) {consulta.format(datas=marcadores, plano='')}",
+                             lote * consulta.count("{datas}"))
+            conn.execute(f"DELETE FROM resumo_pendente WHERE data_posicao IN ({marcadores})", lote)
+    return True
+
+
+def ler_resumo(conn, tabela, nome_plano=None):
+    consulta = f"SELECT * FROM {tabela}"
+    parametros = ()
+    if nome_plano is not None:
+        consulta += " WHERE nome_plano = ?"
+        parametros = (nome_plano,)
+    return preparar_resumo(tabela, pd.read_sql_query(f"{consulta} ORDER BY {ORDEM_LEITURA[tabela]}", conn,
+                                                     params=parametros))
+
+
+# Tipos do resumo lido (datas, categóricas, chave_mes); vale para resumos calculados fora do SQLite
+# (ver agregacoes.py), para que cheguem às páginas iguais aos lidos das tabelas.
+def preparar_resumo(tabela, df):
+    df['data_posicao'] = pd.to_datetime(df['data_posicao'])
+    return esquema.aplicar(tabela, df, com_mes=False)
+
+
+def ler_resumos(conn):
+    return tuple(ler_resumo(conn, tabela) for tabela in ORDEM_LEITURA)
@@ -0,0 +1,66 @@
+# servidor.py - Sobe o dashboard no Streamlit e já aquece os caches, sem esperar a primeira visita
+#
+# Uso (no lugar de 'streamlit run dashboard.py'; as opções do streamlit vêm depois):
+#   python servidor.py
+#   python servidor.py --server.port 8502 --server.headless true
+#
+# Com 'streamlit run', o dashboard.py só executa quando a primeira sessão abre, e é essa sessão que paga
+# a carga das tabelas e o cálculo das páginas. Aqui o Streamlit roda neste mesmo processo, e uma thread
+# executa o script uma vez, sem sessão, assim que o runtime do Streamlit existe: o script inicia o
+# aquecimento (aquecimento.py), que percorre as páginas. Os caches do processo (st.cache_resource, carga
+# incremental, figuras) são chaveados pelo módulo, nome e código das funções do script, iguais aos de
+# uma sessão; a primeira visita já os encontra prontos e, se chegar no meio do aquecimento, espera só
+# pelo que ainda estiver sendo calculado. DASHBOARD_AQUECIMENTO=0 sobe sem aquecer.
+import logging
+import os
+import sys
+import threading
+import time
+import types
+
+from streamlit.runtime import Runtime
+from streamlit.web import cli
+
+import aquecimento
+
+_LOGGER = logging.getLogger(__name__)
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dashboard.py')
+ESPERA_RUNTIME = 60.0
+
+
+# Como o ScriptRunner do Streamlit: um módulo '__main__' novo, com o código compilado do arquivo.
+def executar_sem_sessao(caminho=SCRIPT):
+    modulo = types.ModuleType('__main__')
+    modulo.__file__ = caminho
+    with open(caminho, encoding='utf-8') as arquivo:
+        codigo = compile(arquivo.read(), caminho, 'exec')
+    exec(codigo, modulo.__dict__)
+
+
+# Os caches de st.cache_data escolhem o armazenamento pelo runtime: o script só roda depois que ele existe.
+def _aquecer_ao_subir():
+    limite = time.monotonic() + ESPERA_RUNTIME
+    while not Runtime.exists():
+        if time.monotonic() > limite:
+            _LOGGER.warning("Aquecimento na subida cancelado: o Streamlit não subiu em %.0f s", ESPERA_RUNTIME)
+            return
+        time.sleep(0.1)
+    try:
+        executar_sem_sessao()
+    except Exception:
+        _LOGGER.exception("Aquecimento na subida falhou")
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if os.environ.get('DASHBOARD_AQUECIMENTO', '1') != '0':
+        aquecimento.silenciar_avisos_de_contexto()
+        # Com o nome da thread de aquecimento, o script segue os caminhos de quem roda sem sessão.
+        threading.Thread(target=_aquecer_ao_subir, name=aquecimento.NOME_THREAD, daemon=True).start()
+    sys.argv = ['streamlit', 'run', SCRIPT, *argv]
+    return cli.main()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,243 @@
+# sincronizacao.py - Sincroniza cadastro_fundos e indices_taxas com as planilhas do Google, gravando só o que mudou
+#
+# Uso:
+#   python sincronizacao.py --planilha <chave da planilha> --credenciais conta_de_servico.json
+#   python sincronizacao.py --planilha <chave> --aba indices_taxas="Índices" --remover
+#   python sincronizacao.py --local planilhas.json                 # cópia local, sem rede (testes)
+#
+# As abas de todas as tabelas saem numa única chamada à API (values_batch_get), com os valores sem
+# formatação. Cada linha vira uma tupla convertida (datas ISO, números, textos) e um hash; os hashes
+# da última sincronização ficam em sincronizacao_linhas, por tabela e chave. Só as linhas novas ou com
+# hash diferente vão ao banco, por upsert (banco_dados.sql_upsert), que ainda descarta as que já estão
+# iguais no banco: se alguém editou o banco por fora, nada é regravado à toa. Tudo numa única
+# transação. Com --remover, as chaves que estavam na planilha na última sincronização e sumiram dela
+# são apagadas da tabela.
+# Se algo foi gravado, o aquecimento do dashboard é avisado (aquecimento.avisar).
+# O arquivo de --local é um JSON {aba: [[cabeçalho...], [linha...], ...]}, no mesmo formato da API.
+import argparse
+import datetime
+import hashlib
+import json
+import sys
+import time
+
+import aquecimento
+import banco_dados
+import importacao
+import resumos
+
+# --- TABELAS SINCRONIZADAS ---
+# A aba padrão tem o nome da tabela. As colunas são as do cabeçalho da aba que existem na tabela; a
+# 'data_importacao' do cadastro é preenchida aqui, com a data da sincronização.
+SINCRONIZACOES = {
+    'cadastro_fundos': {'chave': 'codigo_isin', 'data_importacao': 'data_importacao'},
+    'indices_taxas': {'chave': 'data_posicao'},
+}
+
+ESTRUTURA_HASHES = """
+    CREATE TABLE IF NOT EXISTS sincronizacao_linhas (
+        tabela TEXT, chave TEXT, hash TEXT NOT NULL, PRIMARY KEY (tabela, chave)
+    )"""
+
+
+# --- ORIGENS DAS PLANILHAS ---
+# ler_abas(abas) devolve {aba: linhas}; cada linha é uma lista de valores e a primeira é o cabeçalho.
+class PlanilhasGoogle:
+    def __init__(self, chave_planilha, credenciais=None):
+        import gspread
+
+        cliente = gspread.service_account(filename=credenciais) if credenciais else gspread.service_account()
+        self.planilha = cliente.open_by_key(chave_planilha)
+        self.chamadas = 0
+
+    def ler_abas(self, abas):
+        intervalos = ["'{}'".format(aba.replace("'", "''")) for aba in abas]
+        resposta = self.planilha.values_batch_get(intervalos, params={
+            'valueRenderOption': 'UNFORMATTED_VALUE', 'dateTimeRenderOption': 'FORMATTED_STRING'})
+        self.chamadas += 1
+        return {aba: intervalo.get('values', []) for aba, intervalo in zip(abas, resposta['valueRanges'])}
+
+
+class PlanilhasLocais:
+    def __init__(self, abas):
+        self.abas = abas
+        self.chamadas = 0
+
+    @classmethod
+    def de_arquivo(cls, caminho):
+        with open(caminho, encoding='utf-8') as arquivo:
+            return cls(json.load(arquivo))
+
+    def ler_abas(self, abas):
+        self.chamadas += 1
+        return {aba: [list(linha) for linha in self.abas.get(aba, [])] for aba in abas}
+
+
+# --- CONVERSÃO E HASH DAS LINHAS ---
+def _conversor(coluna, tipo):
+    if coluna == 'data_posicao' or tipo.upper() == 'DATE':
+        return importacao.converter_data
+    if tipo.upper() == 'REAL':
+        return importacao.converter_numero
+    if coluna == 'codigo_isin':
+        return importacao.converter_isin
+    return importacao.converter_texto
+
+
+# As colunas entram no hash: uma coluna nova na aba muda o hash de todas as linhas.
+def hash_linha(colunas, valores):
+    return hashlib.blake2b(json.dumps([colunas, valores], ensure_ascii=False).encode('utf-8'),
+                           digest_size=16).hexdigest()
+
+
+# --- UMA TABELA ---
+# Grava as linhas alteradas da aba e devolve as contagens. Roda dentro da transação de sincronizar().
+def _sincronizar_tabela(conn, tabela, aba, linhas, remover, hoje):
+    config = SINCRONIZACOES[tabela]
+    tipos = {linha[1]: linha[2] for linha in conn.execute(f"PRAGMA table_info({tabela})")}
+    if not linhas:
+        raise ValueError(f"A aba '{aba}' ({tabela}) está vazia ou não existe")
+
+    posicoes = {}
+    for posicao, nome in enumerate(linhas[0]):
+        coluna = importacao.normalizar_nome(nome) if nome is not None else None
+        if coluna in tipos and coluna != config.get('data_importacao') and coluna not in posicoes:
+            posicoes[coluna] = posicao
+    if config['chave'] not in posicoes:
+        raise ValueError(f"A aba '{aba}' não tem a coluna {config['chave']}")
+    colunas = list(posicoes)
+    conversores = [_conversor(coluna, tipos[coluna]) for coluna in colunas]
+    indice_chave = colunas.index(config['chave'])
+
+    hashes = dict(conn.execute("SELECT chave, hash FROM sincronizacao_linhas WHERE tabela = ?", (tabela,)))
+    lidas = ignoradas = 0
+    vistas = set()
+    alteradas = []
+    for numero_linha, linha in enumerate(linhas[1:], start=2):
+        brutos = [linha[posicao] if posicao < len(linha) else None for posicao in posicoes.values()]
+        if all(valor is None or valor == '' for valor in brutos):
+            continue
+        lidas += 1
+        try:
+            valores = [converter(valor) for converter, valor in zip(conversores, brutos)]
+        except ValueError as erro:
+            raise ValueError(f"Aba '{aba}', linha {numero_linha}: {erro}") from erro
+        chave = valores[indice_chave]
+        if chave is None:
+            ignoradas += 1
+            continue
+        chave = str(chave)
+        vistas.add(chave)
+        resumo = hash_linha(colunas, valores)
+        if hashes.get(chave) != resumo:
+            alteradas.append((chave, resumo, valores))
+
+    extras = [config['data_importacao']] if 'data_importacao' in config else []
+    sql = banco_dados.sql_upsert(tabela, colunas + extras, (config['chave'],), sem_comparar=extras)
+    conn.executemany(sql, [tuple(valores) + (hoje,) * len(extras) for _, _, valores in alteradas])
+    conn.executemany("INSERT INTO sincronizacao_linhas (tabela, chave, hash) VALUES (?, ?, ?) "
+                     "ON CONFLICT (tabela, chave) DO UPDATE SET hash = excluded.hash",
+                     [(tabela, chave, resumo) for chave, resumo, _ in alteradas])
+
+    removidas = 0
+    if remover:
+        sumidas = [(chave,) for chave in hashes if chave not in vistas]
+        removidas = conn.executemany(f"DELETE FROM {tabela} WHERE {config['chave']} = ?", sumidas).rowcount
+        conn.executemany(f"DELETE FROM sincronizacao_linhas WHERE tabela = '{tabela}' AND chave = ?", sumidas)
+
+    return {
+        'aba': aba,
+        'colunas': colunas,
+        'linhas_lidas': lidas,
+        'linhas_ignoradas': ignoradas,
+        'linhas_com_hash_novo': len(alteradas),
+        'removidas': removidas,
+    }
+
+
+# --- SINCRONIZAÇÃO ---
+# 'abas' troca o nome da aba de alguma tabela ({tabela: aba}). Devolve um resumo da execução.
+def sincronizar(origem, caminho_banco=banco_dados.NOME_BANCO_DADOS, abas=None, remover=False,
+                atualizar_resumos=True):
+    abas = {tabela: (abas or {}).get(tabela, tabela) for tabela in SINCRONIZACOES}
+    inicio = time.perf_counter()
+    dados = origem.ler_abas(list(abas.values()))
+    segundos_leitura = time.perf_counter() - inicio
+
+    conn = banco_dados.conectar(caminho_banco)
+    try:
+        banco_dados.garantir_versionamento(conn)
+        resumos.garantir_resumos(conn)
+        conn.execute(ESTRUTURA_HASHES)
+        conn.commit()
+        versoes_antes = banco_dados.ler_versoes(conn)
+
+        inicio_gravacao = time.perf_counter()
+        hoje = datetime.date.today().isoformat()
+        with conn:
+            tabelas = {tabela: _sincronizar_tabela(conn, tabela, aba, dados[aba], remover, hoje)
+                       for tabela, aba in abas.items()}
+        segundos_gravacao = time.perf_counter() - inicio_gravacao
+
+        # Os gatilhos contam cada escrita em 'versao' e só UPDATE/DELETE em 'alteracoes'.
+        versoes = banco_dados.ler_versoes(conn)
+        for tabela, contagens in tabelas.items():
+            escritas = versoes[tabela][0] - versoes_antes[tabela][0]
+            alteracoes = versoes[tabela][1] - versoes_antes[tabela][1]
+            contagens['inseridas'] = escritas - alteracoes
+            contagens['atualizadas'] = alteracoes - contagens['removidas']
+            contagens['linhas_gravadas'] = escritas
+
+        datas_resumos = resumos.atualizar_resumos(conn) if atualizar_resumos else []
+        if any(contagens['linhas_gravadas'] for contagens in tabelas.values()):
+            aquecimento.avisar(caminho_banco)
+    finally:
+        conn.close()
+
+    return {
+        'tabelas': tabelas,
+        'chamadas_api': origem.chamadas,
+        'linhas_lidas': sum(contagens['linhas_lidas'] for contagens in tabelas.values()),
+        'linhas_gravadas': sum(contagens['linhas_gravadas'] for contagens in tabelas.values()),
+        'datas_resumos': len(datas_resumos),
+        'segundos_leitura': segundos_leitura,
+        'segundos_gravacao': segundos_gravacao,
+        'segundos_total': time.perf_counter() - inicio,
+    }
+
+
+def _abas_argumento(valores):
+    abas = {}
+    for valor in valores:
+        tabela, separador, aba = valor.partition('=')
+        if not separador or tabela not in SINCRONIZACOES:
+            raise argparse.ArgumentTypeError(f"--aba espera tabela=aba, com tabela em {', '.join(SINCRONIZACOES)}")
+        abas[tabela] = aba
+    return abas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sincroniza cadastro_fundos e indices_taxas com as planilhas.")
+    origem = parser.add_mutually_exclusive_group(required=True)
+    origem.add_argument('--planilha', help="chave da planilha do Google (na URL, entre /d/ e /edit)")
+    origem.add_argument('--local', help="arquivo JSON {aba: linhas} no lugar da planilha")
+    parser.add_argument('--credenciais', default=None, help="JSON da conta de serviço (padrão do gspread)")
+    parser.add_argument('--aba', action='append', default=[], metavar='TABELA=ABA')
+    parser.add_argument('--banco', default=banco_dados.NOME_BANCO_DADOS)
+    parser.add_argument('--remover', action='store_true', help="apaga as chaves que sumiram da planilha")
+    parser.add_argument('--sem-resumos', action='store_true',
+                        help="não recalcula os resumos (ex.: para rodar precalculo.py em seguida)")
+    args = parser.parse_args(argv)
+    try:
+        abas = _abas_argumento(args.aba)
+    except argparse.ArgumentTypeError as erro:
+        parser.error(str(erro))
+
+    fonte = PlanilhasLocais.de_arquivo(args.local) if args.local else PlanilhasGoogle(args.planilha, args.credenciais)
+    print(json.dumps(sincronizar(fonte, args.banco, abas, args.remover, not args.sem_resumos),
+                     indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,101 @@
+# tabela_html.py - Tabelas HTML com linha de total para qualquer DataFrame agregado (planos, segmentos,
+# fundos, gestores), montadas de uma vez por coluna e guardadas em cache pelo conteúdo
+#
+# 'colunas' é uma lista de (coluna do DataFrame, título, formato); o formato é 'texto' (alinhado à
+# esquerda, com HTML escapado) ou um dos formatadores de formatacao.py ('moeda', 'percentual',
+# 'numero', 'abreviado'), alinhados à direita. 'total' é um dict coluna -> valor da linha de total,
+# formatado como a coluna; colunas ausentes do dict ficam vazias.
+import hashlib
+import html
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import formatacao
+
+MAX_ENTRADAS = 256
+
+_ESTILO_TABELA = "width:100%; border-collapse: collapse;"
+_ESTILO_LINHA = "border-bottom: 1px solid #ddd;"
+_ALINHAMENTO = {'texto': "", 'moeda': "text-align:right; ", 'percentual': "text-align:right; ",
+                'numero': "text-align:right; ", 'abreviado': "text-align:right; "}
+
+_cache = OrderedDict()
+_trava = threading.Lock()
+
+
+# --- CÉLULAS DE UMA COLUNA ---
+# Texto de cada linha da coluna. No 'texto', só os valores distintos passam por html.escape.
+def _textos(valores, formato):
+    if formato == 'texto':
+        codigos, unicos = pd.factorize(valores.astype(str).to_numpy(), use_na_sentinel=True)
+        escapados = np.array([html.escape(valor) for valor in unicos] + [""], dtype=object)
+        return escapados[codigos]
+    return np.array(getattr(formatacao, formato)(valores.to_numpy()), dtype=object)
+
+
+def _texto_total(valor, formato):
+    if valor is None:
+        return ""
+    if formato == 'texto' or isinstance(valor, str):
+        return html.escape(str(valor))
+    return getattr(formatacao, formato)(valor)
+
+
+# --- MONTAGEM ---
+def montar(df, colunas, total=None, cor_destaque="#6aa2ff", altura_maxima=None):
+    cabecalho = "".join(f'<th style="{_ALINHAMENTO[formato] or "text-align:left; "}padding: 8px;">'
+                        f'{html.escape(titulo)}</th>' for _, titulo, formato in colunas)
+    partes = [f'<table style="{_ESTILO_TABELA}">',
+              f'<tr style="border-bottom: 2px solid {cor_destaque}; color: #0d47a1;">{cabecalho}</tr>']
+
+    # Cada linha é a soma, elemento a elemento, das células de todas as colunas
+    linhas = np.full(len(df), f'<tr style="{_ESTILO_LINHA}">', dtype=object)
+    for coluna, _, formato in colunas:
+        linhas = linhas + f'<td style="{_ALINHAMENTO[formato]}padding: 8px;">' + _textos(df[coluna], formato) + "</td>"
+    partes.append("".join((linhas + "</tr>").tolist()))
+
+    if total is not None:
+        celulas = "".join(f'<td style="{_ALINHAMENTO[formato]}padding: 10px; font-weight: bold;">'
+                          f'{_texto_total(total.get(coluna), formato)}</td>' for coluna, _, formato in colunas)
+        partes.append(f'<tr style="background-color: #f0f2f6; border-top: 2px solid {cor_destaque};">{celulas}</tr>')
+    partes.append("</table>")
+
+    tabela = "".join(partes)
+    if altura_maxima:
+        return f'<div style="max-height: {altura_maxima}px; overflow-y: auto;">{tabela}</div>'
+    return tabela
+
+
+# --- CACHE PELO CONTEÚDO ---
+# A chave é o hash das colunas usadas do DataFrame (hash_pandas_object, vetorizado) e dos parâmetros;
+# dados iguais dão a mesma tabela, venham de onde vierem.
+def chave_conteudo(df, colunas, total=None, cor_destaque="#6aa2ff", altura_maxima=None):
+    resumo = hashlib.blake2b(digest_size=16)
+    valores = df[[coluna for coluna, _, _ in colunas]]
+    resumo.update(pd.util.hash_pandas_object(valores, index=False).to_numpy().tobytes())
+    resumo.update(repr((colunas, sorted((total or {}).items()), cor_destaque, altura_maxima)).encode('utf-8'))
+    return resumo.hexdigest()
+
+
+# Devolve (html, acerto).
+def consultar(df, colunas, total=None, cor_destaque="#6aa2ff", altura_maxima=None):
+    chave = chave_conteudo(df, colunas, total, cor_destaque, altura_maxima)
+    with _trava:
+        tabela = _cache.get(chave)
+        if tabela is not None:
+            _cache.move_to_end(chave)
+            return tabela, True
+    tabela = montar(df, colunas, total, cor_destaque, altura_maxima)
+    with _trava:
+        _cache[chave] = tabela
+        while len(_cache) > MAX_ENTRADAS:
+            _cache.popitem(last=False)
+    return tabela, False
+
+
+def limpar_cache():
+    with _trava:
+        _cache.clear()
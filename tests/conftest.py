@@ -0,0 +1,59 @@
+# conftest.py - Bancos de teste: o banco sintético dos benchmarks em tamanho mínimo, preparado como o dashboard
+import os
+import sys
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.join(RAIZ, 'benchmarks'))
+
+import banco_dados  # noqa: E402
+import calendario  # noqa: E402
+import gerar_dados  # noqa: E402
+import resumos  # noqa: E402
+
+
+def preparar_banco(caminho):
+    conn = banco_dados.conectar(caminho)
+    try:
+        banco_dados.garantir_indices(conn)
+        banco_dados.garantir_versionamento(conn)
+        resumos.garantir_resumos(conn)
+        calendario.garantir_calendario(conn)
+        resumos.atualizar_resumos(conn)
+    finally:
+        conn.close()
+
+
+def executar(caminho, sql, parametros=()):
+    conn = banco_dados.conectar(caminho)
+    try:
+        with conn:
+            return conn.execute(sql, parametros).rowcount
+    finally:
+        conn.close()
+
+
+def consultar(caminho, sql, parametros=()):
+    conn = banco_dados.conectar(caminho)
+    try:
+        return conn.execute(sql, parametros).fetchall()
+    finally:
+        conn.close()
+
+
+def ler_versoes(caminho):
+    conn = banco_dados.conectar(caminho)
+    try:
+        return banco_dados.ler_versoes(conn)
+    finally:
+        conn.close()
+
+
+# 3 datas mensais, 4 fundos em metade dos 6 planos: ~36 linhas em investimentos.
+@pytest.fixture
+def banco(tmp_path):
+    caminho = gerar_dados.gerar_banco(str(tmp_path / 'teste.db'), datas=3, fundos=4)
+    preparar_banco(caminho)
+    return caminho
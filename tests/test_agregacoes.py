@@ -0,0 +1,51 @@
+import pytest
+
+import agregacoes
+import resumos
+
+
+@pytest.fixture
+def referencia(banco):
+    return agregacoes.calcular_resumos('sqlite', banco)
+
+
+def test_pandas_igual_ao_sqlite(banco, referencia, tmp_path):
+    pasta = agregacoes.exportar_parquet(banco, str(tmp_path / 'parquet'))
+
+    for fonte in (banco, pasta):
+        assert agregacoes.comparar_resumos(agregacoes.calcular_resumos('pandas', fonte), referencia) == {}
+
+
+def test_duckdb_igual_ao_sqlite(banco, referencia, tmp_path):
+    pytest.importorskip('duckdb')
+    pasta = agregacoes.exportar_parquet(banco, str(tmp_path / 'parquet'))
+
+    assert agregacoes.comparar_resumos(agregacoes.calcular_resumos('duckdb', pasta), referencia) == {}
+
+
+# O ATTACH lê o próprio arquivo SQLite pela extensão sqlite do DuckDB, que pode não estar instalada.
+def test_duckdb_lendo_o_arquivo_sqlite_igual_aos_outros_motores(banco, referencia):
+    duckdb = pytest.importorskip('duckdb')
+    try:
+        duckdb.connect().execute("LOAD sqlite")
+    except duckdb.Error as erro:
+        pytest.skip(f"Extensão sqlite do DuckDB indisponível: {erro}")
+
+    resultado = agregacoes.calcular_resumos('duckdb', banco)
+
+    assert agregacoes.comparar_resumos(resultado, referencia) == {}
+    assert agregacoes.comparar_resumos(resultado, agregacoes.calcular_resumos('pandas', banco)) == {}
+
+
+def test_comparacao_aponta_valor_diferente(referencia):
+    alterado = list(referencia)
+    indice = list(resumos.ORDEM_LEITURA).index('resumo_patrimonio_fundo')
+    df = alterado[indice]
+    alterado[indice] = df.assign(valor_total=df['valor_total'].where(df.index != 0, df['valor_total'] + 0.01))
+
+    assert list(agregacoes.comparar_resumos(alterado, referencia)) == ['resumo_patrimonio_fundo']
+
+
+def test_motor_desconhecido(banco):
+    with pytest.raises(ValueError, match="Motor de resumos desconhecido"):
+        agregacoes.calcular_resumos('spark', banco)
@@ -0,0 +1,28 @@
+import threading
+
+import aquecimento
+
+
+def test_aviso_antecipa_o_aquecimento(tmp_path):
+    caminho_banco = str(tmp_path / 'teste.db')
+    versao = {'atual': 1}
+    aquecidas = []
+    aquecida = threading.Event()
+
+    def aquecer(chave):
+        aquecidas.append(chave)
+        aquecida.set()
+
+    vigia = aquecimento.Aquecimento(aquecer, lambda: versao['atual'], intervalo=600,
+                                    aviso=aquecimento.arquivo_aviso(caminho_banco))
+    vigia.iniciar()
+    try:
+        assert aquecida.wait(5)
+        aquecida.clear()
+        versao['atual'] = 2
+        assert aquecimento.avisar(caminho_banco)
+        assert aquecida.wait(5)
+    finally:
+        vigia.parar(5)
+    assert aquecidas == [1, 2]
+    assert vigia.status()['avisos'] == 1
@@ -0,0 +1,159 @@
+import contextlib
+import shutil
+
+import pandas as pd
+import pytest
+
+import banco_dados
+import carga_incremental
+import gerar_dados
+from conftest import consultar, executar, ler_versoes, preparar_banco
+
+
+@pytest.fixture
+def carga(banco, tmp_path):
+    return carga_incremental.CargaIncremental(banco, str(tmp_path / 'instantaneos'))
+
+
+def obter(carga, tabela):
+    return carga.obter(tabela, ler_versoes(carga.caminho_banco))
+
+
+def conferir_com_banco(carga, tabela, df):
+    with contextlib.closing(banco_dados.conectar_leitura(carga.caminho_banco)) as conn:
+        esperado = banco_dados.ler_tabela(conn, tabela)
+    pd.testing.assert_frame_equal(df.reset_index(drop=True), esperado.reset_index(drop=True))
+
+
+def ultima_data(caminho):
+    return consultar(caminho, "SELECT MAX(data_posicao) FROM investimentos")[0][0]
+
+
+def inserir_investimento(caminho, data_posicao):
+    executar(caminho, """
+        INSERT INTO investimentos (data_posicao, nome_plano, codigo_isin_fundo, nome_fundo, segmento, valor_cota,
+                                   quantidade_cotas, valor_total)
+        VALUES (?, '001 - PLANO A - BD', 'BRSINT000000', 'FUNDO SINTETICO 00001', 'RENDA FIXA', 1.0, 10.0, 10.0)""",
+             (data_posicao,))
+
+
+def test_insercao_no_fim_emenda_so_as_linhas_novas(carga):
+    obter(carga, 'investimentos')
+    inserir_investimento(carga.caminho_banco, '2025-09-30')
+
+    df = obter(carga, 'investimentos')
+
+    assert (carga.recargas_completas, carga.recargas_incrementais) == (1, 1)
+    conferir_com_banco(carga, 'investimentos', df)
+
+
+def test_update_relê_a_tabela(carga):
+    obter(carga, 'investimentos')
+    executar(carga.caminho_banco, "UPDATE investimentos SET valor_total = valor_total + 1 WHERE rowid = 1")
+
+    df = obter(carga, 'investimentos')
+
+    assert (carga.recargas_completas, carga.recargas_incrementais) == (2, 0)
+    conferir_com_banco(carga, 'investimentos', df)
+
+
+def test_delete_relê_a_tabela(carga):
+    obter(carga, 'investimentos')
+    executar(carga.caminho_banco, "DELETE FROM investimentos WHERE rowid = 1")
+
+    df = obter(carga, 'investimentos')
+
+    assert (carga.recargas_completas, carga.recargas_incrementais) == (2, 0)
+    conferir_com_banco(carga, 'investimentos', df)
+
+
+def test_mudanca_no_cadastro_relê_investimentos(carga):
+    obter(carga, 'investimentos')
+    executar(carga.caminho_banco, "UPDATE cadastro_fundos SET gestor = 'GESTORA NOVA' WHERE codigo_isin = 'BRSINT000000'")
+
+    df = obter(carga, 'investimentos')
+
+    assert (carga.recargas_completas, carga.recargas_incrementais) == (2, 0)
+    assert (df.loc[df['codigo_isin_fundo'] == 'BRSINT000000', 'gestor'] == 'GESTORA NOVA').all()
+    conferir_com_banco(carga, 'investimentos', df)
+
+
+def test_coluna_nova_relê_a_tabela(carga):
+    obter(carga, 'indices_taxas')
+    executar(carga.caminho_banco, "ALTER TABLE indices_taxas ADD COLUMN indice_novo REAL")
+
+    df = obter(carga, 'indices_taxas')
+
+    assert (carga.recargas_completas, carga.recargas_incrementais) == (2, 0)
+    assert 'indice_novo' in df.columns
+    conferir_com_banco(carga, 'indices_taxas', df)
+
+
+def test_linha_com_data_anterior_relê_a_tabela(carga):
+    obter(carga, 'investimentos')
+    inserir_investimento(carga.caminho_banco, '2020-01-31')
+
+    df = obter(carga, 'investimentos')
+
+    assert (carga.recargas_completas, carga.recargas_incrementais) == (2, 0)
+    conferir_com_banco(carga, 'investimentos', df)
+
+
+# INSERT OR REPLACE apaga a linha antiga sem disparar o gatilho de DELETE: só 'versao' anda, e a
+# contagem de linhas denuncia a troca.
+def test_contagem_que_nao_fecha_relê_a_tabela(carga):
+    obter(carga, 'indices_taxas')
+    executar(carga.caminho_banco, "INSERT OR REPLACE INTO indices_taxas (data_posicao, cdi) VALUES (?, 0.5)",
+             (ultima_data(carga.caminho_banco),))
+    versoes = ler_versoes(carga.caminho_banco)
+    assert versoes['indices_taxas'][1] == 0
+
+    df = carga.obter('indices_taxas', versoes)
+
+    assert (carga.recargas_completas, carga.recargas_incrementais) == (2, 0)
+    conferir_com_banco(carga, 'indices_taxas', df)
+
+
+# Arquivo trocado por outra cópia com o mesmo histórico de versões: o instantâneo do arquivo antigo não
+# vale para o novo, mesmo com os contadores iguais.
+def test_instantaneo_de_outro_arquivo_nao_e_usado(tmp_path):
+    original = gerar_dados.gerar_banco(str(tmp_path / 'original.db'), datas=3, fundos=4)
+    caminho = str(tmp_path / 'teste.db')
+    pasta = str(tmp_path / 'instantaneos')
+    shutil.copyfile(original, caminho)
+    preparar_banco(caminho)
+    carga_incremental.CargaIncremental(caminho, pasta).obter('indices_taxas', ler_versoes(caminho))
+
+    shutil.copyfile(original, caminho)
+    executar(caminho, "UPDATE indices_taxas SET cdi = 0.5")
+    preparar_banco(caminho)
+    carga = carga_incremental.CargaIncremental(caminho, pasta)
+    df = obter(carga, 'indices_taxas')
+
+    assert (df['cdi'] == 0.5).all()
+    assert (carga.leituras_instantaneo, carga.recargas_completas) == (0, 1)
+
+
+# Mesmo arquivo e mesmas versões, mas a tabela mudou por fora dos gatilhos: o instantâneo não bate com o
+# maior rowid e a contagem de linhas, e a tabela é relida.
+def test_instantaneo_que_nao_bate_com_a_tabela_e_relido(carga, tmp_path):
+    obter(carga, 'indices_taxas')
+    executar(carga.caminho_banco, "DELETE FROM indices_taxas WHERE data_posicao = ?", (ultima_data(carga.caminho_banco),))
+    executar(carga.caminho_banco,
+             "UPDATE versao_tabelas SET versao = versao - 1, alteracoes = alteracoes - 1 WHERE tabela = 'indices_taxas'")
+
+    nova = carga_incremental.CargaIncremental(carga.caminho_banco, carga.pasta_instantaneos)
+    df = obter(nova, 'indices_taxas')
+
+    assert (nova.leituras_instantaneo, nova.recargas_completas) == (0, 1)
+    conferir_com_banco(nova, 'indices_taxas', df)
+
+
+def test_instantaneo_do_mesmo_banco_e_usado(carga):
+    obter(carga, 'investimentos')
+
+    nova = carga_incremental.CargaIncremental(carga.caminho_banco, carga.pasta_instantaneos)
+    df = obter(nova, 'investimentos')
+
+    assert (nova.leituras_instantaneo, nova.recargas_completas) == (1, 0)
+    conferir_com_banco(nova, 'investimentos', df)
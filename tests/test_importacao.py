@@ -0,0 +1,106 @@
+import datetime
+
+import openpyxl
+import pytest
+
+import importacao
+from conftest import consultar, executar, ler_versoes
+
+CABECALHO = ("Data da Posição", "Plano", "Código ISIN", "Fundo", "Classe", "Saldo Bruto")
+
+
+def criar_planilha(caminho, linhas):
+    livro = openpyxl.Workbook()
+    planilha = livro.active
+    for linha in linhas:
+        planilha.append(list(linha))
+    livro.save(caminho)
+    return str(caminho)
+
+
+def posicoes(caminho, data_posicao):
+    return consultar(caminho, """
+        SELECT nome_plano, codigo_isin_fundo, nome_fundo, segmento, valor_total, gestor FROM investimentos
+        WHERE data_posicao = ? ORDER BY codigo_isin_fundo""", (data_posicao,))
+
+
+@pytest.fixture
+def planilha_outubro(tmp_path):
+    return criar_planilha(tmp_path / 'outubro.xlsx', [
+        ("Relatório de Posições",),
+        ("Gerado em 05/11/2025",),
+        (),
+        CABECALHO,
+        ("31/10/2025", "001 - PLANO A - BD", "brsint000000", "FUNDO SINTETICO 00001", "RENDA FIXA", "R$ 1.234,56"),
+        (datetime.datetime(2025, 10, 31), "001 - PLANO A - BD", "BRSINT000002", "FUNDO SINTETICO 00003", "EXTERIOR",
+         2500.5),
+        ("Total", None, None, None, None, "R$ 3.735,06"),
+    ])
+
+
+def test_cabecalho_abaixo_dos_titulos_com_apelidos_e_valores_pt_br(banco, planilha_outubro):
+    resultado = importacao.importar(planilha_outubro, caminho_banco=banco)
+
+    assert resultado['colunas'] == ['data_posicao', 'nome_plano', 'codigo_isin_fundo', 'nome_fundo', 'segmento',
+                                    'valor_total']
+    assert (resultado['linhas_lidas'], resultado['linhas_ignoradas'], resultado['inseridas']) == (3, 1, 2)
+    linhas = posicoes(banco, '2025-10-31')
+    assert [linha[:5] for linha in linhas] == [
+        ('001 - PLANO A - BD', 'BRSINT000000', 'FUNDO SINTETICO 00001', 'RENDA FIXA', 1234.56),
+        ('001 - PLANO A - BD', 'BRSINT000002', 'FUNDO SINTETICO 00003', 'EXTERIOR', 2500.5),
+    ]
+    # O gestor vem do cadastro, copiado na própria importação.
+    assert all(linha[5] is not None for linha in linhas)
+
+
+def test_contagens_de_inseridas_atualizadas_e_inalteradas(banco, planilha_outubro, tmp_path):
+    importacao.importar(planilha_outubro, caminho_banco=banco)
+
+    repetida = importacao.importar(planilha_outubro, caminho_banco=banco)
+    assert (repetida['inseridas'], repetida['atualizadas'], repetida['inalteradas']) == (0, 0, 2)
+
+    corrigida = criar_planilha(tmp_path / 'corrigida.xlsx', [
+        CABECALHO,
+        ("31/10/2025", "001 - PLANO A - BD", "BRSINT000000", "FUNDO SINTETICO 00001", "RENDA FIXA", "1.300,00"),
+        ("31/10/2025", "001 - PLANO A - BD", "BRSINT000002", "FUNDO SINTETICO 00003", "EXTERIOR", 2500.5),
+        ("31/10/2025", "001 - PLANO A - BD", "BRSINT000001", "FUNDO SINTETICO 00002", "RENDA VARIÁVEL", 10),
+    ])
+    resultado = importacao.importar(corrigida, caminho_banco=banco)
+    assert (resultado['inseridas'], resultado['atualizadas'], resultado['inalteradas']) == (1, 1, 1)
+    assert [linha[4] for linha in posicoes(banco, '2025-10-31')] == [1300.0, 10.0, 2500.5]
+
+
+# O erro numa linha desfaz também os lotes já gravados da mesma planilha.
+def test_erro_no_meio_nao_grava_nada(banco, tmp_path, monkeypatch):
+    monkeypatch.setattr(importacao, 'TAMANHO_LOTE', 1)
+    planilha = criar_planilha(tmp_path / 'com_erro.xlsx', [
+        CABECALHO,
+        ("31/10/2025", "001 - PLANO A - BD", "BRSINT000000", "FUNDO SINTETICO 00001", "RENDA FIXA", 100),
+        ("31/10/2025", "001 - PLANO A - BD", "BRSINT000002", "FUNDO SINTETICO 00003", "EXTERIOR", 200),
+        ("31/02/2025", "001 - PLANO A - BD", "BRSINT000001", "FUNDO SINTETICO 00002", "RENDA VARIÁVEL", 300),
+    ])
+    linhas_antes = consultar(banco, "SELECT COUNT(*) FROM investimentos")[0][0]
+    versoes_antes = ler_versoes(banco)['investimentos']
+
+    with pytest.raises(ValueError, match="Linha 4"):
+        importacao.importar(planilha, caminho_banco=banco)
+
+    assert consultar(banco, "SELECT COUNT(*) FROM investimentos")[0][0] == linhas_antes
+    assert ler_versoes(banco)['investimentos'] == versoes_antes
+
+
+def test_posicoes_repetidas_no_banco_impedem_a_importacao(banco, planilha_outubro):
+    executar(banco, """
+        INSERT INTO investimentos (data_posicao, nome_plano, codigo_isin_fundo, nome_fundo, valor_total)
+        SELECT data_posicao, nome_plano, codigo_isin_fundo, nome_fundo, valor_total FROM investimentos LIMIT 1""")
+
+    with pytest.raises(ValueError, match="posições repetidas"):
+        importacao.importar(planilha_outubro, caminho_banco=banco)
+    assert posicoes(banco, '2025-10-31') == []
+
+
+def test_planilha_sem_cabecalho_reconhecivel(banco, tmp_path):
+    planilha = criar_planilha(tmp_path / 'sem_cabecalho.xlsx', [("Fundo", "Saldo")] + [("x", 1)] * 30)
+
+    with pytest.raises(ValueError, match="Cabeçalho"):
+        importacao.importar(planilha, caminho_banco=banco)
@@ -0,0 +1,47 @@
+import precalculo
+from conftest import consultar, executar
+
+
+def enfileirar_todas(caminho):
+    executar(caminho, "INSERT OR IGNORE INTO resumo_pendente SELECT DISTINCT data_posicao FROM investimentos")
+
+
+def resumo_confere_com_posicoes(caminho):
+    return consultar(caminho, """
+        SELECT COUNT(*) FROM resumo_patrimonio_data r
+        WHERE abs(r.valor_investimentos - (SELECT TOTAL(valor_total) FROM investimentos i
+                                            WHERE i.data_posicao = r.data_posicao)) > 0.005""")[0][0] == 0
+
+
+def test_precalculo_grava_e_esvazia_a_fila(banco):
+    enfileirar_todas(banco)
+
+    resultado = precalculo.precalcular(banco, processos=1)
+
+    assert resultado['refeito_na_gravacao'] is False
+    assert consultar(banco, "SELECT COUNT(*) FROM resumo_pendente")[0][0] == 0
+    assert resumo_confere_com_posicoes(banco)
+
+
+# Uma importação grava numa data já pendente enquanto os planos são calculados: o gatilho não a marca de
+# novo, e as linhas calculadas antes da escrita não podem ser gravadas como se estivessem em dia.
+def test_escrita_durante_o_calculo_nao_perde_a_data(banco, monkeypatch):
+    enfileirar_todas(banco)
+    data = consultar(banco, "SELECT MAX(data_posicao) FROM investimentos")[0][0]
+    calcular = precalculo._calcular
+    chamadas = []
+
+    def calcular_com_importacao(caminho_banco, nome_plano, datas):
+        linhas = calcular(caminho_banco, nome_plano, datas)
+        if not chamadas:
+            executar(caminho_banco, "UPDATE investimentos SET valor_total = valor_total + 1000 WHERE data_posicao = ?",
+                     (data,))
+        chamadas.append(nome_plano)
+        return linhas
+
+    monkeypatch.setattr(precalculo, '_calcular', calcular_com_importacao)
+    resultado = precalculo.precalcular(banco, processos=1)
+
+    assert resultado['refeito_na_gravacao'] is True
+    assert consultar(banco, "SELECT COUNT(*) FROM resumo_pendente")[0][0] == 0
+    assert resumo_confere_com_posicoes(banco)
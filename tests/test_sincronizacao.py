@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+import sincronizacao
+from conftest import consultar
+
+ABAS = {'cadastro_fundos': 'Cadastro', 'indices_taxas': 'Índices'}
+
+
+def aba_do_banco(caminho, tabela):
+    colunas = [linha[1] for linha in consultar(caminho, f"PRAGMA table_info({tabela})")
+               if linha[1] != 'data_importacao']
+    chave = sincronizacao.SINCRONIZACOES[tabela]['chave']
+    return [colunas] + [list(linha) for linha in consultar(caminho, f"SELECT {', '.join(colunas)} FROM {tabela} "
+                                                                    f"ORDER BY {chave}")]
+
+
+# Planilhas com o conteúdo atual do banco, nas abas de ABAS.
+@pytest.fixture
+def planilhas(banco):
+    return {aba: aba_do_banco(banco, tabela) for tabela, aba in ABAS.items()}
+
+
+def sincronizar(banco, planilhas, remover=False):
+    return sincronizacao.sincronizar(sincronizacao.PlanilhasLocais(planilhas), banco, ABAS, remover)
+
+
+def alterar(planilhas, aba, chave, coluna, valor):
+    cabecalho = planilhas[aba][0]
+    linha = next(linha for linha in planilhas[aba][1:] if chave in linha)
+    linha[cabecalho.index(coluna)] = valor
+
+
+def test_primeira_sincronizacao_de_planilhas_iguais_ao_banco_nao_grava(banco, planilhas):
+    resultado = sincronizar(banco, planilhas)
+
+    assert resultado['chamadas_api'] == 1
+    assert resultado['linhas_gravadas'] == 0
+    assert resultado['linhas_lidas'] == sum(len(linhas) - 1 for linhas in planilhas.values())
+    assert all(tabela['linhas_com_hash_novo'] == tabela['linhas_lidas'] for tabela in resultado['tabelas'].values())
+
+
+def test_edicao_grava_so_a_linha_alterada_e_repeticao_nao_grava(banco, planilhas):
+    sincronizar(banco, planilhas)
+    data = planilhas['Índices'][1][0]
+    alterar(planilhas, 'Índices', data, 'cdi', 0.5)
+
+    resultado = sincronizar(banco, planilhas)
+    indices = resultado['tabelas']['indices_taxas']
+    assert (indices['linhas_com_hash_novo'], indices['atualizadas'], indices['inseridas']) == (1, 1, 0)
+    assert resultado['linhas_gravadas'] == 1
+    assert consultar(banco, "SELECT cdi FROM indices_taxas WHERE data_posicao = ?", (data,)) == [(0.5,)]
+
+    repetida = sincronizar(banco, planilhas)
+    assert repetida['linhas_gravadas'] == 0
+    assert all(tabela['linhas_com_hash_novo'] == 0 for tabela in repetida['tabelas'].values())
+
+
+def test_remover_apaga_a_chave_que_saiu_da_planilha(banco, planilhas, tmp_path):
+    sincronizar(banco, planilhas)
+    removida = planilhas['Índices'].pop(1)[0]
+    arquivo = tmp_path / 'planilhas.json'
+    arquivo.write_text(json.dumps(planilhas, ensure_ascii=False), encoding='utf-8')
+
+    assert sincronizacao.main(['--local', str(arquivo), '--banco', banco, '--remover',
+                               '--aba', 'cadastro_fundos=Cadastro', '--aba', 'indices_taxas=Índices']) == 0
+
+    assert consultar(banco, "SELECT COUNT(*) FROM indices_taxas WHERE data_posicao = ?", (removida,)) == [(0,)]
+    assert consultar(banco, "SELECT COUNT(*) FROM sincronizacao_linhas WHERE tabela = 'indices_taxas' AND chave = ?",
+                     (removida,)) == [(0,)]
+
+
+def test_gestor_alterado_no_cadastro_chega_as_posicoes_e_ao_resumo(banco, planilhas):
+    isin = 'BRSINT000000'
+    alterar(planilhas, 'Cadastro', isin, 'gestor', 'GESTORA NOVA')
+
+    resultado = sincronizar(banco, planilhas)
+
+    assert resultado['tabelas']['cadastro_fundos']['atualizadas'] == 1
+    assert consultar(banco, "SELECT DISTINCT gestor FROM investimentos WHERE codigo_isin_fundo = ?",
+                     (isin,)) == [('GESTORA NOVA',)]
+    total_fundo = consultar(banco, "SELECT data_posicao, nome_plano, TOTAL(valor_total) FROM investimentos "
+                                   "WHERE codigo_isin_fundo = ? GROUP BY 1, 2 ORDER BY 1, 2", (isin,))
+    total_resumo = consultar(banco, "SELECT data_posicao, nome_plano, valor_total FROM resumo_patrimonio_gestor "
+                                    "WHERE gestor = 'GESTORA NOVA' ORDER BY 1, 2")
+    assert [linha[:2] for linha in total_resumo] == [linha[:2] for linha in total_fundo]
+    assert [linha[2] for linha in total_resumo] == pytest.approx([linha[2] for linha in total_fundo])